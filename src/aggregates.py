@@ -0,0 +1,303 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.store import DATE_COLUMN
+
+CARD_COLUMN = "Номер карты"
+ROUNDED_AMOUNT_COLUMN = "Сумма операции с округлением"
+CASHBACK_COLUMN = "Кэшбэк"
+CATEGORY_COLUMN = "Категория"
+AMOUNT_COLUMN = "Сумма операции"
+
+
+class CardAggregates:
+    """
+    Агрегаты по банковским картам: сумма операций с округлением, количество операций,
+    кэшбэк, даты первой и последней операции. Строятся одним проходом group by
+    и дополняются при добавлении новых транзакций без пересчёта всей истории.
+    """
+
+    def __init__(self):
+        self._cards = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Строит агрегаты по DataFrame с транзакциями.
+        :param df: DataFrame с транзакциями
+        :return: CardAggregates
+        """
+        aggregates = cls()
+        aggregates.update(df)
+        return aggregates
+
+    def update(self, df):
+        """
+        Добавляет в агрегаты новые транзакции.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        if CARD_COLUMN not in df.columns or df.empty:
+            return
+
+        logging.info(f"Обновление агрегатов по картам: {len(df)} транзакций")
+        columns = {"count": (CARD_COLUMN, "size")}
+        if ROUNDED_AMOUNT_COLUMN in df.columns:
+            columns["total"] = (ROUNDED_AMOUNT_COLUMN, "sum")
+        if CASHBACK_COLUMN in df.columns:
+            columns["cashback"] = (CASHBACK_COLUMN, "sum")
+        if DATE_COLUMN in df.columns:
+            columns["first_date"] = (DATE_COLUMN, "min")
+            columns["last_date"] = (DATE_COLUMN, "max")
+        grouped = df.groupby(CARD_COLUMN, observed=True).agg(**columns)
+
+        for card, row in grouped.iterrows():
+            current = self._cards.get(card)
+            new = {
+                "total": float(row.get("total", 0.0)),
+                "count": int(row["count"]),
+                "cashback": float(row.get("cashback", 0.0)),
+                "first_date": row.get("first_date"),
+                "last_date": row.get("last_date"),
+            }
+            if current is not None:
+                new["total"] += current["total"]
+                new["count"] += current["count"]
+                new["cashback"] += current["cashback"]
+                new["first_date"] = _min_date(current["first_date"], new["first_date"])
+                new["last_date"] = _max_date(current["last_date"], new["last_date"])
+            self._cards[card] = new
+
+    def get(self, card):
+        """
+        Возвращает агрегаты по карте.
+        :param card: номер карты, например '*4556'
+        :return: словарь с ключами total, count, cashback, first_date, last_date или None
+        """
+        return self._cards.get(card)
+
+    def total(self, card):
+        """
+        Возвращает сумму операций с округлением по карте (0 для неизвестной карты).
+        :param card: номер карты
+        :return: сумма операций
+        """
+        stats = self._cards.get(card)
+        return stats["total"] if stats else 0
+
+    def cards(self):
+        """
+        Возвращает агрегаты по всем картам, упорядоченные по номеру карты
+        (порядок не зависит от того, в каком порядке карты добавлялись).
+        :return: словарь номер карты -> агрегаты
+        """
+        return dict(sorted(self._cards.items()))
+
+
+def _min_date(first, second):
+    """Возвращает меньшую из дат, пропуская отсутствующие."""
+    if pd.isna(first):
+        return second
+    if pd.isna(second):
+        return first
+    return min(first, second)
+
+
+def _max_date(first, second):
+    """Возвращает большую из дат, пропуская отсутствующие."""
+    if pd.isna(first):
+        return second
+    if pd.isna(second):
+        return first
+    return max(first, second)
+
+
+class CashbackCube:
+    """
+    Куб кэшбэка и расходов в разрезе месяц x категория.
+    Строится одним group by по всем транзакциям, после чего любой месяц или диапазон месяцев
+    берётся срезом куба без повторного чтения и фильтрации транзакций.
+    """
+
+    def __init__(self, frame=None):
+        # DataFrame с индексом (месяц, категория) и столбцами cashback и spend
+        if frame is None:
+            index = pd.MultiIndex.from_arrays(
+                [pd.PeriodIndex([], freq="M"), pd.Index([], dtype=str)], names=["month", CATEGORY_COLUMN]
+            )
+            frame = pd.DataFrame({"cashback": [], "spend": []}, index=index)
+        self.frame = frame
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Строит куб по DataFrame с транзакциями.
+        :param df: DataFrame с транзакциями (дата операции должна быть datetime)
+        :return: CashbackCube
+        """
+        cube = cls()
+        cube.update(df)
+        return cube
+
+    @staticmethod
+    def _group(df):
+        """Группирует транзакции по месяцу и категории."""
+        columns = {"cashback": (CASHBACK_COLUMN, "sum")}
+        if AMOUNT_COLUMN in df.columns:
+            columns["spend"] = (AMOUNT_COLUMN, "sum")
+        month = df[DATE_COLUMN].dt.to_period("M").rename("month")
+        grouped = df.groupby([month, CATEGORY_COLUMN], observed=True).agg(**columns).reset_index()
+        grouped[CATEGORY_COLUMN] = grouped[CATEGORY_COLUMN].astype(str)
+        return grouped.set_index(["month", CATEGORY_COLUMN])
+
+    def update(self, df):
+        """
+        Добавляет в куб новые транзакции: пересчитываются только затронутые ячейки месяц x категория.
+        :param df: DataFrame с добавляемыми транзакциями
+        :raises KeyError: если в транзакциях нет столбцов даты, категории или кэшбэка
+        """
+        logging.info(f"Обновление куба кэшбэка: {len(df)} транзакций")
+        grouped = self._group(df)
+        if self.frame.empty:
+            self.frame = grouped.sort_index()
+        else:
+            self.frame = self.frame.add(grouped, fill_value=0).sort_index()
+
+    def month(self, year, month):
+        """
+        Возвращает кэшбэк и расходы по категориям за месяц.
+        :param year: год
+        :param month: месяц
+        :return: DataFrame с индексом по категориям и столбцами cashback и spend
+        """
+        return self.period(pd.Period(year=year, month=month, freq="M"))
+
+    def period(self, start, end=None):
+        """
+        Возвращает кэшбэк и расходы по категориям, суммированные за диапазон месяцев включительно.
+        :param start: первый месяц, например '2021-01' или pd.Period
+        :param end: последний месяц; по умолчанию совпадает с первым
+        :return: DataFrame с индексом по категориям и столбцами cashback и spend
+        """
+        start = pd.Period(start, freq="M")
+        end = start if end is None else pd.Period(end, freq="M")
+        months = self.frame.index.get_level_values("month")
+        selected = self.frame[(months >= start) & (months <= end)]
+        return selected.groupby(level=CATEGORY_COLUMN).sum()
+
+    def table(self, start, end, value="cashback"):
+        """
+        Возвращает таблицу категория x месяц для диапазона месяцев (например, для годовой выписки по кэшбэку).
+        :param start: первый месяц
+        :param end: последний месяц
+        :param value: cashback или spend
+        :return: DataFrame с категориями в строках и месяцами в столбцах
+        """
+        start, end = pd.Period(start, freq="M"), pd.Period(end, freq="M")
+        months = self.frame.index.get_level_values("month")
+        selected = self.frame.loc[(months >= start) & (months <= end), value]
+        return selected.unstack("month", fill_value=0.0)
+
+
+class CategoryPrefixSums:
+    """
+    Накопленные суммы операций по каждой категории, упорядоченные по дате операции.
+    Сумма расходов категории до даты находится бинарным поиском по датам и одним обращением к массиву.
+    Суммы хранятся в копейках (int64), поэтому накопление и дополнение новыми транзакциями не копят
+    ошибку округления float.
+    """
+
+    def __init__(self):
+        # категория -> (отсортированные даты, накопленные суммы в копейках)
+        self._series = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Строит накопленные суммы по DataFrame с транзакциями.
+        :param df: DataFrame с транзакциями
+        :return: CategoryPrefixSums
+        """
+        prefix_sums = cls()
+        prefix_sums.update(df)
+        return prefix_sums
+
+    def update(self, df):
+        """
+        Добавляет новые транзакции. Если новые операции не раньше последней известной даты категории,
+        накопленные суммы продолжаются; иначе пересчитывается только затронутая категория.
+        Транзакции без даты или категории пропускаются, пустые суммы считаются нулевыми.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        df = df[df[DATE_COLUMN].notna() & df[CATEGORY_COLUMN].notna()]
+        logging.info(f"Обновление накопленных сумм по категориям: {len(df)} транзакций")
+
+        for category, group in df.groupby(CATEGORY_COLUMN, observed=True):
+            dates = group[DATE_COLUMN].to_numpy()
+            kopecks = np.round(group[AMOUNT_COLUMN].fillna(0).to_numpy() * 100).astype(np.int64)
+            order = np.argsort(dates, kind="stable")
+            dates, kopecks = dates[order], kopecks[order]
+
+            current = self._series.get(category)
+            if current is None:
+                self._series[category] = (dates, np.cumsum(kopecks))
+            elif dates[0] >= current[0][-1]:
+                self._series[category] = (
+                    np.concatenate([current[0], dates]),
+                    np.concatenate([current[1], current[1][-1] + np.cumsum(kopecks)]),
+                )
+            else:
+                all_dates = np.concatenate([current[0], dates])
+                all_kopecks = np.concatenate([np.diff(current[1], prepend=0), kopecks])
+                order = np.argsort(all_dates, kind="stable")
+                self._series[category] = (all_dates[order], np.cumsum(all_kopecks[order]))
+
+    def total_until(self, category, date):
+        """
+        Возвращает сумму операций категории с датой операции не позже заданной.
+        :param category: название категории
+        :param date: конечная дата (включительно)
+        :return: сумма операций
+        """
+        series = self._series.get(category)
+        if series is None:
+            return 0.0
+        position = np.searchsorted(series[0], pd.Timestamp(date).to_datetime64(), "right")
+        return int(series[1][position - 1]) / 100 if position else 0.0
+
+
+def get_card_aggregates(store):
+    """
+    Возвращает агрегаты по картам для хранилища, строя их при первом обращении.
+    :param store: TransactionStore
+    :return: CardAggregates
+    """
+    key = ("cards",)
+    if key not in store.indexes:
+        store.indexes[key] = CardAggregates.from_frame(store.df)
+    return store.indexes[key]
+
+
+def get_cashback_cube(store):
+    """
+    Возвращает куб кэшбэка для хранилища, строя его при первом обращении.
+    :param store: TransactionStore
+    :return: CashbackCube
+    """
+    key = ("cashback",)
+    if key not in store.indexes:
+        store.indexes[key] = CashbackCube.from_frame(store.df)
+    return store.indexes[key]
+
+
+def get_category_prefix_sums(store):
+    """
+    Возвращает накопленные суммы по категориям для хранилища, строя их при первом обращении.
+    :param store: TransactionStore
+    :return: CategoryPrefixSums
+    """
+    key = ("category_prefix_sums",)
+    if key not in store.indexes:
+        store.indexes[key] = CategoryPrefixSums.from_frame(store.df)
+    return store.indexes[key]
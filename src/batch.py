@@ -0,0 +1,310 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+import pandas as pd
+
+from src.aggregates import get_category_prefix_sums
+from src.ingest import read_statement
+from src.logging_config import setup_logging
+from src.reports import rep_category_spending, rep_spend_on_working_or_weekends, rep_spending_on_weekdays
+from src.serialization import dumps
+from src.store import DATE_COLUMN, TransactionStore
+from src.utils import cards_summary
+
+STATEMENT_EXTENSIONS = (".xlsx", ".xls", ".csv")
+# Рабочий процесс перезапускается после указанного числа файлов, чтобы память не накапливалась
+MAX_TASKS_PER_CHILD = 50
+# Поля сводного CSV файла
+CSV_FIELDS = (
+    "file",
+    "status",
+    "error",
+    "transactions",
+    "first_date",
+    "last_date",
+    "spending",
+    "income",
+    "cashback",
+    "cards",
+    "top_category",
+    "category_spending",
+    "elapsed",
+)
+
+
+def find_statements(source):
+    """
+    Возвращает список файлов выписок: все файлы .xlsx, .xls и .csv каталога
+    или пути из файла-манифеста (по одному на строку или JSON список; относительные пути
+    считаются от каталога манифеста).
+    :param source: путь к каталогу или файлу-манифесту
+    :return: отсортированный список путей (для каталога) или пути в порядке манифеста
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(STATEMENT_EXTENSIONS) and not name.startswith("~$")
+        )
+
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    if source.lower().endswith(".json"):
+        paths = json.loads(text)
+    else:
+        paths = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    base = os.path.dirname(os.path.abspath(source))
+    return [path if os.path.isabs(path) else os.path.join(base, path) for path in paths]
+
+
+def analyze_statement(filepath, date=None, category=None):
+    """
+    Загружает выписку одного клиента и считает по ней сводку и отчёты.
+    Ошибки не выбрасываются, а возвращаются в результате, чтобы один файл не прерывал пакет.
+    :param filepath: путь к файлу выписки
+    :param date: дата, до которой строятся отчёты; по умолчанию дата последней операции в выписке
+    :param category: категория для отчёта о расходах по категории
+    :return: словарь с результатами (status - ok или error)
+    """
+    started = time.perf_counter()
+    result = {"file": filepath}
+    try:
+        # Хранилище создаётся напрямую, без общего кэша хранилищ, чтобы файлы не накапливались в памяти процесса
+        store = TransactionStore(read_statement(filepath), filepath)
+        df = store.df
+        amounts = df["Сумма операции"]
+        first_date, last_date = df[DATE_COLUMN].min(), df[DATE_COLUMN].max()
+        until = date or last_date
+        spending_by_category = df.loc[amounts < 0].groupby("Категория", observed=True)["Сумма операции"].sum()
+
+        result.update(
+            status="ok",
+            transactions=len(store),
+            first_date=None if pd.isna(first_date) else first_date.isoformat(),
+            last_date=None if pd.isna(last_date) else last_date.isoformat(),
+            spending=round(float(-amounts[amounts < 0].sum()), 2),
+            income=round(float(amounts[amounts > 0].sum()), 2),
+            cashback=round(float(df["Кэшбэк"].sum()), 2) if "Кэшбэк" in df.columns else 0.0,
+            cards=json.loads(cards_summary(store)),
+            top_category=spending_by_category.idxmin() if not spending_by_category.empty else None,
+            reports={
+                "weekdays": rep_spending_on_weekdays(store, until, save_report=False),
+                "day_type": rep_spend_on_working_or_weekends(store, until, save_report=False),
+            },
+        )
+        if category:
+            result["reports"]["category"] = rep_category_spending(store, category, until, save_report=False)
+            result["category_spending"] = get_category_prefix_sums(store).total_until(category, until)
+    except Exception as e:
+        logging.error(f"Ошибка при обработке файла {filepath}: {e}")
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["elapsed"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+class BatchWriter:
+    """
+    Записывает результаты пакетной обработки по мере готовности: JSON массив и/или CSV со сводными полями.
+    Результаты не накапливаются в памяти.
+    """
+
+    def __init__(self, json_path=None, csv_path=None):
+        self._json = open(json_path, "w", encoding="utf-8") if json_path else None
+        self._csv_file = open(csv_path, "w", encoding="utf-8", newline="") if csv_path else None
+        self._csv = csv.DictWriter(self._csv_file, CSV_FIELDS, extrasaction="ignore") if self._csv_file else None
+        self._count = 0
+        if self._json:
+            self._json.write("[\n")
+        if self._csv:
+            self._csv.writeheader()
+
+    def write(self, result):
+        """
+        Записывает результат обработки одного файла.
+        :param result: словарь, возвращённый analyze_statement
+        """
+        if self._json:
+            self._json.write(("," if self._count else "") + dumps(result) + "\n")
+        if self._csv:
+            row = dict(result)
+            if isinstance(row.get("cards"), list):
+                row["cards"] = len(row["cards"])
+            self._csv.writerow(row)
+        self._count += 1
+
+    def close(self):
+        """Завершает JSON массив и закрывает файлы."""
+        if self._json:
+            self._json.write("]\n")
+            self._json.close()
+        if self._csv_file:
+            self._csv_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def create_executor(workers):
+    """
+    Создаёт пул процессов для пакетной обработки. Из-за max_tasks_per_child рабочие процессы запускаются
+    методом spawn и не наследуют настройку журнала, поэтому каждый процесс настраивает журнал при запуске.
+    :param workers: число рабочих процессов
+    :return: ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=MAX_TASKS_PER_CHILD, initializer=setup_logging)
+
+
+def _failed(filepath, error):
+    """Результат файла, который не удалось обработать."""
+    return {"file": filepath, "status": "error", "error": f"{type(error).__name__}: {error}"}
+
+
+def run_batch(
+    filepaths,
+    date=None,
+    category=None,
+    json_path=None,
+    csv_path=None,
+    workers=None,
+    max_in_flight=None,
+    executor=None,
+    analyze=analyze_statement,
+):
+    """
+    Обрабатывает выписки в пуле процессов. Одновременно в работе не больше max_in_flight файлов,
+    поэтому память не зависит от числа файлов; результаты записываются по мере готовности (в порядке завершения).
+    Ошибка в одном файле записывается в его результат. Если рабочий процесс аварийно завершился
+    (например, из-за нехватки памяти), пул создаётся заново, а файлы, которые были в работе, обрабатываются
+    повторно по одному: ошибкой отмечается только файл, на котором процесс падает снова.
+    :param filepaths: список путей к файлам выписок
+    :param date: дата, до которой строятся отчёты
+    :param category: категория для отчёта о расходах по категории
+    :param json_path: путь к сводному JSON файлу
+    :param csv_path: путь к сводному CSV файлу
+    :param workers: число рабочих процессов; по умолчанию число процессоров
+    :param max_in_flight: максимальное число файлов в работе; по умолчанию удвоенное число процессов
+    :param executor: готовый пул (например, для тестов); по умолчанию create_executor(workers).
+                     Сломанный готовый пул не пересоздаётся: оставшиеся файлы отмечаются ошибкой
+    :param analyze: функция обработки одного файла (filepath, date, category) -> результат
+    :return: словарь с количеством файлов, успешных и ошибочных результатов
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    own_executor = executor is None
+    if own_executor:
+        executor = create_executor(workers)
+
+    summary = {"files": 0, "ok": 0, "errors": 0}
+    started = time.perf_counter()
+    logging.info(f"Пакетная обработка {len(filepaths)} файлов, процессов: {workers}")
+    # future -> (путь, повторная ли это попытка, пул, в который отправлен файл)
+    pending = {}
+    # Файлы, обработка которых прервалась падением рабочего процесса
+    retries = deque()
+    paths = iter(filepaths)
+
+    def restart(broken):
+        """Заменяет сломанный пул новым (один раз, даже если об ошибке сообщили несколько задач)."""
+        nonlocal executor
+        if own_executor and broken is executor:
+            logging.warning("Рабочий процесс аварийно завершился, пул процессов создаётся заново")
+            broken.shutdown(wait=False, cancel_futures=True)
+            executor = create_executor(workers)
+
+    try:
+        with BatchWriter(json_path, csv_path) as writer:
+
+            def record(result):
+                writer.write(result)
+                summary["files"] += 1
+                summary["ok" if result["status"] == "ok" else "errors"] += 1
+
+            while True:
+                # Повторные попытки выполняются по одной, чтобы падение процесса не задело другие файлы
+                if retries:
+                    batch, retried = ([retries.popleft()] if not pending else []), True
+                else:
+                    batch, retried = islice(paths, max(max_in_flight - len(pending), 0)), False
+                for filepath in batch:
+                    try:
+                        pending[executor.submit(analyze, filepath, date, category)] = (filepath, retried, executor)
+                    except BrokenProcessPool as e:
+                        if own_executor and not retried:
+                            retries.append(filepath)
+                            restart(executor)
+                        else:
+                            logging.error(f"Рабочий процесс не обработал файл {filepath}: {e}")
+                            record(_failed(filepath, e))
+                if not pending:
+                    if retries:
+                        continue
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepath, retried, submitted_to = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        restart(submitted_to)
+                        if own_executor and not retried:
+                            retries.append(filepath)
+                            continue
+                        logging.error(f"Рабочий процесс аварийно завершился при обработке файла {filepath}: {e}")
+                        result = _failed(filepath, e)
+                    except Exception as e:
+                        logging.error(f"Рабочий процесс не обработал файл {filepath}: {e}")
+                        result = _failed(filepath, e)
+                    record(result)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    logging.info(
+        f"Пакетная обработка завершена за {time.perf_counter() - started:.1f} с: "
+        f"успешно {summary['ok']}, с ошибками {summary['errors']}"
+    )
+    return summary
+
+
+def main(argv=None):
+    """
+    Запуск из командной строки: python -m src.batch <каталог или манифест> --json result.json --csv result.csv
+    """
+    parser = argparse.ArgumentParser(description="Пакетный анализ выписок клиентов")
+    parser.add_argument("source", help="каталог с выписками или файл-манифест")
+    parser.add_argument("--date", help="дата, до которой строятся отчёты, например 24.11.2021")
+    parser.add_argument("--category", help="категория для отчёта о расходах по категории")
+    parser.add_argument("--json", dest="json_path", help="путь к сводному JSON файлу")
+    parser.add_argument("--csv", dest="csv_path", help="путь к сводному CSV файлу")
+    parser.add_argument("--workers", type=int, help="число рабочих процессов")
+    parser.add_argument("--max-in-flight", type=int, help="максимальное число файлов в работе")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    summary = run_batch(
+        find_statements(args.source),
+        date=args.date,
+        category=args.category,
+        json_path=args.json_path,
+        csv_path=args.csv_path,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+    )
+    print(dumps(summary))
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+import src.cache as cache_module
+from src.cache import ResultCache
+from src.ingest import read_statement
+from src.logging_config import setup_logging
+from src.reports import rep_category_spending, rep_spend_on_working_or_weekends, rep_spending_on_weekdays
+from src.serialization import dumps
+from src.services import analyze_cashback, get_transactions_with_phones
+from src.store import DATE_COLUMN, TransactionStore, cache_paths, clear_stores, get_store
+from src.synthetic import DEFAULT_SEED, write_statement
+from src.utils import num_card_account, transactions_xlsx, web_search_xcl
+from src.views import process_excel_data
+
+# Размеры синтетических выписок (число транзакций)
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_SIZES = (10_000, 100_000)
+# Выписки до этого размера записываются в Excel и загружаются через transactions_xlsx,
+# большие - в CSV (запись и чтение Excel файла из миллионов строк занимает десятки минут)
+XLSX_MAX_ROWS = 100_000
+# Каталог сгенерированных выписок и файл с эталонными результатами
+BENCHMARK_DIR = os.getenv("BENCHMARK_DIR", "benchmarks")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+# Замер считается регрессией, если он больше эталонного на REGRESSION_THRESHOLD (доля)
+# и при этом разница больше MIN_REGRESSION_MS (для времени) или MIN_REGRESSION_MB (для памяти)
+REGRESSION_THRESHOLD = 0.25
+MIN_REGRESSION_MS = 5.0
+MIN_REGRESSION_MB = 1.0
+SEARCH_QUERY = "фаст"
+CATEGORY = "Супермаркеты"
+
+
+def statement_path(rows, seed=DEFAULT_SEED, directory=None):
+    """
+    Возвращает путь к синтетической выписке заданного размера, создавая её при первом обращении.
+    :param rows: число транзакций
+    :param seed: начальное значение генератора
+    :param directory: каталог выписок; по умолчанию BENCHMARK_DIR
+    :return: путь к файлу .xlsx или .csv
+    """
+    extension = "xlsx" if rows <= XLSX_MAX_ROWS else "csv"
+    filepath = os.path.join(directory or BENCHMARK_DIR, f"statement_{rows}_{seed}.{extension}")
+    if not os.path.exists(filepath):
+        write_statement(filepath, rows, seed)
+    return filepath
+
+
+def load_benchmark_store(filepath):
+    """
+    Загружает выписку в хранилище: Excel - через get_store, CSV - через read_statement.
+    :param filepath: путь к выписке
+    :return: TransactionStore
+    """
+    if filepath.endswith(".csv"):
+        return TransactionStore(read_statement(filepath), filepath)
+    return get_store(filepath)
+
+
+def _load_xlsx_cold(filepath):
+    """Загружает Excel выписку через transactions_xlsx без загруженных хранилищ и столбцового кэша."""
+    clear_stores()
+    for path in cache_paths(filepath):
+        if os.path.exists(path):
+            os.remove(path)
+    return transactions_xlsx(filepath)
+
+
+def benchmark_cases(store, filepath):
+    """
+    Возвращает проверяемые функции с аргументами, подобранными по данным выписки:
+    самая частая карта, последний месяц и последняя дата выписки.
+    :param store: TransactionStore
+    :param filepath: путь к выписке
+    :return: словарь название -> функция без аргументов
+    """
+    last_date = store.df[DATE_COLUMN].max()
+    date = last_date.strftime("%d.%m.%Y")
+    month_start = last_date.replace(day=1).strftime("%d.%m.%Y")
+    card = store.df["Номер карты"].value_counts().index[0]
+
+    cases = {}
+    if filepath.endswith(".xlsx"):
+        cases["transactions_xlsx"] = lambda: _load_xlsx_cold(filepath)
+    cases.update(
+        {
+            "web_search_xcl": lambda: web_search_xcl(store, SEARCH_QUERY),
+            "num_card_account": lambda: num_card_account(store, card),
+            "analyze_cashback": lambda: analyze_cashback(store, last_date.year, last_date.month),
+            "get_transactions_with_phones": lambda: get_transactions_with_phones(store),
+            "process_excel_data": lambda: process_excel_data(store, month_start),
+            "rep_category_spending": lambda: rep_category_spending(store, CATEGORY, date, save_report=False),
+            "rep_spending_on_weekdays": lambda: rep_spending_on_weekdays(store, date, save_report=False),
+            "rep_spend_on_working_or_weekends": lambda: rep_spend_on_working_or_weekends(
+                store, date, save_report=False
+            ),
+        }
+    )
+    return cases
+
+
+def measure(func, reset, repeat=3):
+    """
+    Замеряет функцию: медиану времени холодного вызова (после reset), время повторного вызова
+    (с построенными индексами и кэшем результатов) и пик памяти холодного вызова по tracemalloc.
+    Память замеряется отдельным вызовом, чтобы трассировка не искажала время.
+    :param func: функция без аргументов
+    :param reset: функция, возвращающая хранилище и кэши в исходное состояние
+    :param repeat: число холодных вызовов
+    :return: словарь time_ms, warm_ms, peak_mb
+    """
+    timings = []
+    for _ in range(repeat):
+        reset()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    func()
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    reset()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "time_ms": round(statistics.median(timings), 3),
+        "warm_ms": round(warm_ms, 3),
+        "peak_mb": round(peak / 2**20, 3),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, seed=DEFAULT_SEED, directory=None, only=None):
+    """
+    Генерирует (или берёт готовые) выписки заданных размеров и замеряет на них функции анализа.
+    На время замеров кэш результатов заменяется пустым кэшем в памяти, а уровень журнала повышается до WARNING.
+    :param sizes: размеры выписок
+    :param repeat: число холодных вызовов каждой функции
+    :param seed: начальное значение генератора выписок
+    :param directory: каталог выписок; по умолчанию BENCHMARK_DIR
+    :param only: названия функций, которые нужно замерить; по умолчанию все
+    :return: словарь с описанием окружения (meta) и замерами results[размер][функция]
+    """
+    logger = logging.getLogger()
+    level, result_cache = logger.level, cache_module.result_cache
+    logger.setLevel(logging.WARNING)
+    cache_module.result_cache = ResultCache()
+    results = {}
+    try:
+        for rows in sizes:
+            filepath = statement_path(rows, seed, directory)
+            store = load_benchmark_store(filepath)
+
+            def reset():
+                store.indexes.clear()
+                cache_module.result_cache.clear()
+
+            results[str(rows)] = {}
+            for name, func in benchmark_cases(store, filepath).items():
+                if only and name not in only:
+                    continue
+                results[str(rows)][name] = measure(func, reset, repeat)
+                print(f"{rows:>10} {name:<34} {_format_metrics(results[str(rows)][name])}", flush=True)
+    finally:
+        logger.setLevel(level)
+        cache_module.result_cache = result_cache
+
+    meta = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": seed,
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def _format_metrics(metrics):
+    """Форматирует замер для вывода в консоль."""
+    return f"{metrics['time_ms']:>10.1f} мс  {metrics['warm_ms']:>9.1f} мс повторно  {metrics['peak_mb']:>8.1f} МБ"
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Сравнивает замеры с эталонными. Сравниваются время холодного вызова и пик памяти
+    для функций и размеров, которые есть в обоих наборах.
+    :param results: результат run_benchmarks
+    :param baseline: эталонный результат run_benchmarks
+    :param threshold: допустимое относительное ухудшение
+    :return: список регрессий: словари size, function, metric, baseline, current, change
+    """
+    limits = {"time_ms": MIN_REGRESSION_MS, "peak_mb": MIN_REGRESSION_MB}
+    regressions = []
+    for size, functions in results["results"].items():
+        for name, metrics in functions.items():
+            expected = baseline.get("results", {}).get(size, {}).get(name)
+            if not expected:
+                continue
+            for metric, minimum in limits.items():
+                old, new = expected.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > minimum:
+                    change = round((new - old) / old, 3) if old else None
+                    regressions.append(
+                        {
+                            "size": size,
+                            "function": name,
+                            "metric": metric,
+                            "baseline": old,
+                            "current": new,
+                            "change": change,
+                        }
+                    )
+    return regressions
+
+
+def load_results(filepath):
+    """
+    Читает результаты замеров из JSON файла.
+    :param filepath: путь к файлу
+    :return: словарь результатов или None, если файла нет
+    """
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_results(results, filepath):
+    """
+    Записывает результаты замеров в JSON файл.
+    :param results: результат run_benchmarks
+    :param filepath: путь к файлу
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write(dumps(results, indent=2))
+
+
+def main(argv=None):
+    """
+    Запуск из командной строки: python -m src.benchmark --sizes 10000 100000 --output result.json
+    Код завершения 1 означает, что найдены регрессии относительно эталона.
+    """
+    parser = argparse.ArgumentParser(description="Замеры времени и памяти функций анализа транзакций")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help=f"размеры выписок: {SIZES}"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="число холодных вызовов каждой функции")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="начальное значение генератора выписок")
+    parser.add_argument("--only", nargs="+", help="названия функций, которые нужно замерить")
+    parser.add_argument("--output", help="путь к JSON файлу с результатами")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="путь к эталонным результатам")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="допустимое ухудшение (доля)")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как эталон")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.seed, only=args.only)
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Эталон сохранён в {args.baseline}")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline is None:
+        print(f"Эталон {args.baseline} не найден; сохраните его с --save-baseline")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for item in regressions:
+        print(
+            f"Регрессия: {item['function']} ({item['size']} транзакций), {item['metric']}: "
+            f"{item['baseline']} -> {item['current']}"
+        )
+    if not regressions:
+        print("Регрессий относительно эталона нет")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
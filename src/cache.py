@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.database import SQLiteStore
+from src.metrics import increment, span
+from src.store import TransactionStore, get_store, write_atomic
+
+# Каталог дискового кэша результатов; если не задан, результаты хранятся только в памяти
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+RESULT_CACHE_SIZE = 256
+
+
+def frame_fingerprint(df):
+    """
+    Вычисляет отпечаток содержимого DataFrame (столбцы, индекс и значения).
+    :param df: DataFrame
+    :return: шестнадцатеричная строка SHA-256
+    """
+    digest = hashlib.sha256(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class StoreFingerprint:
+    """
+    Отпечаток содержимого хранилища. При добавлении транзакций отпечаток вычисляется
+    по предыдущему отпечатку и новым строкам, без повторного хэширования всей истории.
+    """
+
+    def __init__(self, df):
+        self.value = f"store:{frame_fingerprint(df)}"
+
+    def update(self, df):
+        """
+        Дополняет отпечаток новыми транзакциями.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        self.value = "store:" + hashlib.sha256(f"{self.value}|{frame_fingerprint(df)}".encode()).hexdigest()
+
+
+def dataset_fingerprint(data):
+    """
+    Возвращает отпечаток набора транзакций. Для хранилища отпечаток вычисляется один раз,
+    путь к файлу разрешается через get_store, поэтому изменённый файл получает новый отпечаток.
+    Для SQLiteStore отпечаток учитывает версию базы, которая увеличивается при добавлении транзакций.
+    :param data: TransactionStore, SQLiteStore, DataFrame или путь к Excel файлу
+    :return: строка отпечатка или None, если данные нельзя однозначно идентифицировать
+    """
+    if isinstance(data, str):
+        data = get_store(data)
+    if isinstance(data, TransactionStore):
+        key = ("fingerprint",)
+        if key not in data.indexes:
+            data.indexes[key] = StoreFingerprint(data.df)
+        return data.indexes[key].value
+    if isinstance(data, SQLiteStore):
+        return data.fingerprint()
+    if isinstance(data, pd.DataFrame):
+        # Для DataFrame часть отчётов считается иначе, чем для хранилища, поэтому ключи различаются
+        return f"frame:{frame_fingerprint(data)}"
+    return None
+
+
+class ResultCache:
+    """
+    Кэш результатов отчётов с вытеснением давно не использованных записей (LRU)
+    и необязательным слоем на диске, который переживает перезапуск процесса.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Возвращает кортеж (найдено, значение) для ключа.
+        :param key: ключ записи
+        :return: (True, значение) или (False, None)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except Exception as e:
+                logging.warning(f"Не удалось прочитать кэш результата {path}: {e}")
+            else:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        """
+        Сохраняет значение в памяти и, если задан каталог, на диске.
+        :param key: ключ записи
+        :param value: значение
+        """
+        self._remember(key, value)
+        path = self._path(key)
+        if path:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # Уникальный временный файл: одновременная запись того же ключа не публикует недописанный файл
+                write_atomic(path, pickle.dumps(value))
+            except Exception as e:
+                logging.warning(f"Не удалось сохранить кэш результата {path}: {e}")
+
+    def clear(self):
+        """Очищает кэш в памяти и счётчики (файлы на диске не удаляются)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"{key}.pkl")
+
+
+result_cache = ResultCache(directory=RESULT_CACHE_DIR)
+
+
+def memoize_result(cache=None):
+    """
+    Декоратор, кэширующий результат функции, первым аргументом которой являются транзакции
+    (TransactionStore, SQLiteStore или путь к Excel файлу). Ключ составляется из имени функции,
+    отпечатка набора транзакций и остальных аргументов. Если транзакции нельзя идентифицировать
+    (например, передан файловый объект), функция вызывается без кэша. DataFrame тоже не кэшируется:
+    его можно изменить на месте, а хэширование всего содержимого при каждом вызове дороже самих отчётов.
+    Исключения не кэшируются.
+    :param cache: ResultCache; по умолчанию общий result_cache
+    :return: декоратор
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(data, *args, **kwargs):
+            target = cache or result_cache
+            if isinstance(data, pd.DataFrame):
+                return func(data, *args, **kwargs)
+            try:
+                with span("result_cache.fingerprint"):
+                    fingerprint = dataset_fingerprint(data)
+            except Exception:
+                fingerprint = None
+            if fingerprint is None:
+                return func(data, *args, **kwargs)
+
+            arguments = repr((args, sorted(kwargs.items())))
+            name = f"{func.__module__}.{func.__qualname__}"
+            key = hashlib.sha256(f"{name}|{fingerprint}|{arguments}".encode()).hexdigest()
+            found, value = target.get(key)
+            if found:
+                logging.info("Результат %s взят из кэша", func.__name__)
+                increment("result_cache.hits")
+                return value
+            increment("result_cache.misses")
+
+            value = func(data, *args, **kwargs)
+            target.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,314 @@
+import logging
+import os
+import threading
+from datetime import date as date_type
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import span
+from src.store import DATE_COLUMN, TransactionStore, resolve_store, write_atomic
+
+# Базовая валюта таблицы курсов (как у fetch_conversion_rates): курс - число единиц валюты за 1 USD
+BASE_CURRENCY = "USD"
+# Файл с историей курсов (CSV со столбцами date, currency, rate); если не задан, история хранится только в памяти
+RATES_FILE = os.getenv("RATES_FILE")
+# Суммы и столбцы с их валютами
+AMOUNT_CURRENCIES = {
+    "Сумма операции": "Валюта операции",
+    "Сумма платежа": "Валюта платежа",
+    "Сумма операции с округлением": "Валюта платежа",
+    "Кэшбэк": "Валюта платежа",
+}
+RATE_COLUMNS = ["date", "currency", "rate"]
+
+
+class CurrencyError(ValueError):
+    """Суммы нельзя пересчитать в валюту: нет курса целевой или исходной валюты."""
+
+
+class RateTable:
+    """
+    Таблица исторических курсов валют: на каждую дату - число единиц валюты за одну единицу базовой валюты.
+    Курс на дату операции - последний известный курс не позже этой даты, а для операций раньше первой
+    записи - первый известный курс. Потокобезопасна: при добавлении курсов таблица заменяется целиком.
+    """
+
+    def __init__(self, frame=None, base=BASE_CURRENCY):
+        self.base = base
+        # Номер версии меняется при каждом изменении курсов; по нему сбрасываются пересчитанные хранилища
+        self.version = 0
+        self._lock = threading.Lock()
+        self.frame = _empty_frame()
+        if frame is not None and len(frame):
+            self._merge(frame)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def currencies(self):
+        """Возвращает валюты, для которых известен хотя бы один курс."""
+        return sorted(self.frame["currency"].unique())
+
+    def add(self, conversion_rates, date=None, base=None):
+        """
+        Добавляет курсы на дату, например ответ API exchangerate-api.com.
+        Курсы с другой базовой валютой пересчитываются к базовой валюте таблицы.
+        Если на эту дату уже записаны такие же курсы, таблица не изменяется.
+        :param conversion_rates: словарь валюта -> число единиц валюты за одну единицу base
+        :param date: дата курсов; по умолчанию сегодня
+        :param base: базовая валюта курсов; по умолчанию базовая валюта таблицы
+        :raises ValueError: если курсы с другой базовой валютой не содержат базовую валюту таблицы
+        """
+        rates = {currency: float(rate) for currency, rate in conversion_rates.items() if rate}
+        base = base or self.base
+        if base != self.base:
+            if self.base not in rates:
+                raise ValueError(f"Нет курса {self.base} для пересчёта курсов с базовой валютой {base}")
+            scale = rates[self.base]
+            rates = {currency: rate / scale for currency, rate in rates.items()}
+        rates[self.base] = 1.0
+
+        day = pd.Timestamp(date or date_type.today()).normalize()
+        known = self.frame[self.frame["date"] == day]
+        if dict(zip(known["currency"], known["rate"])) == rates:
+            return
+        self._merge(pd.DataFrame({"date": day, "currency": list(rates), "rate": list(rates.values())}))
+
+    def _merge(self, frame):
+        """Объединяет курсы с таблицей; курс, записанный позже на ту же дату, заменяет прежний."""
+        frame = frame[RATE_COLUMNS].astype({"date": "datetime64[ns]", "currency": str, "rate": "float64"})
+        frame = frame.assign(date=frame["date"].dt.normalize())
+        with self._lock:
+            combined = pd.concat([self.frame, frame], ignore_index=True)
+            combined = combined.drop_duplicates(["date", "currency"], keep="last")
+            self.frame = combined.sort_values(["date", "currency"], ignore_index=True)
+            self.version += 1
+
+    @classmethod
+    def read_csv(cls, filepath, base=BASE_CURRENCY):
+        """
+        Загружает таблицу курсов из CSV файла со столбцами date, currency, rate.
+        :param filepath: путь к файлу
+        :param base: базовая валюта курсов в файле
+        :return: RateTable
+        """
+        frame = pd.read_csv(filepath, parse_dates=["date"])
+        logging.info(f"Загружено курсов валют: {len(frame)} из {filepath}")
+        return cls(frame, base)
+
+    def to_csv(self, filepath):
+        """
+        Записывает таблицу курсов в CSV файл через уникальный для процесса и потока временный файл,
+        поэтому одновременные записи (например, из потоков сервера) не оставляют файл недописанным.
+        :param filepath: путь к файлу
+        """
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_atomic(filepath, self.frame.to_csv(index=False, date_format="%Y-%m-%d").encode("utf-8"))
+
+    def conversion_factors(self, dates, currencies, target):
+        """
+        Возвращает коэффициенты пересчёта сумм из валют currencies в валюту target по курсам на даты dates.
+        Курсы ищутся одним объединением (merge_asof) для уникальных пар (день, валюта), а не для каждой строки.
+        Для сумм в валюте target коэффициент равен 1 без поиска курса; если курс неизвестен - NaN.
+        :param dates: даты операций
+        :param currencies: валюты сумм
+        :param target: валюта, в которую пересчитываются суммы
+        :return: массив коэффициентов
+        """
+        day_codes, days = pd.factorize(pd.DatetimeIndex(dates).normalize())
+        currencies = pd.Categorical(currencies)
+        names = currencies.categories.astype(str)
+        currency_codes = currencies.codes.astype(np.int64)
+
+        width = max(len(names), 1)
+        pair_codes, pairs = pd.factorize(
+            np.where((day_codes < 0) | (currency_codes < 0), -1, day_codes * width + currency_codes)
+        )
+        valid = pairs >= 0
+        sources = pairs[valid]
+        # Курсы исходных валют и курс target на каждый день ищутся вместе
+        source_names = names[sources % width].to_numpy(dtype=object)
+        rates = self._lookup(
+            np.concatenate([days[sources // width].to_numpy(), days.to_numpy()]),
+            np.concatenate([source_names, np.full(len(days), target, dtype=object)]),
+        )
+        source_rates = np.full(len(pairs), np.nan)
+        source_rates[valid] = rates[: len(sources)]
+        target_rates = np.append(rates[len(sources):], np.nan)
+
+        factors = target_rates[day_codes] / source_rates[pair_codes]
+        if target in names:
+            factors[currency_codes == names.get_loc(target)] = 1.0
+        return factors
+
+    def _lookup(self, dates, currencies):
+        """Возвращает курсы для пар (дата, валюта): последний курс не позже даты, иначе первый после неё."""
+        frame = self.frame
+        result = np.full(len(dates), np.nan)
+        if frame.empty or not len(dates):
+            return result
+
+        keys = pd.DataFrame(
+            {
+                "date": pd.DatetimeIndex(dates).astype("datetime64[ns]"),
+                "currency": pd.Series(currencies, dtype=str),
+                "position": np.arange(len(dates)),
+            }
+        ).sort_values("date", kind="stable")
+        matched = pd.merge_asof(keys, frame, on="date", by="currency", direction="backward")
+        missing = matched["rate"].isna().to_numpy()
+        if missing.any():
+            earlier = matched.loc[missing, ["date", "currency", "position"]]
+            later = pd.merge_asof(earlier, frame, on="date", by="currency", direction="forward")
+            matched.loc[missing, "rate"] = later["rate"].to_numpy()
+        result[matched["position"].to_numpy()] = matched["rate"].to_numpy()
+        return result
+
+
+def _empty_frame():
+    return pd.DataFrame(
+        {
+            "date": pd.Series(dtype="datetime64[ns]"),
+            "currency": pd.Series(dtype=str),
+            "rate": pd.Series(dtype="float64"),
+        }
+    )
+
+
+_rate_table = None
+_rate_table_lock = threading.Lock()
+
+
+def get_rate_table():
+    """
+    Возвращает общую таблицу курсов, загружая её из RATES_FILE при первом обращении.
+    :return: RateTable
+    """
+    global _rate_table
+    with _rate_table_lock:
+        if _rate_table is None:
+            if RATES_FILE and os.path.exists(RATES_FILE):
+                _rate_table = RateTable.read_csv(RATES_FILE)
+            else:
+                _rate_table = RateTable()
+        return _rate_table
+
+
+def record_rates(conversion_rates, date=None, base=BASE_CURRENCY):
+    """
+    Добавляет полученные курсы в общую таблицу курсов и, если задан RATES_FILE, сохраняет её в файл.
+    :param conversion_rates: словарь валюта -> курс относительно base
+    :param date: дата курсов; по умолчанию сегодня
+    :param base: базовая валюта курсов
+    """
+    table = get_rate_table()
+    version = table.version
+    table.add(conversion_rates, date, base)
+    if RATES_FILE and table.version != version:
+        try:
+            table.to_csv(RATES_FILE)
+        except OSError as e:
+            logging.error(f"Не удалось сохранить курсы валют в {RATES_FILE}: {e}")
+
+
+def convert_transactions(df, target, table=None):
+    """
+    Пересчитывает суммы транзакций в валюту target по курсам на дату операции.
+    Столбцы валют в результате содержат target. Исходный DataFrame не изменяется.
+    Суммы не заменяются пропусками молча: если хотя бы одну сумму пересчитать нельзя, пересчёт прерывается.
+    :param df: нормализованный DataFrame с транзакциями
+    :param target: валюта, например 'USD'
+    :param table: таблица курсов; по умолчанию общая таблица курсов
+    :return: DataFrame с пересчитанными суммами
+    :raises CurrencyError: если нет курса целевой или исходной валюты либо даты операции для выбора курса
+    """
+    if table is None:
+        table = get_rate_table()
+    columns = {
+        amount_column: currency_column
+        for amount_column, currency_column in AMOUNT_CURRENCIES.items()
+        if amount_column in df.columns and currency_column in df.columns
+    }
+
+    # Покрытие курсами проверяется до пересчёта: нужны курсы всех исходных валют и целевой валюты
+    sources = set()
+    for currency_column in set(columns.values()):
+        sources.update(df[currency_column].dropna().astype(str).unique())
+    sources.discard(target)
+    if sources:
+        missing = sorted((sources | {target}) - set(table.currencies()))
+        if missing:
+            raise CurrencyError(f"Нет курсов для пересчёта в {target}: {', '.join(missing)}")
+
+    result = df.copy(deep=False)
+    factors = {}
+    with span("currency.convert", rows=len(df)):
+        for amount_column, currency_column in columns.items():
+            if currency_column not in factors:
+                column_factors = table.conversion_factors(df[DATE_COLUMN], df[currency_column], target)
+                unknown = np.isnan(column_factors) & df[currency_column].notna().to_numpy()
+                if unknown.any():
+                    raise CurrencyError(
+                        f"Нельзя выбрать курс для пересчёта в {target}: у {int(unknown.sum())} транзакций "
+                        f"нет даты операции"
+                    )
+                factors[currency_column] = column_factors
+            result[amount_column] = df[amount_column].to_numpy() * factors[currency_column]
+
+        for currency_column in factors:
+            codes = np.where(df[currency_column].isna().to_numpy(), -1, 0)
+            result[currency_column] = pd.Categorical.from_codes(codes, categories=[target])
+    return result
+
+
+class CurrencyConversion:
+    """
+    Хранилище транзакций с суммами, пересчитанными в валюту target. При добавлении транзакций
+    в исходное хранилище пересчитываются только новые строки.
+    """
+
+    def __init__(self, store, target, table):
+        self.target = target
+        self.table = table
+        self.store = TransactionStore(convert_transactions(store.df, target, table), store.source)
+
+    def update(self, df):
+        """
+        Пересчитывает новые транзакции и добавляет их в хранилище. Если новые транзакции пересчитать нельзя,
+        хранилище сбрасывается, а ошибка возвращается при следующем вызове convert_store,
+        чтобы не прерывать добавление транзакций в исходное хранилище.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        try:
+            converted = convert_transactions(df, self.target, self.table)
+        except CurrencyError as e:
+            logging.warning(f"Пересчитанное в {self.target} хранилище сброшено: {e}")
+            self.store = None
+            return
+        self.store.append(converted)
+
+
+def convert_store(source, target, table=None):
+    """
+    Возвращает хранилище с суммами в валюте target, пересчитывая транзакции при первом обращении.
+    Результат можно передать любой функции анализа, например num_card_account(convert_store(store, 'USD'), card).
+    После изменения таблицы курсов хранилище пересчитывается заново.
+    :param source: TransactionStore или путь к Excel файлу
+    :param target: валюта, например 'USD'
+    :param table: таблица курсов; по умолчанию общая таблица курсов
+    :return: TransactionStore
+    :raises CurrencyError: если суммы нельзя пересчитать в валюту target
+    """
+    store = resolve_store(source)
+    if table is None:
+        table = get_rate_table()
+    prefix = ("currency", target, id(table))
+    key = prefix + (table.version,)
+    if key not in store.indexes or store.indexes[key].store is None:
+        for stale in [existing for existing in store.indexes if existing[:3] == prefix]:
+            del store.indexes[stale]
+        store.indexes[key] = CurrencyConversion(store, target, table)
+    return store.indexes[key].store
@@ -0,0 +1,470 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from src.store import (AMOUNT_COLUMNS, CACHE_DIR_NAME, DATE_COLUMN, DATE_FORMAT, DAY_TYPE_COLUMN, DAY_TYPES,
+                       WEEKDAY_COLUMN, file_hash)
+
+TABLE = "transactions"
+# Позиция строки в исходном файле (совпадает с индексом DataFrame хранилища)
+POSITION_COLUMN = "position"
+# Даты хранятся текстом ISO 8601, который сравнивается и сортируется как дата
+SQL_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Начало отсчёта серийных дат Excel: ячейка с датой хранит число дней от этой даты (с дробной частью - время)
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+REAL_COLUMNS = frozenset(AMOUNT_COLUMNS + ("MCC",))
+# Индексы: дата, категория с датой (расходы по категории до даты), карта и MCC
+INDEXED_COLUMNS = {
+    "idx_date": (DATE_COLUMN,),
+    "idx_category_date": ("Категория", DATE_COLUMN),
+    "idx_card": ("Номер карты",),
+    "idx_mcc": ("MCC",),
+}
+INSERT_CHUNK_SIZE = 5000
+
+
+def _quote(name):
+    """Экранирует имя столбца для SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _kopecks(column):
+    """SQL выражение суммы столбца в копейках: суммы складываются как целые числа без ошибки округления."""
+    return f"COALESCE(SUM(CAST(ROUND({_quote(column)} * 100) AS INTEGER)), 0)"
+
+
+def _sql_date(value):
+    """Преобразует дату (строку, datetime или Timestamp) в строку ISO, как при сравнении в pandas."""
+    return pd.Timestamp(value).strftime(SQL_DATE_FORMAT)
+
+
+def _statement_date(value):
+    """
+    Преобразует дату операции из Excel файла в строку ISO: строку в формате банковской выписки
+    ('ДД.ММ.ГГГГ ЧЧ:ММ:СС', другие форматы разбираются, как в normalize_transactions, день первым),
+    datetime или серийный номер даты Excel. Пропуск (NaN, None) остаётся NULL.
+    :raises ValueError: если значение нельзя разобрать как дату
+    """
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(SQL_DATE_FORMAT)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if pd.isna(value):
+            return None
+        return (EXCEL_EPOCH + pd.to_timedelta(value, unit="D")).round("s").strftime(SQL_DATE_FORMAT)
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value.strip(), DATE_FORMAT).strftime(SQL_DATE_FORMAT)
+        except ValueError:
+            pass
+        try:
+            return pd.to_datetime(value, dayfirst=True).strftime(SQL_DATE_FORMAT)
+        except ValueError:
+            pass
+    raise ValueError(f"Не удалось разобрать дату операции: {value!r}")
+
+
+def _display_date(value):
+    """Преобразует дату из строки ISO в формат банковской выписки."""
+    return f"{value[8:10]}.{value[5:7]}.{value[0:4]} {value[11:19]}"
+
+
+def _clean(value):
+    """Заменяет пропуски (NaN, NaT, None) на NULL."""
+    return None if pd.isna(value) else value
+
+
+class SQLiteStore:
+    """
+    Хранилище транзакций в файле SQLite с индексами по дате, категории, карте и MCC.
+    Фильтры и группировки выполняются запросами SQL, поэтому транзакции не загружаются в память целиком,
+    а файл базы можно одновременно читать из нескольких процессов.
+    Соединение открывается отдельно для каждого потока.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        # Структуры в памяти процесса, построенные по базе (например, ключи дедупликации при загрузке выписок)
+        self.indexes = {}
+
+    def __repr__(self):
+        return f"SQLiteStore({self.path})"
+
+    def __getstate__(self):
+        # Соединения не передаются в другие процессы: там они открываются заново
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    @property
+    def connection(self):
+        """Соединение с базой для текущего потока."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Закрывает соединение текущего потока."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    @classmethod
+    def from_chunks(cls, chunks, path, meta=None):
+        """
+        Создаёт базу из последовательности списков транзакций (словарей с одинаковыми ключами).
+        База записывается в уникальный временный файл в том же каталоге и атомарно заменяет существующую,
+        поэтому одновременные сборки одной базы не мешают друг другу.
+        :param chunks: итератор списков транзакций (например, iter_transactions_xlsx с chunk_size)
+        :param path: путь к файлу базы
+        :param meta: словарь метаданных (например, размер и хэш исходного файла)
+        :return: SQLiteStore
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        os.close(fd)
+        connection = sqlite3.connect(tmp_path)
+        count = 0
+        try:
+            columns = None
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if columns is None:
+                    columns = list(chunk[0])
+                    _create_table(connection, columns)
+                    insert = (
+                        f"INSERT INTO {TABLE} ({POSITION_COLUMN}, {', '.join(map(_quote, columns))}) "
+                        f"VALUES ({', '.join('?' * (len(columns) + 1))})"
+                    )
+                connection.executemany(
+                    insert, ((count + i, *(_clean(row.get(c)) for c in columns)) for i, row in enumerate(chunk))
+                )
+                count += len(chunk)
+            if columns is None:
+                raise ValueError("Нет транзакций для загрузки в базу")
+
+            for name, indexed in INDEXED_COLUMNS.items():
+                if all(column in columns for column in indexed):
+                    connection.execute(f"CREATE INDEX {name} ON {TABLE} ({', '.join(map(_quote, indexed))})")
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            meta = {**(meta or {}), "version": 0}
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.commit()
+        except BaseException:
+            connection.close()
+            os.remove(tmp_path)
+            raise
+        connection.close()
+
+        os.replace(tmp_path, path)
+        logging.info(f"База транзакций создана: {path}, транзакций: {count}")
+        return cls(path)
+
+    @classmethod
+    def from_frame(cls, df, path, meta=None):
+        """
+        Создаёт базу из нормализованного DataFrame (например, TransactionStore.df).
+        :param df: DataFrame с транзакциями
+        :param path: путь к файлу базы
+        :param meta: словарь метаданных
+        :return: SQLiteStore
+        """
+        rows = df.assign(**{DATE_COLUMN: df[DATE_COLUMN].dt.strftime(SQL_DATE_FORMAT)}) if DATE_COLUMN in df else df
+        records = rows.astype(object).to_dict("records")
+        chunks = (records[i:i + INSERT_CHUNK_SIZE] for i in range(0, len(records), INSERT_CHUNK_SIZE))
+        return cls.from_chunks(chunks, path, meta)
+
+    def meta(self):
+        """
+        Возвращает метаданные базы.
+        :return: словарь метаданных
+        """
+        return {key: json.loads(value) for key, value in self.connection.execute("SELECT key, value FROM meta")}
+
+    def version(self):
+        """
+        Возвращает номер версии базы, который увеличивается при каждом добавлении транзакций.
+        :return: номер версии
+        """
+        return self.meta().get("version")
+
+    def fingerprint(self):
+        """
+        Возвращает отпечаток содержимого базы для кэширования результатов:
+        путь, хэш исходного файла и номер версии, который увеличивается при добавлении транзакций.
+        :return: строка отпечатка
+        """
+        meta = self.meta()
+        return f"sqlite:{self.path}:{meta.get('sha256')}:{meta.get('version')}"
+
+    def columns(self):
+        """Возвращает названия столбцов транзакций в порядке исходного файла."""
+        cursor = self.connection.execute(f"SELECT * FROM {TABLE} LIMIT 0")
+        return [description[0] for description in cursor.description][1:]
+
+    def __len__(self):
+        return self.connection.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+    def append(self, df):
+        """
+        Добавляет нормализованные транзакции в конец базы и увеличивает версию базы.
+        :param df: DataFrame с транзакциями
+        :return: количество добавленных транзакций
+        """
+        columns = self.columns()
+        start = self.connection.execute(f"SELECT COALESCE(MAX({POSITION_COLUMN}) + 1, 0) FROM {TABLE}").fetchone()[0]
+        df = df.reindex(columns=columns)
+        if DATE_COLUMN in columns:
+            df = df.assign(**{DATE_COLUMN: df[DATE_COLUMN].dt.strftime(SQL_DATE_FORMAT)})
+        rows = [(start + i, *map(_clean, row)) for i, row in enumerate(df.astype(object).itertuples(index=False))]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO {TABLE} ({POSITION_COLUMN}, {', '.join(map(_quote, columns))}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 1))})",
+                rows,
+            )
+            self.connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        logging.info(f"В базу добавлено {len(rows)} транзакций")
+        return len(rows)
+
+    def _query_frame(self, where="", params=(), fields=None):
+        """Возвращает транзакции, удовлетворяющие условию, в виде DataFrame в исходном порядке строк."""
+        selected = f"{POSITION_COLUMN}, {', '.join(map(_quote, fields))}" if fields else "*"
+        cursor = self.connection.execute(f"SELECT {selected} FROM {TABLE} {where} ORDER BY {POSITION_COLUMN}", params)
+        columns = [description[0] for description in cursor.description]
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns).set_index(POSITION_COLUMN)
+        df.index.name = None
+        if DATE_COLUMN in df.columns:
+            df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=SQL_DATE_FORMAT)
+        for column in REAL_COLUMNS & set(df.columns):
+            df[column] = pd.to_numeric(df[column]).astype("float64")
+        return df
+
+    def frame(self, fields=None):
+        """
+        Возвращает все транзакции в виде DataFrame в исходном порядке строк.
+        :param fields: столбцы результата; по умолчанию все столбцы транзакций
+        :return: DataFrame с транзакциями
+        """
+        return self._query_frame(fields=fields)
+
+    def frame_between(self, start=None, end=None):
+        """
+        Возвращает транзакции с датой операции в диапазоне [start, end] (поиск по индексу дат).
+        :param start: начальная дата (включительно) или None
+        :param end: конечная дата (включительно) или None
+        :return: DataFrame с транзакциями
+        """
+        conditions, params = [f"{_quote(DATE_COLUMN)} IS NOT NULL"], []
+        if start is not None:
+            conditions.append(f"{_quote(DATE_COLUMN)} >= ?")
+            params.append(_sql_date(start))
+        if end is not None:
+            conditions.append(f"{_quote(DATE_COLUMN)} <= ?")
+            params.append(_sql_date(end))
+        return self._query_frame(f"WHERE {' AND '.join(conditions)}", params)
+
+    def distinct_values(self, column):
+        """
+        Возвращает различные непустые значения столбца.
+        :param column: название столбца
+        :return: список значений
+        """
+        return [row[0] for row in self.connection.execute(f"SELECT DISTINCT {_quote(column)} FROM {TABLE}")]
+
+    def records_where_in(self, column, values, fields=None):
+        """
+        Возвращает транзакции, значение столбца которых входит в список, в виде словарей
+        в исходном порядке строк. Дата операции отдаётся в формате банковской выписки, пропуски - NaN.
+        :param column: название столбца
+        :param values: список значений
+        :param fields: столбцы результата; по умолчанию все столбцы транзакций
+        :return: список кортежей (позиция строки, словарь транзакции)
+        """
+        values = list(values)
+        if not values:
+            return []
+        fields = fields or self.columns()
+        cursor = self.connection.execute(
+            f"SELECT {POSITION_COLUMN}, {', '.join(map(_quote, fields))} FROM {TABLE} "
+            f"WHERE {_quote(column)} IN ({', '.join('?' * len(values))}) ORDER BY {POSITION_COLUMN}",
+            values,
+        )
+        result = []
+        for position, *row in cursor:
+            record = {field: float("nan") if value is None else value for field, value in zip(fields, row)}
+            if isinstance(record.get(DATE_COLUMN), str):
+                record[DATE_COLUMN] = _display_date(record[DATE_COLUMN])
+            result.append((position, record))
+        return result
+
+    def card_stats(self, card=None):
+        """
+        Возвращает агрегаты по картам: сумму операций с округлением, количество операций,
+        кэшбэк и даты первой и последней операции (группировка по индексу карт).
+        :param card: номер карты; по умолчанию все карты
+        :return: словарь номер карты -> агрегаты (в формате CardAggregates)
+        """
+        where, params = ("WHERE {0} = ?", (card,)) if card is not None else ("WHERE {0} IS NOT NULL", ())
+        cursor = self.connection.execute(
+            f"SELECT {_quote('Номер карты')}, {_kopecks('Сумма операции с округлением')}, COUNT(*), "
+            f"{_kopecks('Кэшбэк')}, MIN({_quote(DATE_COLUMN)}), MAX({_quote(DATE_COLUMN)}) FROM {TABLE} "
+            f"{where.format(_quote('Номер карты'))} GROUP BY 1 ORDER BY 1",
+            params,
+        )
+        return {
+            number: {
+                "total": total / 100,
+                "count": count,
+                "cashback": cashback / 100,
+                "first_date": pd.Timestamp(first_date) if first_date else pd.NaT,
+                "last_date": pd.Timestamp(last_date) if last_date else pd.NaT,
+            }
+            for number, total, count, cashback, first_date, last_date in cursor
+        }
+
+    def cashback_by_category(self, start, end=None):
+        """
+        Возвращает кэшбэк по категориям за диапазон месяцев включительно.
+        :param start: первый месяц, например '2021-01'
+        :param end: последний месяц; по умолчанию совпадает с первым
+        :return: словарь категория -> кэшбэк, упорядоченный по категории
+        """
+        start = pd.Period(start, freq="M")
+        end = start if end is None else pd.Period(end, freq="M")
+        cursor = self.connection.execute(
+            f"SELECT {_quote('Категория')}, {_kopecks('Кэшбэк')} FROM {TABLE} "
+            f"WHERE {_quote(DATE_COLUMN)} >= ? AND {_quote(DATE_COLUMN)} < ? AND {_quote('Категория')} IS NOT NULL "
+            f"GROUP BY 1 ORDER BY 1",
+            (_sql_date(start.start_time), _sql_date((end + 1).start_time)),
+        )
+        return {category: cashback / 100 for category, cashback in cursor}
+
+    def category_total_until(self, category, date):
+        """
+        Возвращает сумму операций категории с датой операции не позже заданной (индекс категория + дата).
+        :param category: название категории
+        :param date: конечная дата (включительно)
+        :return: сумма операций
+        """
+        cursor = self.connection.execute(
+            f"SELECT {_kopecks('Сумма операции')} FROM {TABLE} "
+            f"WHERE {_quote('Категория')} = ? AND {_quote(DATE_COLUMN)} <= ?",
+            (category, _sql_date(date)),
+        )
+        return cursor.fetchone()[0] / 100
+
+    def spending_by_weekday(self, date):
+        """
+        Возвращает сумму операций по дням недели (0 - понедельник) до заданной даты.
+        :param date: конечная дата (включительно)
+        :return: Series с индексом "День недели"
+        """
+        weekday = f"(CAST(strftime('%w', {_quote(DATE_COLUMN)}) AS INTEGER) + 6) % 7"
+        cursor = self.connection.execute(
+            f"SELECT {weekday}, {_kopecks('Сумма операции')} FROM {TABLE} "
+            f"WHERE {_quote(DATE_COLUMN)} <= ? GROUP BY 1 ORDER BY 1",
+            (_sql_date(date),),
+        )
+        rows = cursor.fetchall()
+        index = pd.Index([row[0] for row in rows], dtype="Int8", name=WEEKDAY_COLUMN)
+        return pd.Series([row[1] / 100 for row in rows], index=index, name="Сумма операции")
+
+    def spending_by_day_type(self, date):
+        """
+        Возвращает сумму операций в рабочие и выходные дни до заданной даты.
+        :param date: конечная дата (включительно)
+        :return: Series с индексом "Тип дня"
+        """
+        day_type = f"CAST(strftime('%w', {_quote(DATE_COLUMN)}) AS INTEGER) NOT IN (0, 6)"
+        cursor = self.connection.execute(
+            f"SELECT {day_type}, {_kopecks('Сумма операции')} FROM {TABLE} "
+            f"WHERE {_quote(DATE_COLUMN)} <= ? GROUP BY 1 ORDER BY 1",
+            (_sql_date(date),),
+        )
+        rows = cursor.fetchall()
+        index = pd.CategoricalIndex([DAY_TYPES[row[0]] for row in rows], categories=DAY_TYPES, name=DAY_TYPE_COLUMN)
+        return pd.Series([row[1] / 100 for row in rows], index=index, name="Сумма операции")
+
+
+def _create_table(connection, columns):
+    """Создаёт таблицу транзакций: дата - TEXT, суммы и MCC - REAL, остальные столбцы без заданного типа."""
+    definitions = [f"{POSITION_COLUMN} INTEGER PRIMARY KEY"]
+    for column in columns:
+        if column == DATE_COLUMN:
+            definitions.append(f"{_quote(column)} TEXT")
+        elif column in REAL_COLUMNS:
+            definitions.append(f"{_quote(column)} REAL")
+        else:
+            definitions.append(_quote(column))
+    connection.execute(f"CREATE TABLE {TABLE} ({', '.join(definitions)})")
+
+
+def database_path(filepath):
+    """
+    Возвращает путь к файлу базы SQLite для Excel файла (в каталоге колоночного кэша).
+    :param filepath: путь к Excel файлу
+    :return: путь к файлу базы
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.sqlite")
+
+
+def get_database(filepath, db_path=None):
+    """
+    Возвращает базу SQLite для Excel файла, создавая её при отсутствии или изменении файла.
+    Excel файл читается потоково, поэтому создание базы не требует загрузки всех транзакций в память.
+    База считается актуальной при совпадении размера и времени изменения файла или, если время
+    изменения отличается, хэша содержимого. Транзакции из журнала загруженных выписок (restore_ingested)
+    добавляются в базу, которых в ней ещё нет, в том числе после её пересоздания.
+    :param filepath: путь к Excel файлу
+    :param db_path: путь к файлу базы; по умолчанию рядом с Excel файлом в каталоге кэша
+    :return: SQLiteStore
+    """
+    # Импорт внутри функции: модули utils и ingest сами используют SQLiteStore
+    from src.ingest import restore_ingested
+    from src.utils import iter_transactions_xlsx
+
+    db_path = db_path or database_path(filepath)
+    stat = os.stat(filepath)
+    if os.path.exists(db_path):
+        try:
+            database = SQLiteStore(db_path)
+            meta = database.meta()
+            if meta.get("size") == stat.st_size and (
+                meta.get("mtime_ns") == stat.st_mtime_ns or meta.get("sha256") == file_hash(filepath)
+            ):
+                logging.info(f"Используется база транзакций {db_path}")
+                restore_ingested(database)
+                return database
+            database.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Не удалось прочитать базу {db_path}: {e}")
+
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    meta = {
+        "source": os.path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(filepath),
+    }
+    chunks = (
+        [{**row, DATE_COLUMN: _statement_date(row.get(DATE_COLUMN))} for row in chunk]
+        for chunk in iter_transactions_xlsx(filepath, chunk_size=INSERT_CHUNK_SIZE)
+    )
+    database = SQLiteStore.from_chunks(chunks, db_path, meta)
+    restore_ingested(database)
+    return database
@@ -0,0 +1,244 @@
+import logging
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.database import SQLiteStore
+from src.store import (AMOUNT_COLUMNS, CACHE_DIR_NAME, DATE_COLUMN, normalize_transactions, resolve_store,
+                       write_atomic)
+
+# Столбцы, по которым строка выписки считается уже загруженной
+DEDUP_COLUMNS = (DATE_COLUMN, "Номер карты", "Сумма операции", "Описание")
+
+# Параметры чтения CSV выписки банка: разделитель ';' и десятичная запятая
+CSV_OPTIONS = {"sep": ";", "decimal": ","}
+
+
+def read_statement(filepath, **options):
+    """
+    Читает выписку банка из Excel или CSV файла и нормализует типы столбцов.
+    :param filepath: путь к файлу .xlsx, .xls или .csv
+    :param options: дополнительные параметры pandas.read_csv / pandas.read_excel
+    :return: нормализованный DataFrame с транзакциями
+    :raises ValueError: если формат файла не поддерживается
+    """
+    extension = os.path.splitext(str(filepath))[1].lower()
+    if extension == ".csv":
+        df = pd.read_csv(filepath, **{**CSV_OPTIONS, **options})
+    elif extension in (".xlsx", ".xls"):
+        df = pd.read_excel(filepath, **options)
+    else:
+        raise ValueError(f"Неподдерживаемый формат выписки: {extension}")
+    logging.info(f"Прочитана выписка {filepath}: {len(df)} транзакций")
+    return normalize_transactions(df)
+
+
+def transaction_keys(df, dedup_columns=DEDUP_COLUMNS):
+    """
+    Вычисляет ключи дедупликации строк по дате, карте, сумме и описанию.
+    Суммы сравниваются в копейках, даты - с точностью до наносекунд, независимо от единицы хранения.
+    :param df: DataFrame с транзакциями
+    :param dedup_columns: столбцы ключа; отсутствующие в df столбцы пропускаются
+    :return: массив uint64 хэшей строк
+    """
+    columns = {}
+    for column in dedup_columns:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if column == DATE_COLUMN:
+            values = values.astype("datetime64[ns]")
+        elif column in AMOUNT_COLUMNS:
+            values = (values * 100).round().astype("Int64")
+        else:
+            values = values.astype(object)
+        columns[column] = values
+    return pd.util.hash_pandas_object(pd.DataFrame(columns, index=df.index), index=False).to_numpy()
+
+
+class TransactionKeys:
+    """
+    Множество ключей дедупликации транзакций хранилища. Строится один раз по всей истории
+    и дополняется ключами добавленных строк, поэтому проверка выписки не перечитывает историю.
+    Ключ строится только по столбцам дедупликации, которые есть в хранилище: столбцы выписки,
+    отсутствующие в хранилище, при добавлении отбрасываются и не должны влиять на сравнение.
+    """
+
+    def __init__(self, df, version=None):
+        self.columns = [column for column in DEDUP_COLUMNS if column in df.columns]
+        # Версия базы SQLite, по которой построены ключи (для TransactionStore не используется)
+        self.version = version
+        self._keys = set(transaction_keys(df, self.columns).tolist())
+
+    def update(self, df):
+        """
+        Добавляет ключи новых транзакций.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        self._keys.update(self._row_keys(df).tolist())
+
+    def known(self, df):
+        """
+        Отмечает строки, которые уже есть в хранилище.
+        :param df: DataFrame с транзакциями
+        :return: булев массив длины len(df)
+        """
+        return np.fromiter((key in self._keys for key in self._row_keys(df).tolist()), dtype=bool, count=len(df))
+
+    def _row_keys(self, df):
+        """Вычисляет ключи строк по столбцам хранилища; отсутствующие в df столбцы считаются пустыми."""
+        return transaction_keys(df.reindex(columns=self.columns), self.columns)
+
+
+def get_transaction_keys(store):
+    """
+    Возвращает ключи дедупликации хранилища, строя их при первом обращении.
+    Для SQLiteStore ключи строятся по столбцам дедупликации из базы и строятся заново,
+    если версия базы изменилась (например, транзакции добавил другой процесс).
+    :param store: TransactionStore или SQLiteStore
+    :return: TransactionKeys
+    """
+    key = ("transaction_keys",)
+    if isinstance(store, SQLiteStore):
+        version = store.version()
+        keys = store.indexes.get(key)
+        if keys is None or keys.version != version:
+            columns = [column for column in DEDUP_COLUMNS if column in store.columns()]
+            store.indexes[key] = TransactionKeys(store.frame(columns), version)
+        return store.indexes[key]
+    if key not in store.indexes:
+        store.indexes[key] = TransactionKeys(store.df)
+    return store.indexes[key]
+
+
+def _resolve_store(source):
+    """Возвращает SQLiteStore как есть, остальные источники разрешает в TransactionStore."""
+    if isinstance(source, SQLiteStore):
+        return source
+    return resolve_store(source)
+
+
+def ingest_log_dir(filepath):
+    """
+    Возвращает каталог журнала загруженных выписок для Excel файла (в каталоге колоночного кэша).
+    Каждая загрузка записывает в журнал отдельный файл с добавленными строками, поэтому одновременные
+    загрузки не перезаписывают друг друга.
+    :param filepath: путь к Excel файлу
+    :return: путь к каталогу журнала
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.ingested")
+
+
+def _source_path(store):
+    """Возвращает путь к Excel файлу, из которого построено хранилище, или None (журнал не ведётся)."""
+    if isinstance(store, SQLiteStore):
+        return store.meta().get("source")
+    return os.path.abspath(store.source) if isinstance(store.source, str) else None
+
+
+def _log_ingested(store, df):
+    """
+    Записывает добавленные строки в журнал Excel файла хранилища, чтобы они пережили перезапуск процесса,
+    пересоздание базы SQLite и изменение Excel файла. Хранилище без исходного файла журнал не ведёт.
+    """
+    source = _source_path(store)
+    if df.empty or source is None:
+        return
+    directory = ingest_log_dir(source)
+    os.makedirs(directory, exist_ok=True)
+    # Имя начинается со времени записи: при восстановлении файлы применяются в порядке загрузки
+    name = f"{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}.pkl"
+    write_atomic(os.path.join(directory, name), pickle.dumps(df.reset_index(drop=True)))
+    logging.info(f"Добавленные транзакции записаны в журнал {directory}: {len(df)}")
+
+
+def restore_ingested(store):
+    """
+    Добавляет в хранилище транзакции из журнала загруженных выписок его Excel файла. Строки, которые
+    уже есть в хранилище (например, вошли в новую версию Excel файла), пропускаются.
+    :param store: TransactionStore или SQLiteStore
+    :return: количество восстановленных транзакций
+    """
+    source = _source_path(store)
+    directory = ingest_log_dir(source) if source else None
+    if directory is None or not os.path.isdir(directory):
+        return 0
+    restored = 0
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".pkl"):
+            df = pd.read_pickle(os.path.join(directory, name))
+            restored += len(_ingest(store, df, log=False))
+    logging.info(f"Из журнала {directory} восстановлено транзакций: {restored}")
+    return restored
+
+
+def _append(store, df, keys):
+    """
+    Добавляет строки в хранилище любого типа и возвращает их.
+    В TransactionStore ключи дополняются через update() вместе с остальными индексами, в SQLiteStore - здесь;
+    если версия базы изменилась не только этой записью, ключи будут построены заново при следующей загрузке.
+    """
+    if not isinstance(store, SQLiteStore):
+        return store.append(df)
+    if not df.empty:
+        store.append(df)
+        keys.update(df)
+        version = store.version()
+        keys.version = version if version == keys.version + 1 else None
+    return df
+
+
+def ingest_transactions(store, df):
+    """
+    Добавляет в хранилище транзакции, которых в нём ещё нет. Одинаковые строки внутри одной выписки
+    сохраняются: повторяющимися считаются только строки, уже загруженные ранее.
+    Индексы и агрегаты хранилища дополняются только новыми строками.
+    Добавленные строки записываются в журнал Excel файла хранилища (см. restore_ingested).
+    :param store: TransactionStore, SQLiteStore, путь к Excel файлу или файловый объект
+    :param df: нормализованный DataFrame с транзакциями выписки
+    :return: DataFrame с добавленными строками
+    """
+    return _ingest(_resolve_store(store), df)
+
+
+def _ingest(store, df, log=True):
+    """Добавляет в хранилище строки, которых в нём ещё нет, и при log=True записывает их в журнал."""
+    keys = get_transaction_keys(store)
+    known = keys.known(df)
+    if known.any():
+        logging.info(f"Пропущено уже загруженных транзакций: {int(known.sum())}")
+    added = _append(store, df[~known], keys)
+    if log:
+        _log_ingested(store, added)
+    return added
+
+
+def ingest_statement(store, filepath, **options):
+    """
+    Читает выписку банка (Excel или CSV) и добавляет её новые транзакции в хранилище.
+    Время загрузки зависит от размера выписки, а не от размера всей истории.
+    :param store: TransactionStore, SQLiteStore, путь к Excel файлу или файловый объект
+    :param filepath: путь к файлу выписки
+    :param options: дополнительные параметры чтения файла
+    :return: количество добавленных транзакций
+    """
+    added = ingest_transactions(store, read_statement(filepath, **options))
+    logging.info(f"Из выписки {filepath} добавлено {len(added)} транзакций")
+    return len(added)
+
+
+def ingest_statements(store, filepaths, **options):
+    """
+    Последовательно загружает несколько выписок; пересекающиеся строки разных выписок добавляются один раз.
+    :param store: TransactionStore, SQLiteStore, путь к Excel файлу или файловый объект
+    :param filepaths: пути к файлам выписок
+    :param options: дополнительные параметры чтения файлов
+    :return: словарь путь к файлу -> количество добавленных транзакций
+    """
+    store = _resolve_store(store)
+    return {filepath: ingest_statement(store, filepath, **options) for filepath in filepaths}
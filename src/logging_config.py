@@ -0,0 +1,173 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Настройки журнала задаются переменными окружения
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Файл журнала (например, app.log); если не задан, журнал пишется только в stderr
+LOG_FILE = os.getenv("LOG_FILE")
+# Формат записей: text - строка как раньше, json - одна JSON-запись на строку
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Размер файла журнала, после которого он переименовывается в app.log.1, и число хранимых старых файлов
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 2**20)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Размер очереди записей; при заполненной очереди новые записи отбрасываются, а не задерживают поток
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Стандартные атрибуты LogRecord; остальные (переданные через extra) попадают в JSON-запись
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Форматирует запись журнала как одну строку JSON: время (UTC, ISO 8601), уровень, логгер, сообщение,
+    модуль, поток, текст исключения и поля, переданные через extra.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Передаёт записи журнала в очередь, из которой их пишет фоновый поток (QueueListener).
+    Поток приложения только подставляет аргументы в сообщение; если очередь заполнена,
+    запись отбрасывается и учитывается в счётчике dropped, а поток не ждёт.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # Счётчик увеличивается из разных потоков; += не атомарна, поэтому нужна своя блокировка
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Сообщение и текст исключения вычисляются сейчас: аргументы могут измениться до записи.
+        # Время и формат записи (text или json) вычисляет фоновый поток
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def setup_logging(level=None, log_file=None, json_lines=None, max_bytes=None, backup_count=None, force=False):
+    """
+    Настраивает журнал приложения один раз: корневой логгер получает неблокирующий обработчик очереди,
+    а фоновый поток пишет записи в stderr и, если задан файл, в файл с ротацией по размеру.
+    Повторный вызов без force ничего не меняет. Параметры по умолчанию берутся из переменных окружения
+    LOG_LEVEL, LOG_FILE, LOG_FORMAT, LOG_MAX_BYTES и LOG_BACKUP_COUNT.
+    :param level: уровень журнала (например, 'INFO' или logging.DEBUG)
+    :param log_file: путь к файлу журнала
+    :param json_lines: писать записи в формате JSON lines
+    :param max_bytes: размер файла, после которого он ротируется
+    :param backup_count: число хранимых старых файлов
+    :param force: заменить уже выполненную настройку
+    :return: DroppingQueueHandler корневого логгера
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is not None and not force:
+            return _handler
+        _stop_listener()
+
+        if json_lines is None:
+            json_lines = LOG_FORMAT == "json"
+        formatter = JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT)
+
+        handlers = [logging.StreamHandler(sys.stderr)]
+        log_file = log_file or LOG_FILE
+        if log_file:
+            directory = os.path.dirname(os.path.abspath(log_file))
+            os.makedirs(directory, exist_ok=True)
+            handlers.append(
+                logging.handlers.RotatingFileHandler(
+                    log_file,
+                    maxBytes=LOG_MAX_BYTES if max_bytes is None else max_bytes,
+                    backupCount=LOG_BACKUP_COUNT if backup_count is None else backup_count,
+                    encoding="utf-8",
+                    delay=True,
+                )
+            )
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level or LOG_LEVEL)
+        return _handler
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся в очереди записи, останавливает фоновый поток и снимает обработчик."""
+    with _lock:
+        _stop_listener()
+
+
+def _stop_listener():
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _handler = _listener = None
+
+
+def _restart_after_fork():
+    """
+    В дочернем процессе (например, рабочем процессе пакетной обработки) фонового потока нет,
+    поэтому обработчик получает новую очередь и новый поток с теми же обработчиками.
+    """
+    global _listener
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(shutdown_logging)
@@ -1,14 +1,17 @@
+import asyncio
+import os
 from datetime import datetime
 
-from reports import (load_transactions, rep_category_spending, rep_spend_on_working_or_weekends,
-                     rep_spending_on_weekdays)
-from services import analyze_cashback, extract_phone_numbers, get_transactions_with_phones
-from utils import num_card_account, transactions_xlsx, web_search_xcl
-from views import get_greeting, parse_datetime, process_excel_data
+from src.logging_config import setup_logging
+from src.reports import (load_transactions, rep_category_spending, rep_spend_on_working_or_weekends,
+                         rep_spending_on_weekdays)
+from src.serialization import dumps
+from src.services import analyze_cashback, extract_phone_numbers, get_transactions_with_phones
+from src.store import get_store
+from src.utils import num_card_account, web_search_xcl
+from src.views import build_dashboard, get_greeting, parse_datetime, process_excel_data
 
-file_path = "E:/pycharm_project/transaction_analysis_web/data/operations.xlsx"
-file_open_xlsx = transactions_xlsx(file_path)
-load_transaction = load_transactions(file_path)
+file_path = os.getenv("TRANSACTIONS_FILE", "E:/pycharm_project/transaction_analysis_web/data/operations.xlsx")
 
 date_now = datetime.now().hour
 date_input = "24.11.2021"
@@ -22,15 +25,20 @@ month = 5
 
 
 def main():
+    setup_logging()
+    # Excel файл читается при запуске, а не при импорте модуля; все функции используют общее хранилище
+    store = get_store(file_path)
     print(get_greeting(date_now))
-    print(process_excel_data(file_path, date_input))
-    print(web_search_xcl(file_open_xlsx, input_search))
-    print(num_card_account(file_open_xlsx, input_card))
-    print(analyze_cashback(file_path, year, month))
-    print(get_transactions_with_phones(file_path))
-    print(rep_category_spending(load_transaction, input_search, date_input))
-    print(rep_spending_on_weekdays(load_transaction, date_input))
-    print(rep_spend_on_working_or_weekends(load_transaction, date_input))
+    print(process_excel_data(store, date_input))
+    print(web_search_xcl(store, input_search))
+    print(num_card_account(store, input_card))
+    print(analyze_cashback(store, year, month))
+    print(get_transactions_with_phones(store))
+    print(rep_category_spending(store, input_search, date_input))
+    print(rep_spending_on_weekdays(store, date_input))
+    print(rep_spend_on_working_or_weekends(store, date_input))
+    # Главная страница: разделы собираются одновременно
+    print(dumps(asyncio.run(build_dashboard(date_input, store))))
 
 
 if __name__ == "__main__":
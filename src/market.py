@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import increment, span
+
+# Адреса API можно переопределить, например, для тестового сервера
+EXCHANGE_RATE_API_URL = os.getenv("EXCHANGE_RATE_API_URL", "https://v6.exchangerate-api.com/v6")
+ALPHA_VANTAGE_API_URL = os.getenv("ALPHA_VANTAGE_API_URL", "https://www.alphavantage.co/query")
+
+REQUEST_TIMEOUT = 10
+POOL_SIZE = 10
+MAX_WORKERS = 5
+
+# Время жизни данных (секунды) и окно, в течение которого устаревшее значение отдаётся с фоновым обновлением
+RATES_TTL = 600
+QUOTES_TTL = 60
+SETTINGS_TTL = 60
+STALE_TTL = 3600
+
+
+class MarketDataError(RuntimeError):
+    """Ошибка получения данных от внешнего API."""
+
+
+class TTLCache:
+    """
+    Кэш значений с временем жизни и стратегией stale-while-revalidate:
+    свежее значение отдаётся сразу, устаревшее (в пределах окна stale_ttl) - тоже сразу,
+    но с обновлением в фоновом потоке; без значения загрузка выполняется синхронно.
+    Значения None не кэшируются.
+    """
+
+    def __init__(self, ttl, stale_ttl=0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """
+        Возвращает значение по ключу, загружая его функцией loader при необходимости.
+        :param key: ключ значения
+        :param loader: функция без аргументов, загружающая значение
+        :return: значение
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                increment("market.cache_hits")
+                return entry[0]
+            if age < self.ttl + self.stale_ttl:
+                increment("market.cache_stale_hits")
+                self._refresh_in_background(key, loader)
+                return entry[0]
+
+        increment("market.cache_misses")
+        value = loader()
+        self._set(key, value)
+        return value
+
+    def clear(self):
+        """Удаляет все значения из кэша."""
+        with self._lock:
+            self._entries.clear()
+
+    def _set(self, key, value):
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._set(key, loader())
+            except Exception as e:
+                logging.warning(f"Не удалось обновить значение {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"refresh-{key}", daemon=True).start()
+
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    Создаёт HTTP-сессию с пулом соединений, переиспользуемых между запросами.
+    :param pool_size: размер пула соединений на хост
+    :return: requests.Session
+    """
+    http_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    return http_session
+
+
+session = create_session()
+rates_cache = TTLCache(RATES_TTL, STALE_TTL)
+quotes_cache = TTLCache(QUOTES_TTL, STALE_TTL)
+settings_cache = TTLCache(SETTINGS_TTL)
+
+
+def get_json(url, params=None):
+    """
+    Выполняет GET-запрос через общую сессию и возвращает разобранный JSON.
+    :param url: адрес запроса
+    :param params: параметры запроса
+    :return: ответ в виде словаря
+    :raises MarketDataError: если сервер ответил статусом, отличным от 200
+    """
+    with span("market.http"):
+        response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 200:
+        increment("market.http_errors")
+        raise MarketDataError(f"статус: {response.status_code}")
+    return response.json()
+
+
+def fetch_conversion_rates(api_key, base="USD"):
+    """
+    Возвращает курсы валют относительно базовой валюты (с кэшированием на RATES_TTL секунд).
+    :param api_key: ключ API exchangerate-api.com
+    :param base: базовая валюта
+    :return: словарь валюта -> курс
+    """
+    return rates_cache.get(
+        ("rates", base), lambda: get_json(f"{EXCHANGE_RATE_API_URL}/{api_key}/latest/{base}")["conversion_rates"]
+    )
+
+
+def fetch_quote(symbol, api_key):
+    """
+    Возвращает текущую цену акции (с кэшированием на QUOTES_TTL секунд).
+    :param symbol: символ акции
+    :param api_key: ключ API Alpha Vantage
+    :return: цена акции
+    :raises MarketDataError: если API не вернул котировку
+    """
+
+    def load():
+        data = get_json(ALPHA_VANTAGE_API_URL, params={"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": api_key})
+        for message_key in ("Error Message", "Note", "Information"):
+            if message_key in data:
+                raise MarketDataError(data[message_key])
+        quote = data.get("Global Quote") or {}
+        if "05. price" not in quote:
+            raise MarketDataError(f"нет котировки для {symbol}")
+        return float(quote["05. price"])
+
+    return quotes_cache.get(("quote", symbol), load)
+
+
+def fetch_quotes(symbols, api_key, max_workers=MAX_WORKERS):
+    """
+    Параллельно получает цены нескольких акций. Ошибка по одному символу не прерывает остальные.
+    :param symbols: список символов акций
+    :param api_key: ключ API Alpha Vantage
+    :param max_workers: максимальное число одновременных запросов
+    :return: словарь символ -> цена (None, если цену получить не удалось)
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+        futures = {symbol: pool.submit(fetch_quote, symbol, api_key) for symbol in symbols}
+
+    prices = {}
+    for symbol, future in futures.items():
+        try:
+            prices[symbol] = future.result()
+        except Exception as e:
+            logging.error(f"Ошибка при получении данных для {symbol}: {e}")
+            prices[symbol] = None
+    return prices
+
+
+def clear_caches():
+    """Очищает кэши курсов валют, котировок и настроек пользователя."""
+    rates_cache.clear()
+    quotes_cache.clear()
+    settings_cache.clear()
@@ -0,0 +1,258 @@
+import contextlib
+import functools
+import os
+import re
+import threading
+import time
+
+# Сбор замеров включается переменной окружения METRICS_ENABLED=1; выключенные замеры почти ничего не стоят
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+# Префикс имён метрик в формате Prometheus
+METRICS_PREFIX = "transactions"
+
+
+class Span:
+    """
+    Замер одного этапа: время выполнения блока with и, если задано, число обработанных строк.
+    Число строк можно указать при создании или присвоить атрибуту rows внутри блока.
+    """
+
+    __slots__ = ("_metrics", "name", "rows", "_started")
+
+    def __init__(self, metrics, name, rows=None):
+        self._metrics = metrics
+        self.name = name
+        self.rows = rows
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._metrics.observe(self.name, time.perf_counter() - self._started, self.rows, failed=exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    """Замер-заглушка для выключенного сбора: не засекает время и ничего не записывает."""
+
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Реестр замеров: этапы (число вызовов, ошибки, суммарное и максимальное время, строки),
+    счётчики и значения (gauge). Потокобезопасен; экспортируется в JSON (summary) или текст Prometheus.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def collect(self):
+        """
+        Собирает этапы, выполненные в текущем потоке внутри блока with, например для заголовка Server-Timing.
+        :return: контекстный менеджер, возвращающий список кортежей (этап, секунды)
+        """
+        previous = getattr(self._local, "stages", None)
+        self._local.stages = stages = []
+        try:
+            yield stages
+        finally:
+            self._local.stages = previous
+
+    def span(self, name, rows=None):
+        """
+        Возвращает контекстный менеджер, замеряющий время блока как этап name.
+        :param name: название этапа, например 'excel.parse'
+        :param rows: число обрабатываемых строк (для пропускной способности)
+        :return: Span или заглушка, если сбор выключен
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, rows)
+
+    def timed(self, name=None, rows=None):
+        """
+        Декоратор, замеряющий каждый вызов функции как этап.
+        :param name: название этапа; по умолчанию 'модуль.функция'
+        :param rows: функция (результат) -> число строк для пропускной способности
+        :return: декоратор
+        """
+
+        def decorator(func):
+            stage = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(stage) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        span.rows = rows(result)
+                    return result
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, name, seconds, rows=None, failed=False):
+        """
+        Записывает выполнение этапа.
+        :param name: название этапа
+        :param seconds: длительность в секундах
+        :param rows: число обработанных строк или None
+        :param failed: завершился ли этап исключением
+        """
+        if not self.enabled:
+            return
+        collected = getattr(self._local, "stages", None)
+        if collected is not None:
+            collected.append((name, seconds))
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {"count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0}
+            stage["count"] += 1
+            stage["errors"] += failed
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            if rows:
+                stage["rows"] += rows
+
+    def increment(self, name, value=1):
+        """
+        Увеличивает счётчик.
+        :param name: название счётчика, например 'market.cache_hits'
+        :param value: приращение
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """
+        Запоминает текущее значение показателя, например число транзакций в хранилище.
+        :param name: название показателя
+        :param value: значение
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        """Удаляет все накопленные замеры."""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def summary(self):
+        """
+        Возвращает замеры в виде словаря для JSON: для этапов - число вызовов, ошибки, суммарное, среднее
+        и максимальное время в миллисекундах, строки и строки в секунду.
+        :return: словарь stages, counters, gauges
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            counters, gauges = dict(self._counters), dict(self._gauges)
+
+        result = {}
+        for name, stage in sorted(stages.items()):
+            result[name] = {
+                "count": stage["count"],
+                "errors": stage["errors"],
+                "total_ms": round(stage["seconds"] * 1000, 3),
+                "mean_ms": round(stage["seconds"] * 1000 / stage["count"], 3),
+                "max_ms": round(stage["max_seconds"] * 1000, 3),
+                "rows": stage["rows"],
+                "rows_per_second": round(stage["rows"] / stage["seconds"]) if stage["rows"] and stage["seconds"] else 0,
+            }
+        return {"enabled": self.enabled, "stages": result, "counters": counters, "gauges": gauges}
+
+    def to_prometheus(self):
+        """
+        Возвращает замеры в текстовом формате Prometheus (version 0.0.4).
+        :return: строка с метриками
+        """
+        summary = self.summary()
+        stage_metrics = (
+            ("stage_calls_total", "counter", "Число выполнений этапа", "count", 1),
+            ("stage_errors_total", "counter", "Число этапов, завершившихся ошибкой", "errors", 1),
+            ("stage_seconds_total", "counter", "Суммарное время этапа в секундах", "total_ms", 0.001),
+            ("stage_seconds_max", "gauge", "Максимальное время этапа в секундах", "max_ms", 0.001),
+            ("stage_rows_total", "counter", "Число строк, обработанных этапом", "rows", 1),
+            ("stage_rows_per_second", "gauge", "Строк в секунду на этапе", "rows_per_second", 1),
+        )
+        lines = []
+        for metric, kind, help_text, field, scale in stage_metrics:
+            name = f"{METRICS_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for stage, values in summary["stages"].items():
+                lines.append(f'{name}{{stage="{_escape_label(stage)}"}} {_format_value(values[field] * scale)}')
+        for group, kind in (("counters", "counter"), ("gauges", "gauge")):
+            for counter, value in sorted(summary[group].items()):
+                name = f"{METRICS_PREFIX}_{_metric_name(counter)}" + ("_total" if kind == "counter" else "")
+                lines += [f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name):
+    """Приводит название к допустимому имени метрики Prometheus."""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape_label(value):
+    """Экранирует значение метки Prometheus."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    """Форматирует значение метрики без лишних нулей."""
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+# Общий реестр замеров приложения
+metrics = Metrics()
+
+
+def span(name, rows=None):
+    """Замеряет блок with как этап name в общем реестре (см. Metrics.span)."""
+    return metrics.span(name, rows)
+
+
+def timed(name=None, rows=None):
+    """Декоратор, замеряющий вызовы функции в общем реестре (см. Metrics.timed)."""
+    return metrics.timed(name, rows)
+
+
+def increment(name, value=1):
+    """Увеличивает счётчик в общем реестре."""
+    metrics.increment(name, value)
+
+
+def gauge(name, value):
+    """Запоминает значение показателя в общем реестре."""
+    metrics.gauge(name, value)
@@ -0,0 +1,194 @@
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.serialization import dumps
+from src.store import DATE_COLUMN, DATE_FORMAT
+
+
+def _same_value(value, other):
+    """Сравнивает значения ячеек, считая пропуски (NaN) равными друг другу."""
+    if value == other:
+        return True
+    return isinstance(value, float) and isinstance(other, float) and value != value and other != other
+
+
+def _column(series):
+    """
+    Возвращает представление столбца для построчного доступа без копирования значений:
+    категории - коды и список значений, даты - массив datetime64, числа - массив numpy,
+    остальные столбцы - массив pandas.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return "category", series.cat.codes.to_numpy(), list(series.cat.categories)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date", series.to_numpy(), None
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+        return "number", series.to_numpy(), None
+    return "object", series.array, None
+
+
+def _format_date(value):
+    """Форматирует дату операции как в банковской выписке; отсутствующая дата - NaN."""
+    return float("nan") if pd.isna(value) else pd.Timestamp(value).strftime(DATE_FORMAT)
+
+
+def _format_dates(values):
+    """
+    Форматирует массив дат datetime64 в формате DATE_FORMAT ('ДД.ММ.ГГГГ ЧЧ:ММ:СС'), отсутствующие даты - NaN.
+    Строки собираются из представления ISO 8601, что во много раз быстрее strftime для каждой даты.
+    """
+    formatted = []
+    for text in np.datetime_as_string(values, unit="s").tolist():
+        formatted.append(float("nan") if text == "NaT" else f"{text[8:10]}.{text[5:7]}.{text[:4]} {text[11:]}")
+    return formatted
+
+
+class TransactionRecords(Sequence):
+    """
+    Компактное представление транзакций: значения хранятся по столбцам (категории, карты и валюты -
+    кодами категорий, суммы - массивами numpy), а строка-словарь создаётся только при обращении к ней.
+    Поддерживает индексацию, срезы, итерацию и сравнение со списком словарей.
+    """
+
+    __slots__ = ("columns", "_keys", "_columns", "_positions")
+
+    def __init__(self, df, positions=None):
+        self.columns = tuple(df.columns)
+        self._keys = {column: i for i, column in enumerate(self.columns)}
+        self._columns = [_column(df[column]) for column in self.columns]
+        self._positions = np.arange(len(df)) if positions is None else np.asarray(positions, dtype=np.intp)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            subset = object.__new__(TransactionRecords)
+            subset.columns, subset._keys, subset._columns = self.columns, self._keys, self._columns
+            subset._positions = self._positions[item]
+            return subset
+        return TransactionRow(self, int(self._positions[item]))
+
+    def __eq__(self, other):
+        if isinstance(other, (Sequence, TransactionRecords)) and not isinstance(other, (str, bytes)):
+            return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TransactionRecords({len(self)} транзакций)"
+
+    def take(self, positions):
+        """
+        Возвращает представление выбранных строк без копирования столбцов.
+        :param positions: позиции строк относительно текущего представления
+        :return: TransactionRecords
+        """
+        subset = self[:0]
+        subset._positions = self._positions[np.asarray(positions, dtype=np.intp)]
+        return subset
+
+    def value(self, position, column):
+        """
+        Возвращает значение столбца для строки в виде объекта Python (как DataFrame.to_dict).
+        :param position: позиция строки в исходном DataFrame
+        :param column: название столбца
+        :return: значение
+        """
+        kind, data, categories = self._columns[self._keys[column]]
+        if kind == "category":
+            code = data[position]
+            return categories[code] if code >= 0 else float("nan")
+        if kind == "date":
+            return _format_date(data[position]) if column == DATE_COLUMN else pd.Timestamp(data[position])
+        if kind == "number":
+            return data[position].item()
+        return data[position]
+
+    def to_dicts(self, missing=float("nan")):
+        """
+        Материализует все транзакции в список словарей (значения извлекаются по столбцам).
+        :param missing: значение для пропусков; по умолчанию NaN, как в DataFrame.to_dict
+        :return: список словарей транзакций
+        """
+        values = []
+        replace_missing = not (isinstance(missing, float) and missing != missing)
+        for column, (kind, data, categories) in zip(self.columns, self._columns):
+            if kind == "category":
+                lookup = np.array(categories + [float("nan")], dtype=object)
+                values.append(lookup[data[self._positions]].tolist())
+            elif kind == "date" and column == DATE_COLUMN:
+                values.append(_format_dates(data[self._positions]))
+            elif kind == "date":
+                values.append(list(pd.DatetimeIndex(data[self._positions])))
+            elif kind == "number":
+                values.append(data[self._positions].tolist())
+            else:
+                values.append(data.take(self._positions).tolist())
+            if replace_missing:
+                # Пропуски (NaN, NaT) - единственные значения, не равные самим себе
+                values[-1] = [missing if value != value else value for value in values[-1]]
+        return [dict(zip(self.columns, row)) for row in zip(*values)]
+
+    def to_json(self, compact=False):
+        """
+        Возвращает транзакции в формате JSON; пропуски кодируются как null.
+        :param compact: компактный режим (см. serialization.dumps)
+        :return: JSON строка
+        """
+        return dumps(self, compact=compact)
+
+
+class TransactionRow(Mapping):
+    """
+    Представление одной транзакции в виде словаря только для чтения.
+    Хранит только ссылку на TransactionRecords и позицию строки; значения читаются из столбцов при обращении.
+    """
+
+    __slots__ = ("_records", "_position")
+
+    def __init__(self, records, position):
+        self._records = records
+        self._position = position
+
+    def __getitem__(self, column):
+        if column not in self._records._keys:
+            raise KeyError(column)
+        return self._records.value(self._position, column)
+
+    def __iter__(self):
+        return iter(self._records.columns)
+
+    def __len__(self):
+        return len(self._records.columns)
+
+    def __eq__(self, other):
+        # В отличие от сравнения словарей, пропуски (NaN) в одной и той же ячейке считаются равными
+        if isinstance(other, Mapping):
+            return len(self) == len(other) and all(
+                column in other and _same_value(self[column], other[column]) for column in self
+            )
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        """
+        Возвращает транзакцию в виде обычного словаря.
+        :return: словарь транзакции
+        """
+        return {column: self[column] for column in self._records.columns}
+
+
+def get_records(store):
+    """
+    Возвращает компактное представление всех транзакций хранилища, создавая его при первом обращении.
+    :param store: TransactionStore
+    :return: TransactionRecords
+    """
+    key = ("records",)
+    if key not in store.indexes:
+        store.indexes[key] = TransactionRecords(store.df)
+    return store.indexes[key]
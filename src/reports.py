@@ -1,30 +1,129 @@
+import atexit
+import functools
+import locale
 import logging
+import os
+import queue
+import threading
 from collections import defaultdict
 from datetime import datetime
 
 import pandas as pd
 
-# Настройка логгирования
-logging.basicConfig(
-    filename="app.log", filemode="a", format="%(asctime)s - %(levelname)s - %(message)s", level=logging.DEBUG
-)
+from src.aggregates import get_category_prefix_sums
+from src.cache import memoize_result
+from src.database import SQLiteStore
+from src.metrics import span
+from src.store import (DAY_TYPE_COLUMN, WEEKDAY_COLUMN, TransactionStore, date_features, get_date_index, get_store,
+                       write_atomic)
 
+# Каталог для файлов отчётов; можно задать переменной окружения REPORTS_DIR
+REPORTS_DIR = os.getenv("REPORTS_DIR", ".")
 
-def result_report_to_file(file="res_report.txt"):
+
+def write_file_atomic(path, text):
+    """
+    Записывает текст во временный файл в том же каталоге и атомарно переименовывает его (write_atomic),
+    чтобы читатель никогда не увидел частично записанный отчёт; при ошибке временный файл удаляется.
+    Текст записывается, как при open(path, "w"): в кодировке по умолчанию и с системным переводом строк.
+
+    :param path: путь к файлу
+    :param text: записываемый текст
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_atomic(path, text.replace("\n", os.linesep).encode(locale.getpreferredencoding(False)))
+
+
+class ReportWriter:
+    """
+    Фоновая запись отчётов: файлы записываются отдельным потоком из очереди,
+    поэтому время работы отчёта не включает запись на диск.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path, text):
+        """
+        Ставит отчёт в очередь на запись.
+
+        :param path: путь к файлу
+        :param text: текст отчёта
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((path, text))
+
+    def flush(self):
+        """Ожидает записи всех поставленных в очередь отчётов."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, text = self._queue.get()
+            try:
+                with span("reports.write"):
+                    write_file_atomic(path, text)
+            except Exception as e:
+                logging.error(f"Ошибка записи отчёта в {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+report_writer = ReportWriter()
+atexit.register(report_writer.flush)
+
+
+def summarize(value, limit=60):
+    """
+    Возвращает короткое описание значения для журнала: размер для DataFrame и коллекций,
+    усечённое представление для остальных значений.
+
+    :param value: значение аргумента или результата
+    :param limit: максимальная длина представления
+    :return: строка с описанием
+    """
+    if isinstance(value, pd.DataFrame):
+        return f"DataFrame{value.shape}"
+    if isinstance(value, TransactionStore):
+        return f"TransactionStore({len(value)} строк)"
+    if isinstance(value, str):
+        return repr(value) if len(value) <= limit else f"str(len={len(value)})"
+    if isinstance(value, (list, tuple, dict, set, pd.Series)):
+        return f"{type(value).__name__}(len={len(value)})"
+    text = repr(value)
+    return text if len(text) <= limit else f"{type(value).__name__}(...)"
+
+
+def result_report_to_file(file="res_report.txt", directory=None):
     """
     Декоратор, сохраняющий результат функции в файл.
+    В журнал пишутся только краткие описания аргументов и результата, а файл записывается
+    фоновым потоком. Передайте save_report=False при вызове, чтобы получить только результат
+    без записи файла; исходная функция доступна как __wrapped__.
 
     :param file: имя файла, в который записывается результат
+    :param directory: каталог для файла; по умолчанию REPORTS_DIR
     :return: обёрнутая функция
     """
 
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            logging.info(f"Вызов функции {func.__name__} с аргументами {args} и {kwargs}")
-            result = func(*args, **kwargs)
-            logging.info(f"Функция {func.__name__} вернула {result}")
-            with open(file, "w") as f:
-                f.write(str(result))
+        @functools.wraps(func)
+        def wrapper(*args, save_report=True, **kwargs):
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                arguments = ", ".join(
+                    [summarize(arg) for arg in args] + [f"{key}={summarize(value)}" for key, value in kwargs.items()]
+                )
+                logging.info(f"Вызов функции {func.__name__} с аргументами ({arguments})")
+            with span(f"reports.{func.__name__}"):
+                result = func(*args, **kwargs)
+            logging.info("Функция %s вернула %s", func.__name__, summarize(result))
+            if save_report:
+                report_writer.submit(os.path.join(directory or REPORTS_DIR, file), str(result))
             return result
 
         return wrapper
@@ -42,7 +141,8 @@ def load_transactions(filepath):
     """
     try:
         logging.info(f"Загрузка транзакций из {filepath}")
-        transactions = pd.read_excel(filepath, parse_dates=["Дата операции"], date_format="%d.%m.%Y %H:%M:%S")
+        # Отчёты не изменяют DataFrame, поэтому возвращается общий DataFrame хранилища
+        transactions = get_store(filepath).df
         logging.info("Транзакции успешно загружены")
         return transactions
     except Exception as e:
@@ -50,12 +150,47 @@ def load_transactions(filepath):
         raise
 
 
+def transactions_until(transactions, date):
+    """
+    Возвращает транзакции с датой операции не позже заданной.
+    Для TransactionStore выборка выполняется бинарным поиском по индексу дат,
+    для DataFrame - сравнением столбца с датой.
+
+    :param transactions: DataFrame или TransactionStore с транзакциями
+    :param date: конечная дата (включительно)
+    :return: DataFrame с отобранными транзакциями
+    """
+    if isinstance(transactions, TransactionStore):
+        return transactions.df.iloc[get_date_index(transactions).positions_between(end=date)]
+    return transactions[transactions["Дата операции"] <= date]
+
+
+def features_until(transactions, date):
+    """
+    Возвращает транзакции с датой операции не позже заданной вместе с их производными столбцами
+    (день недели, тип дня). Для TransactionStore используются столбцы, вычисленные при загрузке,
+    для DataFrame они вычисляются для отобранных строк. Переданные данные не изменяются.
+
+    :param transactions: DataFrame или TransactionStore с транзакциями
+    :param date: конечная дата (включительно)
+    :return: кортеж (DataFrame с транзакциями, DataFrame с производными столбцами)
+    """
+    if isinstance(transactions, TransactionStore):
+        positions = get_date_index(transactions).positions_between(end=date)
+        return transactions.df.iloc[positions], transactions.features.iloc[positions]
+    until_date = transactions_until(transactions, date)
+    return until_date, date_features(until_date)
+
+
 @result_report_to_file("category_spending_report.txt")
+@memoize_result()
 def rep_category_spending(transactions, name_category, date):
     """
     Расчёт расходов по указанной категории до заданной даты.
+    Для TransactionStore сумма берётся из накопленных сумм по категории (бинарный поиск по дате),
+    для SQLiteStore - запросом по индексу категории и даты.
 
-    :param transactions: DataFrame с транзакциями
+    :param transactions: DataFrame, TransactionStore или SQLiteStore с транзакциями
     :param name_category: название категории
     :param date: конечная дата расчёта
     :return: строка с общими расходами по категории
@@ -63,9 +198,13 @@ def rep_category_spending(transactions, name_category, date):
     """
     try:
         logging.info(f"Расчёт расходов по категории {name_category} до {date}")
-        category_spending = transactions[
-            (transactions["Категория"] == name_category) & (transactions["Дата операции"] <= date)
-        ]["Сумма операции"].sum()
+        if isinstance(transactions, TransactionStore):
+            category_spending = get_category_prefix_sums(transactions).total_until(name_category, date)
+        elif isinstance(transactions, SQLiteStore):
+            category_spending = transactions.category_total_until(name_category, date)
+        else:
+            until_date = transactions_until(transactions, date)
+            category_spending = until_date[until_date["Категория"] == name_category]["Сумма операции"].sum()
         return f"Общие расходы на категорию '{name_category}': {category_spending}"
     except Exception as e:
         logging.error(f"Ошибка в rep_category_spending: {e}")
@@ -73,21 +212,22 @@ def rep_category_spending(transactions, name_category, date):
 
 
 @result_report_to_file("weekday_spending_report.txt")
+@memoize_result()
 def rep_spending_on_weekdays(transactions, date):
     """
     Расчёт расходов по дням недели до заданной даты.
 
-    :param transactions: DataFrame с транзакциями
+    :param transactions: DataFrame, TransactionStore или SQLiteStore с транзакциями
     :param date: конечная дата расчёта
     :return: строка с расходами по дням недели
     :raises: Исключение в случае ошибки
     """
     try:
         logging.info(f"Расчёт расходов по дням недели до {date}")
-        transactions["День недели"] = transactions["Дата операции"].apply(lambda x: x.weekday())
-        weekday_spending = (
-            transactions[transactions["Дата операции"] <= date].groupby("День недели")["Сумма операции"].sum()
-        )
+        if isinstance(transactions, SQLiteStore):
+            return transactions.spending_by_weekday(date).to_string()
+        until_date, features = features_until(transactions, date)
+        weekday_spending = until_date.groupby(features[WEEKDAY_COLUMN])["Сумма операции"].sum()
         return weekday_spending.to_string()
     except Exception as e:
         logging.error(f"Ошибка в rep_spending_on_weekdays: {e}")
@@ -95,22 +235,22 @@ def rep_spending_on_weekdays(transactions, date):
 
 
 @result_report_to_file("workweek_or_weekend_spending_report.txt")
+@memoize_result()
 def rep_spend_on_working_or_weekends(transactions, date):
     """
     Расчёт расходов на рабочие и выходные дни до заданной даты.
 
-    :param transactions: DataFrame с транзакциями
+    :param transactions: DataFrame, TransactionStore или SQLiteStore с транзакциями
     :param date: конечная дата расчёта
     :return: строка с расходами по типу дня (рабочий/выходной)
     :raises: Исключение в случае ошибки
     """
     try:
         logging.info(f"Расчёт расходов на рабочие и выходные до {date}")
-        transactions["День недели"] = transactions["Дата операции"].apply(lambda x: x.weekday())
-        transactions["Тип дня"] = transactions["День недели"].apply(lambda x: "Рабочий" if x < 5 else "Выходной")
-        spending_by_day_type = (
-            transactions[transactions["Дата операции"] <= date].groupby("Тип дня")["Сумма операции"].sum()
-        )
+        if isinstance(transactions, SQLiteStore):
+            return transactions.spending_by_day_type(date).to_string()
+        until_date, features = features_until(transactions, date)
+        spending_by_day_type = until_date.groupby(features[DAY_TYPE_COLUMN], observed=True)["Сумма операции"].sum()
         return spending_by_day_type.to_string()
     except Exception as e:
         logging.error(f"Ошибка в rep_spend_on_working_or_weekends: {e}")
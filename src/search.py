@@ -0,0 +1,129 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+SEARCH_MODES = ("substring", "prefix", "token")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def value_matches(value, query, mode="substring"):
+    """
+    Проверяет, соответствует ли значение поисковому запросу без учёта регистра.
+    Режимы: substring - запрос входит в значение, prefix - значение начинается с запроса,
+    token - каждое слово запроса совпадает с одним из слов значения.
+    :param value: строка, в которой выполняется поиск
+    :param query: поисковый запрос
+    :param mode: режим поиска
+    :return: True, если значение соответствует запросу
+    """
+    return _matches(value.lower(), query.lower(), mode)
+
+
+def _matches(value, query, mode):
+    """Сравнивает уже приведённые к нижнему регистру значение и запрос."""
+    if mode == "substring":
+        return query in value
+    if mode == "prefix":
+        return value.startswith(query)
+    if mode == "token":
+        tokens = set(TOKEN_PATTERN.findall(value))
+        return all(token in tokens for token in TOKEN_PATTERN.findall(query))
+    raise ValueError(f"Неизвестный режим поиска: {mode}")
+
+
+class SearchIndex:
+    """
+    Индекс по различным значениям столбца транзакций.
+    Для каждого значения хранится массив позиций строк, поэтому запрос проверяет только
+    различные значения (их сотни), а не все транзакции.
+    """
+
+    def __init__(self, values, column=None):
+        self.column = column
+        codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        self.values = list(uniques)
+        self._lowered = [value.lower() if isinstance(value, str) else None for value in self.values]
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+        # Позиции строк, упорядоченные по коду значения, нарезаются на списки для каждого значения
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+        self._postings = np.split(order, np.cumsum(counts)[:-1]) if len(self.values) else []
+
+    @classmethod
+    def from_frame(cls, df, column="Категория"):
+        """
+        Строит индекс по столбцу DataFrame с транзакциями.
+        :param df: DataFrame с транзакциями
+        :param column: название столбца
+        :return: SearchIndex
+        """
+        logging.info(f"Построение поискового индекса по столбцу {column}")
+        return cls(df[column], column)
+
+    def update(self, df):
+        """
+        Добавляет в индекс новые транзакции. Позиции строк берутся из индекса DataFrame,
+        поэтому они должны следовать за уже проиндексированными.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        codes, uniques = pd.factorize(df[self.column], use_na_sentinel=True)
+        positions = df.index.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+        for value, rows in zip(uniques, np.split(positions[order], np.cumsum(counts)[:-1]) if len(uniques) else []):
+            code = self._codes.get(value)
+            if code is None:
+                self._codes[value] = len(self.values)
+                self.values.append(value)
+                self._lowered.append(value.lower() if isinstance(value, str) else None)
+                self._postings.append(rows)
+            else:
+                self._postings[code] = np.concatenate([self._postings[code], rows])
+
+    def matching_values(self, query, mode="substring"):
+        """
+        Возвращает различные значения столбца, соответствующие запросу.
+        :param query: поисковый запрос
+        :param mode: режим поиска (substring, prefix, token)
+        :return: список значений
+        """
+        return [self.values[code] for code in self._matching_codes(query, mode)]
+
+    def search(self, query, mode="substring"):
+        """
+        Возвращает позиции строк, значение столбца которых соответствует запросу.
+        Сами транзакции не извлекаются: позиции разрешаются вызывающим кодом, например TransactionStore.records.
+        :param query: поисковый запрос
+        :param mode: режим поиска (substring, prefix, token)
+        :return: отсортированный массив позиций строк
+        """
+        postings = [self._postings[code] for code in self._matching_codes(query, mode)]
+        if not postings:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(postings))
+
+    def _matching_codes(self, query, mode):
+        """Возвращает коды значений, соответствующих запросу."""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
+        query = query.lower()
+        return [code for code, value in enumerate(self._lowered) if value is not None and _matches(value, query, mode)]
+
+
+def get_search_index(store, column="Категория"):
+    """
+    Возвращает поисковый индекс хранилища по столбцу, строя его при первом обращении.
+    :param store: TransactionStore
+    :param column: название столбца (например, "Категория" или "Описание")
+    :return: SearchIndex
+    """
+    key = ("search", column)
+    if key not in store.indexes:
+        store.indexes[key] = SearchIndex.from_frame(store.df, column)
+    return store.indexes[key]
@@ -0,0 +1,147 @@
+import datetime
+import json
+from collections.abc import Mapping
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Число элементов массива, кодируемых за один шаг при потоковой выдаче
+CHUNK_SIZE = 1000
+
+if orjson is not None:
+    # Даты передаются в _default, чтобы формат совпадал с кодированием без orjson
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(value):
+    """
+    Преобразует значение, которое кодировщик JSON не поддерживает, в простой тип Python:
+    пропуски (NaN, NaT) - в None, даты - в строку ISO 8601 (как DataFrame.to_json с date_format="iso"),
+    числа numpy - в числа Python, строки транзакций - в словари, TransactionRecords - в список словарей.
+    :param value: значение
+    :return: значение простого типа
+    :raises TypeError: если значение нельзя преобразовать
+    """
+    if value is pd.NaT:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(timespec="milliseconds")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+        return None if isinstance(value, float) and value != value else value
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Mapping):
+        return dict(value)
+    if hasattr(value, "to_dicts"):
+        return value.to_dicts()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Значение типа {type(value).__name__} нельзя преобразовать в JSON")
+
+
+def _sanitize(value):
+    """
+    Рекурсивно приводит значение к типам, которые стандартный модуль json кодирует в корректный JSON:
+    NaN заменяется на None, остальные значения преобразуются функцией _default.
+    """
+    if isinstance(value, float):
+        return None if value != value else value
+    if value is None or isinstance(value, (str, int)):
+        return value
+    if isinstance(value, dict):
+        return {key: _sanitize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_sanitize(item) for item in value]
+    if hasattr(value, "to_dicts"):
+        # TransactionRecords заменяет пропуски сам, по столбцам; даты кодируются через _default
+        return value.to_dicts(missing=None)
+    return _sanitize(_default(value))
+
+
+def dumps(value, indent=None, compact=False):
+    """
+    Кодирует значение в JSON. Пропуски (NaN, NaT) кодируются как null, даты - строками ISO 8601.
+    По умолчанию формат совпадает с json.dumps(value, ensure_ascii=False, indent=indent).
+    Компактный режим предназначен для программ-потребителей: без пробелов и отступов,
+    кодирование выполняется orjson, если он установлен.
+    :param value: значение
+    :param indent: отступ (только для обычного режима)
+    :param compact: компактный режим
+    :return: JSON строка
+    """
+    with span("json.encode"):
+        if compact and orjson is not None:
+            return orjson.dumps(value, default=_default, option=ORJSON_OPTIONS).decode("utf-8")
+        separators = (",", ":") if compact else None
+        return json.dumps(_sanitize(value), ensure_ascii=False, indent=indent, separators=separators, default=_default)
+
+
+def dumpb(value, indent=None, compact=False):
+    """
+    Кодирует значение в JSON так же, как dumps, но возвращает байты UTF-8 (для записи в сокет или файл).
+    В компактном режиме с orjson результат не декодируется в строку и не кодируется обратно.
+    :return: JSON в кодировке UTF-8
+    """
+    if compact and orjson is not None:
+        with span("json.encode"):
+            return orjson.dumps(value, default=_default, option=ORJSON_OPTIONS)
+    return dumps(value, indent=indent, compact=compact).encode("utf-8")
+
+
+def _chunks(items, chunk_size):
+    """Разбивает последовательность или итератор на списки не длиннее chunk_size."""
+    if hasattr(items, "to_dicts"):
+        # TransactionRecords: словари создаются только для текущей части
+        for start in range(0, len(items), chunk_size):
+            yield items[start:start + chunk_size].to_dicts()
+        return
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def iter_json_array(items, compact=False, chunk_size=CHUNK_SIZE, binary=False):
+    """
+    Кодирует последовательность или итератор в JSON массив по частям, не создавая всю строку в памяти.
+    Объединение частей совпадает с dumps(list(items), compact=compact).
+    :param items: последовательность, итератор или TransactionRecords
+    :param compact: компактный режим
+    :param chunk_size: число элементов, кодируемых за один шаг
+    :param binary: возвращать части в виде байтов UTF-8 (см. dumpb)
+    :return: генератор строк или байтов
+    """
+    encode = dumpb if binary else dumps
+    separator, start, end = "," if compact else ", ", "[", "]"
+    if binary:
+        separator, start, end = separator.encode(), b"[", b"]"
+    yield start
+    first = True
+    for chunk in _chunks(items, chunk_size):
+        text = encode(chunk, compact=compact)[1:-1]
+        yield text if first else separator + text
+        first = False
+    yield end
+
+
+def write_json_array(items, file, compact=False, chunk_size=CHUNK_SIZE):
+    """
+    Записывает последовательность в текстовый файл в виде JSON массива по частям.
+    :param items: последовательность, итератор или TransactionRecords
+    :param file: файловый объект, открытый на запись текста
+    :param compact: компактный режим
+    :param chunk_size: число элементов, кодируемых за один шаг
+    :return: None
+    """
+    for text in iter_json_array(items, compact=compact, chunk_size=chunk_size):
+        file.write(text)
@@ -0,0 +1,370 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import types
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from src.aggregates import get_card_aggregates, get_cashback_cube, get_category_prefix_sums
+from src.cache import dataset_fingerprint
+from src.currency import convert_store
+from src.database import SQLiteStore, get_database
+from src.logging_config import setup_logging
+from src.metrics import increment, metrics, span
+from src.records import get_records
+from src.reports import rep_category_spending, rep_spend_on_working_or_weekends, rep_spending_on_weekdays
+from src.search import SEARCH_MODES, get_search_index
+from src.serialization import dumpb, iter_json_array
+from src.services import analyze_cashback
+from src.store import get_date_index, resolve_store
+from src.timeseries import get_spend_series, series_to_dict
+from src.utils import cards_summary, num_card_account, search_transactions
+from src.views import build_dashboard, process_excel_data
+
+# Настройки сервера задаются переменными окружения
+TRANSACTIONS_FILE = os.getenv("TRANSACTIONS_FILE", "data/operations.xlsx")
+# Хранилище транзакций: memory - DataFrame в памяти процесса, sqlite - база SQLite рядом с Excel файлом
+TRANSACTIONS_BACKEND = os.getenv("TRANSACTIONS_BACKEND", "memory")
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# Максимальное число одновременно обрабатываемых запросов и время ожидания свободного места (секунды)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "5"))
+# Формат даты начала периода в параметрах /transactions и /dashboard
+DATE_FORMAT = "%d.%m.%Y"
+
+
+class BadRequest(ValueError):
+    """Ошибка в параметрах запроса (ответ 400)."""
+
+
+def _param(params, name, default=None):
+    """
+    Возвращает параметр запроса.
+    :param params: словарь параметров из parse_qs
+    :param name: имя параметра
+    :param default: значение по умолчанию; если не задано, параметр обязателен
+    :return: значение параметра
+    :raises BadRequest: если обязательный параметр не передан
+    """
+    values = params.get(name)
+    if values:
+        return values[0]
+    if default is None:
+        raise BadRequest(f"Не указан параметр '{name}'")
+    return default
+
+
+def _int_param(params, name, minimum=None, maximum=None):
+    """
+    Возвращает обязательный целочисленный параметр запроса.
+    :param minimum: наименьшее допустимое значение или None
+    :param maximum: наибольшее допустимое значение или None
+    :raises BadRequest: если параметр не передан, не является целым числом или вне диапазона
+    """
+    value = _param(params, name)
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"Параметр '{name}' должен быть целым числом")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise BadRequest(f"Параметр '{name}' должен быть от {minimum} до {maximum}")
+    return number
+
+
+def _date_param(params, name, date_format=None):
+    """
+    Возвращает обязательный параметр-дату строкой, как её принимают функции анализа, проверив её заранее.
+    :param date_format: формат даты для datetime.strptime; если не задан, дата разбирается pandas
+                        (например, 30.09.2023 или 2023-09-30), как в отчётах
+    :raises BadRequest: если параметр не передан или не является датой
+    """
+    value = _param(params, name)
+    try:
+        if date_format:
+            datetime.strptime(value, date_format)
+        else:
+            pd.Timestamp(value)
+    except ValueError:
+        expected = " в формате ДД.ММ.ГГГГ" if date_format == DATE_FORMAT else ""
+        raise BadRequest(f"Параметр '{name}' должен быть датой{expected}")
+    return value
+
+
+def _choice_param(params, name, default, choices):
+    """
+    Возвращает параметр запроса из списка допустимых значений.
+    :raises BadRequest: если значение не входит в choices
+    """
+    value = _param(params, name, default)
+    if value not in choices:
+        raise BadRequest(f"Параметр '{name}' должен быть одним из: {', '.join(choices)}")
+    return value
+
+
+class RawJSON(str):
+    """Готовая JSON строка, которая отправляется в ответе без повторного кодирования."""
+
+
+class PlainText(str):
+    """Текстовый ответ (например, метрики в формате Prometheus)."""
+
+
+def _metrics(params):
+    """Возвращает замеры в формате Prometheus или, при format=json, в виде JSON."""
+    if _param(params, "format", "prometheus") == "json":
+        return metrics.summary()
+    return PlainText(metrics.to_prometheus())
+
+
+def _store_in_currency(store, params):
+    """
+    Возвращает хранилище с суммами в валюте из параметра currency (например, USD) или исходное хранилище.
+    :raises BadRequest: если хранилище не поддерживает пересчёт валют или для пересчёта нет курсов
+    """
+    currency = _param(params, "currency", "")
+    if not currency:
+        return store
+    if isinstance(store, SQLiteStore):
+        raise BadRequest("Пересчёт в другую валюту доступен только для хранилища в памяти")
+    try:
+        return convert_store(store, currency.upper())
+    except ValueError as e:
+        # CurrencyError (нет курсов) и другие ошибки разбора параметра - ошибки запроса, а не сервера
+        raise BadRequest(str(e))
+
+
+def _series(store, params):
+    """
+    Возвращает временной ряд для графика: freq (D, W, M), by (category, card или оба через запятую),
+    value (spend, cashback, count), start и end; при window - скользящие суммы за window дней.
+    :raises BadRequest: если параметры ряда некорректны или хранилище не поддерживает ряды
+    """
+    if isinstance(store, SQLiteStore):
+        raise BadRequest("Временные ряды доступны только для хранилища в памяти")
+    freq, value = _param(params, "freq", "M"), _param(params, "value", "spend")
+    by = [name for name in _param(params, "by", "").split(",") if name] or None
+    start, end = _param(params, "start", "") or None, _param(params, "end", "") or None
+    window = _param(params, "window", "")
+    series = get_spend_series(store)
+    try:
+        if window:
+            table = series.rolling(int(window), by, value, start, end)
+        else:
+            table = series.series(freq, by, value, start, end)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return {"freq": "D" if window else freq.upper(), "value": value, **series_to_dict(table)}
+
+
+def _json(text):
+    """Помечает JSON, возвращённый функцией анализа, как готовый к отправке (None остаётся None)."""
+    return None if text is None else RawJSON(text)
+
+
+# Маршрут -> функция (хранилище, параметры запроса) -> данные ответа
+ROUTES = {
+    "/health": lambda store, params: {"status": "ok", "transactions": len(store)},
+    "/metrics": lambda store, params: _metrics(params),
+    "/transactions": lambda store, params: _json(process_excel_data(store, _date_param(params, "date", DATE_FORMAT))),
+    # Результат поиска может быть большим, поэтому он кодируется и отправляется по частям
+    "/search": lambda store, params: iter_json_array(
+        search_transactions(
+            store,
+            _param(params, "q"),
+            mode=_choice_param(params, "mode", "substring", SEARCH_MODES),
+            column=_param(params, "column", "Категория"),
+        ),
+        compact=True,
+        binary=True,
+    ),
+    "/cards": lambda store, params: _json(cards_summary(store)),
+    "/card": lambda store, params: _json(num_card_account(store, _param(params, "number"))),
+    "/cashback": lambda store, params: _json(
+        analyze_cashback(store, _int_param(params, "year"), _int_param(params, "month", 1, 12))
+    ),
+    "/reports/category": lambda store, params: {
+        "report": rep_category_spending(
+            store, _param(params, "category"), _date_param(params, "date"), save_report=False
+        )
+    },
+    "/reports/weekdays": lambda store, params: {
+        "report": rep_spending_on_weekdays(store, _date_param(params, "date"), save_report=False)
+    },
+    "/reports/day-type": lambda store, params: {
+        "report": rep_spend_on_working_or_weekends(store, _date_param(params, "date"), save_report=False)
+    },
+    "/series": _series,
+    "/dashboard": lambda store, params: asyncio.run(build_dashboard(_date_param(params, "date", DATE_FORMAT), store)),
+}
+
+
+class TransactionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик GET-запросов к функциям анализа транзакций. Ответы отдаются в компактном формате JSON
+    с заголовками Server-Timing и X-Response-Time-ms (время обработки запроса в миллисекундах).
+    При включённых замерах (METRICS_ENABLED=1) Server-Timing содержит и время этапов запроса.
+    Параметр currency (например, ?currency=USD) пересчитывает суммы транзакций в указанную валюту.
+    """
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        path = url.path.rstrip("/") or "/"
+        route = ROUTES.get(path)
+        if route is None:
+            self._send(404, {"error": f"Неизвестный адрес {url.path}"}, started)
+            return
+
+        # Ограничение числа одновременных запросов: при перегрузке запрос получает 503, а не ждёт бесконечно
+        if not self.server.slots.acquire(timeout=QUEUE_TIMEOUT):
+            increment("server.rejected_requests")
+            self._send(503, {"error": "Сервер перегружен, повторите запрос позже"}, started, {"Retry-After": "1"})
+            return
+        # Место освобождается после отправки: потоковый ответ кодируется во время записи
+        try:
+            with metrics.collect() as stages:
+                try:
+                    with span(f"server{path}"):
+                        params = parse_qs(url.query)
+                        status, body = 200, route(_store_in_currency(self.server.store, params), params)
+                except BadRequest as e:
+                    status, body = 400, {"error": str(e)}
+                except Exception as e:
+                    logging.error(f"Ошибка при обработке запроса {self.path}: {e}")
+                    status, body = 500, {"error": str(e)}
+                self._send(status, body, started, stages=stages)
+        finally:
+            self.server.slots.release()
+
+    def _send(self, status, body, started, headers=None, stages=()):
+        """
+        Отправляет JSON-ответ с заголовками времени обработки. Готовая JSON строка (RawJSON) отправляется
+        как есть, текст (PlainText) - с типом text/plain, генератор частей JSON - по мере кодирования
+        без Content-Length (соединение закрывается после ответа), остальные значения кодируются
+        в компактном режиме.
+        :param stages: этапы запроса (этап, секунды) для заголовка Server-Timing
+        """
+        content_type = "application/json; charset=utf-8"
+        if isinstance(body, types.GeneratorType):
+            data = None
+        elif isinstance(body, PlainText):
+            data, content_type = body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        elif isinstance(body, RawJSON):
+            data = body.encode("utf-8")
+        else:
+            data = dumpb(body, compact=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if data is not None:
+            self.send_header("Content-Length", str(len(data)))
+        self.send_header("Server-Timing", _server_timing(elapsed_ms, stages))
+        self.send_header("X-Response-Time-ms", f"{elapsed_ms:.2f}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if data is not None:
+            self.wfile.write(data)
+            return
+        try:
+            for chunk in body:
+                self.wfile.write(chunk)
+        except Exception as e:
+            # Заголовки уже отправлены: ответ обрывается, клиент получает неполный JSON
+            logging.error(f"Ошибка при отправке ответа {self.path}: {e}")
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logging.info("%s - " + format, self.address_string(), *args)
+
+
+def _server_timing(elapsed_ms, stages):
+    """
+    Формирует значение заголовка Server-Timing: общее время запроса и суммарное время каждого этапа.
+    :param elapsed_ms: время обработки запроса в миллисекундах
+    :param stages: список кортежей (этап, секунды)
+    :return: значение заголовка
+    """
+    totals = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    entries = [f"app;dur={elapsed_ms:.2f}"]
+    entries += [f"{name.replace('/', '.').strip('.')};dur={seconds * 1000:.2f}" for name, seconds in totals.items()]
+    return ", ".join(entries)
+
+
+class TransactionServer(ThreadingHTTPServer):
+    """
+    HTTP-сервер с одним загруженным хранилищем транзакций, общим для всех запросов.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, store, max_concurrent_requests=MAX_CONCURRENT_REQUESTS):
+        super().__init__(address, TransactionRequestHandler)
+        self.store = store
+        self.slots = threading.BoundedSemaphore(max_concurrent_requests)
+
+
+def warm_store(store):
+    """
+    Строит индексы, агрегаты, компактное представление транзакций и отпечаток хранилища до приёма запросов,
+    чтобы первые запросы не строили их одновременно в нескольких потоках.
+    :param store: TransactionStore
+    """
+    started = time.perf_counter()
+    get_date_index(store)
+    get_search_index(store, "Категория")
+    get_card_aggregates(store)
+    get_cashback_cube(store)
+    get_category_prefix_sums(store)
+    get_records(store)
+    dataset_fingerprint(store)
+    logging.info(f"Индексы и агрегаты построены за {time.perf_counter() - started:.3f} с")
+
+
+def create_server(
+    filepath=TRANSACTIONS_FILE, host=SERVER_HOST, port=SERVER_PORT, backend=TRANSACTIONS_BACKEND, **kwargs
+):
+    """
+    Загружает транзакции один раз, строит индексы и агрегаты и создаёт HTTP-сервер.
+    С хранилищем sqlite запросы выполняются к базе SQLite, которая создаётся при первом запуске.
+    :param filepath: путь к Excel файлу с транзакциями, TransactionStore или SQLiteStore
+    :param host: адрес сервера
+    :param port: порт сервера (0 - любой свободный)
+    :param backend: хранилище транзакций: memory или sqlite
+    :return: TransactionServer
+    """
+    if isinstance(filepath, SQLiteStore):
+        store = filepath
+    elif backend == "sqlite":
+        store = get_database(filepath)
+    else:
+        store = resolve_store(filepath)
+        warm_store(store)
+    return TransactionServer((host, port), store, **kwargs)
+
+
+def serve(filepath=TRANSACTIONS_FILE, host=SERVER_HOST, port=SERVER_PORT):
+    """
+    Запускает HTTP-сервер и обрабатывает запросы до остановки.
+    """
+    setup_logging()
+    server = create_server(filepath, host, port)
+    logging.info(f"Сервер запущен на http://{host}:{server.server_port}, транзакций: {len(server.store)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Сервер остановлен")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,51 +1,70 @@
-import json
 import logging
 import re
 
+import numpy as np
 import pandas as pd
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from src.aggregates import get_cashback_cube
+from src.cache import memoize_result
+from src.database import SQLiteStore
+from src.metrics import span, timed
+from src.serialization import dumps
+from src.store import resolve_store
 
+PHONE_PATTERN = re.compile(r"(?:(?:8|\+7)[\- ])?(?:\(?\d{3}\)?[\- ])[\d\- ]{7,10}")
 
+
+@memoize_result()
 def analyze_cashback(data, year, month):
     """
     Анализирует данные по операциям и рассчитывает суммы кэшбэка для каждой категории за указанный месяц.
-    :param data:
+    Результат берётся срезом куба кэшбэка месяц x категория, который строится один раз для хранилища.
+    :param data: путь к Excel файлу, файловый объект, TransactionStore или SQLiteStore
     :param year:
     :param month:
     :return:
     """
     logging.info("Начало анализа кэшбэка за %d-%02d", year, month)
+    return analyze_cashback_period(data, f"{year}-{month:02d}")
+
+
+@timed()
+def analyze_cashback_period(data, start, end=None):
+    """
+    Рассчитывает суммы кэшбэка для каждой категории за диапазон месяцев включительно.
+    Для SQLiteStore суммы считаются запросом с группировкой по категории.
+    :param data: путь к Excel файлу, файловый объект, TransactionStore или SQLiteStore
+    :param start: первый месяц в формате 'ГГГГ-ММ'
+    :param end: последний месяц в формате 'ГГГГ-ММ'; по умолчанию совпадает с первым
+    :return: JSON с суммами кэшбэка по категориям или None в случае ошибки
+    """
+    if isinstance(data, SQLiteStore):
+        try:
+            cashback_dict = data.cashback_by_category(start, end)
+            logging.info("Кэшбэк успешно рассчитан в базе")
+        except Exception as e:
+            logging.error("Ошибка расчета кэшбэка: %s", e)
+            return None
+        return dumps(cashback_dict)
 
     try:
-        df = pd.read_excel(data)
+        # Дата операции уже преобразована в datetime при загрузке хранилища
+        store = resolve_store(data)
         logging.info("Данные успешно загружены из '%s'", data)
     except Exception as e:
         logging.error("Ошибка загрузки данных: %s", e)
         return None
 
+    # Срез куба месяц x категория и суммирование кэшбэка
     try:
-        # Преобразуем столбец с датами в формат datetime
-        df["Дата операции"] = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M:%S")
-        logging.info("Столбец 'Дата операции' успешно преобразован в datetime")
-    except Exception as e:
-        logging.error("Ошибка преобразования даты: %s", e)
-        return None
-
-    # Фильтрация данных по заданному году и месяцу
-    filtered_df = df[(df["Дата операции"].dt.year == year) & (df["Дата операции"].dt.month == month)]
-    logging.info("Данные отфильтрованы: %d записей в %d-%02d", len(filtered_df), year, month)
-
-    # Группировка данных по категории и суммирование кэшбэка
-    try:
-        cashback_summary = filtered_df.groupby("Категория")["Кэшбэк"].sum()
+        cashback_summary = get_cashback_cube(store).period(start, end)["cashback"]
         logging.info("Кэшбэк успешно рассчитан")
     except Exception as e:
         logging.error("Ошибка расчета кэшбэка: %s", e)
         return None
 
     cashback_dict = cashback_summary.to_dict()
-    cashback_json = json.dumps(cashback_dict, ensure_ascii=False)
+    cashback_json = dumps(cashback_dict)
 
     logging.info("Анализ завершён успешно")
     return cashback_json
@@ -57,37 +76,72 @@ def extract_phone_numbers(description):
     :param description:
     :return:
     """
-    phone_pattern = r"(?:(?:8|\+7)[\- ])?(?:\(?\d{3}\)?[\- ])[\d\- ]{7,10}"
-    phone_numbers = re.findall(phone_pattern, description)
-    logging.debug(f"Extracted phone numbers: {phone_numbers} from description: {description}")
+    phone_numbers = PHONE_PATTERN.findall(description)
+    logging.debug("Extracted phone numbers: %s from description: %s", phone_numbers, description)
     return phone_numbers
 
 
-def get_transactions_with_phones(file_path):
+@timed()
+def get_transactions_with_phones(file_path, compact=False):
     """
     Извлекает транзакции с телефонными номерами из файла Excel.
-    :param file_path:
+    :param file_path: путь к Excel файлу, файловый объект, TransactionStore или SQLiteStore
+    :param compact: компактный JSON без отступов для программ-потребителей (см. serialization.dumps)
     :return:
     """
-    # Чтение Excel файла
-    df = pd.read_excel(file_path)
+    if isinstance(file_path, SQLiteStore):
+        return _transactions_with_phones_sqlite(file_path, compact)
+
+    df = resolve_store(file_path).df
 
     # Проверка, что файл содержит нужный столбец
     if "Описание" not in df.columns:
         raise ValueError("Нет столбца 'Описание' в файле.")
 
-    transactions_with_phones = []
+    # Описания повторяются (названия магазинов), поэтому номера ищутся один раз для каждого различного описания
+    with span("services.phone_scan", rows=len(df)):
+        descriptions = df["Описание"].str.strip()
+        codes, uniques = pd.factorize(descriptions)
+        phones_by_code = [PHONE_PATTERN.findall(description) for description in uniques]
+    logging.debug("Поиск телефонов: %d строк, %d различных описаний", len(df), len(uniques))
 
-    # Обработка каждой строки
-    for index, row in df.iterrows():
-        description = row["Описание"].strip()
-        logging.debug(f"Обработка строки {index}: {description}")
-        phone_numbers = extract_phone_numbers(description)
+    # Код -1 (пустое описание) попадает на последний элемент массива, равный False
+    has_phones = np.array([bool(phones) for phones in phones_by_code] + [False])
+    mask = has_phones[codes]
 
-        if phone_numbers:
-            transaction_info = {"index": index, "description": description, "phone_numbers": phone_numbers}
-            transactions_with_phones.append(transaction_info)
-            logging.debug(f"Добавлена транзакция с телефонами: {transaction_info}")
+    transactions_with_phones = [
+        {"index": index, "description": uniques[code], "phone_numbers": phones_by_code[code]}
+        for index, code in zip(df.index[mask].tolist(), codes[mask].tolist())
+    ]
+    logging.info("Найдено транзакций с телефонами: %d", len(transactions_with_phones))
 
     # Возвращаем JSON
-    return json.dumps(transactions_with_phones, ensure_ascii=False, indent=4)
+    return dumps(transactions_with_phones, indent=4, compact=compact)
+
+
+def _transactions_with_phones_sqlite(database, compact=False):
+    """
+    Извлекает транзакции с телефонными номерами из базы SQLite: номера ищутся в различных описаниях,
+    а из базы выбираются только транзакции с найденными описаниями.
+    :param database: SQLiteStore
+    :param compact: компактный JSON без отступов
+    :return: JSON со списком транзакций
+    """
+    if "Описание" not in database.columns():
+        raise ValueError("Нет столбца 'Описание' в файле.")
+
+    phones_by_description = {}
+    for description in database.distinct_values("Описание"):
+        if isinstance(description, str):
+            phones = PHONE_PATTERN.findall(description.strip())
+            if phones:
+                phones_by_description[description] = phones
+
+    transactions_with_phones = []
+    for position, record in database.records_where_in("Описание", phones_by_description, fields=["Описание"]):
+        description = record["Описание"]
+        transactions_with_phones.append(
+            {"index": position, "description": description.strip(), "phone_numbers": phones_by_description[description]}
+        )
+    logging.info("Найдено транзакций с телефонами: %d", len(transactions_with_phones))
+    return dumps(transactions_with_phones, indent=4, compact=compact)
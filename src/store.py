@@ -0,0 +1,422 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import gauge, increment, span
+
+try:
+    from pyarrow import feather
+except ImportError:
+    feather = None
+
+DATE_COLUMN = "Дата операции"
+DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
+# Столбцы с повторяющимися значениями хранятся как category: каждая строка хранится один раз
+CATEGORICAL_COLUMNS = ("Категория", "Номер карты", "Статус", "Валюта операции", "Валюта платежа")
+AMOUNT_COLUMNS = ("Сумма операции", "Сумма платежа", "Кэшбэк", "Сумма операции с округлением")
+
+# Производные столбцы, вычисляемые при загрузке по дате операции
+WEEKDAY_COLUMN = "День недели"
+DAY_TYPE_COLUMN = "Тип дня"
+DAY_TYPES = ["Выходной", "Рабочий"]
+
+# Каталог с колоночным кэшем создаётся рядом с исходным Excel файлом
+CACHE_DIR_NAME = ".transactions_cache"
+CACHE_FORMAT = "feather" if feather is not None else "pickle"
+
+# Загруженные хранилища: абсолютный путь -> (размер, mtime, хранилище)
+_stores = {}
+
+
+def date_features(df):
+    """
+    Вычисляет производные от даты операции столбцы: день недели (0 - понедельник, Int8)
+    и тип дня (категория 'Рабочий'/'Выходной'). Исходный DataFrame не изменяется.
+    :param df: DataFrame с транзакциями
+    :return: DataFrame с тем же индексом и столбцами "День недели" и "Тип дня"
+    """
+    features = pd.DataFrame(index=df.index)
+    if DATE_COLUMN not in df.columns:
+        return features
+
+    weekday = df[DATE_COLUMN].dt.weekday.astype("Int8")
+    codes = np.where(weekday.isna(), -1, (weekday < 5).fillna(False).astype(np.int8))
+    features[WEEKDAY_COLUMN] = weekday
+    features[DAY_TYPE_COLUMN] = pd.Categorical.from_codes(codes, categories=DAY_TYPES)
+    return features
+
+
+class DateIndex:
+    """
+    Индекс транзакций по дате операции: позиции строк, упорядоченные по дате, и отсортированный массив дат.
+    Выборка "до даты" или "с даты по дату" выполняется бинарным поиском без сравнения всего столбца.
+    Транзакции без даты в индекс не попадают.
+    """
+
+    def __init__(self, dates):
+        values = dates.to_numpy()
+        valid = np.flatnonzero(~pd.isna(values))
+        self.order = valid[np.argsort(values[valid], kind="stable")]
+        self.sorted_dates = values[self.order]
+
+    def positions_between(self, start=None, end=None):
+        """
+        Возвращает позиции строк с датой операции в диапазоне [start, end] в исходном порядке строк.
+        :param start: начальная дата (включительно) или None
+        :param end: конечная дата (включительно) или None
+        :return: массив позиций строк
+        """
+        low = 0 if start is None else np.searchsorted(self.sorted_dates, _to_datetime64(start), "left")
+        high = len(self.order) if end is None else np.searchsorted(self.sorted_dates, _to_datetime64(end), "right")
+        # Исходный порядок строк сохраняет порядок вывода и порядок суммирования
+        return np.sort(self.order[low:high])
+
+    def update(self, df):
+        """
+        Добавляет в индекс новые транзакции. Позиции строк берутся из индекса DataFrame.
+        Новые даты вставляются в отсортированный массив без повторной сортировки всей истории.
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        dates = df[DATE_COLUMN]
+        dates = dates[dates.notna()].sort_values(kind="stable")
+        if dates.empty:
+            return
+        values = dates.to_numpy().astype(self.sorted_dates.dtype)
+        positions = dates.index.to_numpy()
+        if not len(self.sorted_dates) or values[0] >= self.sorted_dates[-1]:
+            self.order = np.concatenate([self.order, positions])
+            self.sorted_dates = np.concatenate([self.sorted_dates, values])
+        else:
+            # При равных датах новые строки идут после старых, как при стабильной сортировке
+            insert_at = np.searchsorted(self.sorted_dates, values, "right")
+            self.order = np.insert(self.order, insert_at, positions)
+            self.sorted_dates = np.insert(self.sorted_dates, insert_at, values)
+
+
+def _to_datetime64(value):
+    """Преобразует дату (строку, datetime или Timestamp) в numpy.datetime64 так же, как при сравнении в pandas."""
+    return pd.Timestamp(value).to_datetime64()
+
+
+def normalize_transactions(df):
+    """
+    Приводит типы столбцов DataFrame с транзакциями к единому виду:
+    дата операции - datetime, категория, номер карты, статус и валюты - category, суммы - float.
+    Отсутствующие столбцы пропускаются.
+    :param df: DataFrame, прочитанный из Excel файла
+    :return: DataFrame с нормализованными типами
+    """
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        try:
+            df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT)
+        except (ValueError, TypeError):
+            df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], dayfirst=True)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+
+    for column in AMOUNT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).astype("float64")
+
+    return df
+
+
+class TransactionStore:
+    """
+    Хранилище транзакций: Excel файл читается и нормализуется один раз,
+    после чего DataFrame используется всеми функциями анализа.
+    """
+
+    def __init__(self, df, source=None):
+        self.df = df
+        self.source = source
+        # Производные столбцы хранятся отдельно, чтобы не попадать в выгрузку транзакций
+        self.features = date_features(df)
+        # Производные структуры (индексы, агрегаты), построенные по df; живут вместе с хранилищем
+        self.indexes = {}
+
+    @classmethod
+    def from_excel(cls, filepath):
+        """
+        Читает Excel файл с транзакциями и создаёт хранилище.
+        :param filepath: путь к Excel файлу или файловый объект
+        :return: TransactionStore
+        """
+        logging.info(f"Загрузка транзакций в хранилище из {filepath}")
+        with span("excel.parse") as parse:
+            raw = pd.read_excel(filepath)
+            parse.rows = len(raw)
+        with span("store.normalize", rows=len(raw)):
+            df = normalize_transactions(raw)
+        logging.info(f"Хранилище загружено. Количество транзакций: {len(df)}")
+        return cls(df, filepath)
+
+    def __len__(self):
+        return len(self.df)
+
+    def append(self, df):
+        """
+        Добавляет нормализованные транзакции в конец хранилища. Производные столбцы, индексы и агрегаты
+        дополняются только новыми строками через их метод update(); структуры без update() удаляются
+        и строятся заново при следующем обращении.
+        :param df: нормализованный DataFrame с новыми транзакциями
+        :return: добавленные строки с позициями в хранилище в качестве индекса
+        """
+        if df.empty:
+            return df.iloc[0:0]
+
+        extra = [column for column in df.columns if column not in self.df.columns]
+        if extra:
+            logging.warning(f"Столбцы отсутствуют в хранилище и не будут добавлены: {', '.join(extra)}")
+
+        new_rows = df.reindex(columns=self.df.columns)
+        new_rows.index = pd.RangeIndex(len(self.df), len(self.df) + len(new_rows))
+
+        # Категории объединяются (в отсортированном виде, как при загрузке), чтобы столбцы остались category
+        combined = self.df.copy(deep=False)
+        for column in CATEGORICAL_COLUMNS:
+            if column in combined.columns:
+                new_values = new_rows[column].astype("category")
+                categories = combined[column].cat.categories.union(new_values.cat.categories)
+                combined[column] = combined[column].cat.set_categories(categories)
+                new_rows[column] = new_values.cat.set_categories(categories)
+
+        self.df = pd.concat([combined, new_rows])
+        self.features = pd.concat([self.features, date_features(new_rows)])
+
+        for key, index in list(self.indexes.items()):
+            if hasattr(index, "update"):
+                index.update(new_rows)
+            else:
+                del self.indexes[key]
+
+        logging.info(f"В хранилище добавлено {len(new_rows)} транзакций, всего: {len(self.df)}")
+        return new_rows
+
+    def records(self, rows=None):
+        """
+        Возвращает транзакции в виде списка словарей.
+        Дата операции отдаётся строкой в формате банковской выписки.
+        :param rows: позиции строк, которые нужно вернуть; по умолчанию все транзакции
+        :return: список словарей транзакций
+        """
+        df = self.df if rows is None else self.df.iloc[rows]
+        if DATE_COLUMN in df.columns:
+            df = df.assign(**{DATE_COLUMN: df[DATE_COLUMN].dt.strftime(DATE_FORMAT)})
+        return df.to_dict("records")
+
+
+def file_hash(filepath):
+    """
+    Вычисляет SHA-256 содержимого файла.
+    :param filepath: путь к файлу
+    :return: шестнадцатеричная строка хэша
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_paths(filepath):
+    """
+    Возвращает пути к файлу колоночного кэша и файлу его метаданных для Excel файла.
+    :param filepath: абсолютный путь к Excel файлу
+    :return: кортеж (путь к данным, путь к метаданным)
+    """
+    directory, name = os.path.split(filepath)
+    base = os.path.join(directory, CACHE_DIR_NAME, name)
+    return f"{base}.{CACHE_FORMAT}", f"{base}.json"
+
+
+def read_cached_frame(filepath, stat):
+    """
+    Читает нормализованный DataFrame из колоночного кэша, если кэш соответствует файлу.
+    Кэш считается актуальным при совпадении размера и времени изменения; если время изменения
+    отличается, а размер совпадает, сравнивается хэш содержимого.
+    :param filepath: абсолютный путь к Excel файлу
+    :param stat: результат os.stat для Excel файла
+    :return: DataFrame или None, если кэш отсутствует или устарел
+    """
+    data_path, meta_path = cache_paths(filepath)
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("format") != CACHE_FORMAT or meta.get("size") != stat.st_size:
+        return None
+
+    if meta.get("mtime_ns") != stat.st_mtime_ns:
+        if meta.get("sha256") != file_hash(filepath):
+            return None
+        # Содержимое не изменилось, обновляем время изменения в метаданных
+        meta["mtime_ns"] = stat.st_mtime_ns
+        write_atomic(meta_path, json.dumps(meta).encode())
+
+    try:
+        if CACHE_FORMAT == "feather":
+            # Файл читается без memory_map: to_pandas всё равно копирует данные в блоки pandas.
+            # self_destruct освобождает буферы Arrow по мере преобразования столбцов, а split_blocks
+            # не склеивает столбцы в общие блоки, поэтому пиковая память близка к размеру одного DataFrame
+            df = feather.read_table(data_path).to_pandas(self_destruct=True, split_blocks=True)
+        else:
+            df = pd.read_pickle(data_path)
+    except Exception as e:
+        logging.warning(f"Не удалось прочитать кэш {data_path}: {e}")
+        return None
+
+    logging.info(f"Транзакции загружены из кэша {data_path}")
+    return df
+
+
+def write_cached_frame(filepath, stat, df):
+    """
+    Сохраняет нормализованный DataFrame в колоночный кэш рядом с Excel файлом.
+    Ошибки записи кэша не прерывают работу, а только регистрируются.
+    :param filepath: абсолютный путь к Excel файлу
+    :param stat: результат os.stat для Excel файла на момент чтения
+    :param df: нормализованный DataFrame
+    """
+    data_path, meta_path = cache_paths(filepath)
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_path = _temp_path(data_path)
+        try:
+            if CACHE_FORMAT == "feather":
+                feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+            else:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+
+        meta = {
+            "format": CACHE_FORMAT,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_hash(filepath),
+        }
+        write_atomic(meta_path, json.dumps(meta).encode())
+        logging.info(f"Кэш транзакций сохранён в {data_path}")
+    except Exception as e:
+        logging.warning(f"Не удалось сохранить кэш {data_path}: {e}")
+
+
+def _temp_path(path):
+    """
+    Возвращает имя временного файла рядом с path, уникальное для процесса и потока,
+    чтобы одновременные записи одного кэша не перезаписывали временные файлы друг друга.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _remove_quietly(path):
+    """Удаляет файл, если он существует."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_atomic(path, data):
+    """
+    Записывает данные в уникальный для процесса и потока временный файл рядом с path и атомарно
+    переименовывает его, чтобы читатель не увидел частично записанный файл. При ошибке временный файл удаляется.
+    :param path: путь к файлу
+    :param data: записываемые байты
+    """
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def get_date_index(store):
+    """
+    Возвращает индекс хранилища по дате операции, строя его при первом обращении.
+    :param store: TransactionStore
+    :return: DateIndex
+    """
+    key = ("date",)
+    if key not in store.indexes:
+        store.indexes[key] = DateIndex(store.df[DATE_COLUMN])
+    return store.indexes[key]
+
+
+def get_store(filepath, use_cache=True):
+    """
+    Возвращает хранилище для указанного файла, загружая его только при первом обращении
+    или если файл изменился (по размеру и времени изменения).
+    При use_cache=True нормализованные данные берутся из колоночного кэша на диске,
+    а при его отсутствии или устаревании кэш создаётся заново. Транзакции, добавленные загрузкой выписок,
+    восстанавливаются из журнала (restore_ingested).
+    Файловые объекты и недоступные по stat пути не кэшируются.
+    :param filepath: путь к Excel файлу или файловый объект
+    :param use_cache: использовать ли колоночный кэш на диске
+    :return: TransactionStore
+    """
+    try:
+        key = os.path.abspath(filepath)
+        stat = os.stat(key)
+    except (TypeError, OSError):
+        return TransactionStore.from_excel(filepath)
+
+    cached = _stores.get(key)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        logging.info(f"Используется загруженное хранилище для {filepath}")
+        increment("store.memory_hits")
+        return cached[2]
+
+    with span("store.cache_read"):
+        df = read_cached_frame(key, stat) if use_cache else None
+    if df is not None:
+        increment("store.cache_hits")
+        # Нормализация повторяется, чтобы кэш, записанный прежней версией, получил текущие типы столбцов
+        with span("store.normalize", rows=len(df)):
+            df = normalize_transactions(df)
+        store = TransactionStore(df, filepath)
+    else:
+        store = TransactionStore.from_excel(filepath)
+        if use_cache:
+            write_cached_frame(key, stat, store.df)
+
+    # Импорт внутри функции: модуль ingest сам использует хранилище.
+    # Загруженные выписки хранятся отдельно от кэша Excel файла и добавляются после его чтения
+    from src.ingest import restore_ingested
+
+    restore_ingested(store)
+    _stores[key] = (stat.st_size, stat.st_mtime_ns, store)
+    gauge("store.transactions", len(store))
+    return store
+
+
+def resolve_store(source):
+    """
+    Возвращает хранилище транзакций для источника: готовое хранилище возвращается как есть,
+    путь к файлу или файловый объект загружается через get_store.
+    :param source: TransactionStore, путь к Excel файлу или файловый объект
+    :return: TransactionStore
+    """
+    if isinstance(source, TransactionStore):
+        return source
+    return get_store(source)
+
+
+def clear_stores():
+    """Очищает кэш загруженных хранилищ."""
+    _stores.clear()
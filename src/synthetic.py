@@ -0,0 +1,255 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.ingest import CSV_OPTIONS
+
+# Столбцы выписки банка в порядке data/operations.xlsx
+STATEMENT_COLUMNS = (
+    "Дата операции",
+    "Дата платежа",
+    "Номер карты",
+    "Статус",
+    "Сумма операции",
+    "Валюта операции",
+    "Сумма платежа",
+    "Валюта платежа",
+    "Кэшбэк",
+    "Категория",
+    "MCC",
+    "Описание",
+    "Бонусы (включая кэшбэк)",
+    "Округление на инвесткопилку",
+    "Сумма операции с округлением",
+)
+
+# Профили категорий по data/operations.xlsx:
+# (категория, частота, коды MCC, описания, медиана суммы, доля поступлений, доля операций с кэшбэком)
+CATEGORY_PROFILES = (
+    ("Супермаркеты", 2274, (5411, 5499), ("Колхоз", "Магнит", "SPAR", "Пятёрочка", "Перекрёсток"), 110, 0.0, 0.1),
+    ("Фастфуд", 1291, (5814,), ("McDonald's", "Rumyanyj Khleb", "Теремок", "KFC"), 110, 0.0, 0.04),
+    ("Транспорт", 383, (4121, 4131), ("Яндекс Такси", "Метро Санкт-Петербург", "Стрелка"), 186, 0.0, 0.3),
+    ("Переводы", 351, (6012,), ("Перевод на карту", "Пополнение счета", "Перевод Кредитная карта"), 500, 0.34, 0.0),
+    ("Ж/д билеты", 245, (4111, 4112), ("РЖД", "Московский метрополитен"), 300, 0.05, 0.39),
+    ("Различные товары", 227, (5331, 5311), ("Улыбка радуги", "Fix Price"), 130, 0.01, 0.06),
+    ("Связь", 194, (4814, 7379), ("МТС", "REG.RU", "Билайн"), 250, 0.0, 0.0),
+    ("Пополнения", 183, (6012,), ("Перевод с карты", "Внесение наличных через банкомат Тинькофф"), 7000, 1.0, 0.0),
+    ("Аптеки", 152, (5912,), ("Apteka 7", "Аптека Вита", "Ригла"), 351, 0.0, 0.45),
+    ("Каршеринг", 119, (7512,), ("Ситидрайв", "Делимобиль"), 50, 0.03, 0.0),
+    ("Рестораны", 117, (5812, 5813), ('OOO "Nord-S"', "Kebab 24 Mm", "Fethiye Restoran"), 111, 0.0, 0.03),
+    ("Бонусы", 103, (), ("Вознаграждение за операции покупок", "Проценты на остаток по счету"), 390, 1.0, 0.0),
+    ("Наличные", 100, (6011, 6538), ("Снятие в банкомате Сбербанк", "Снятие в банкомате Тинькофф"), 3500, 0.0, 0.0),
+    ("Дом и ремонт", 99, (5211, 5200), ("Строитель", "МаксидоМ", "Леруа Мерлен"), 320, 0.0, 0.08),
+    ("Услуги банка", 93, (), ("Плата за оповещения об операциях", "Плата за обслуживание"), 59, 0.0, 0.0),
+    ("Образование", 75, (8220, 8299), ("СПбПУ", "СКОЛКОВО"), 84, 0.0, 0.0),
+    ("Топливо", 75, (5541,), ("Circle K", "AZS 78", "ЛУКОЙЛ"), 149, 0.0, 0.04),
+    ("Другое", 65, (4900, 5817), ("Петроэлектросбыт", "Федеральная Налоговая Служба"), 1622, 0.08, 0.0),
+    ("Одежда и обувь", 65, (5641, 5651), ("Детки", "WILDBERRIES"), 419, 0.0, 0.14),
+    ("ЖКХ", 48, (), ("ЖКУ Дом", "ЖКУ Квартира", "Электричество"), 2274, 0.0, 0.0),
+    ("Цветы", 33, (5992, 5193), ("Cvety Opt Roznica", "OOO Stil"), 300, 0.0, 0.03),
+)
+# Доля транзакций без категории
+MISSING_CATEGORY_SHARE = 0.006
+# Категории, операции в которых чаще всего выполняются без карты
+NO_CARD_CATEGORIES = frozenset(("Переводы", "Пополнения", "Бонусы", "Услуги банка", "ЖКХ"))
+NO_CARD_SHARE = 0.75
+CARD_WEIGHTS = {"*7197": 0.8, "*4556": 0.19, "*5091": 0.008, "*5441": 0.0015, "*1112": 0.0005}
+# Валюта операции и примерный курс к рублю; операции в юанях оплачиваются в юанях
+CURRENCY_WEIGHTS = {"RUB": 0.98, "TRY": 0.011, "EUR": 0.0043, "CNY": 0.0027, "USD": 0.0015}
+CURRENCY_RATES = {"RUB": 1.0, "TRY": 6.5, "EUR": 85.0, "CNY": 11.5, "USD": 75.0}
+FAILED_SHARE = 0.006
+# Доля операций с телефоном в описании и число различных номеров
+PHONE_SHARE = 0.016
+PHONE_NUMBERS = 500
+PHONE_PREFIXES = ("Тинькофф Мобайл", "Я МТС", "Перевод по номеру телефона", "Билайн")
+# Доля операций с округлением на инвесткопилку и шаг округления
+INVEST_ROUNDING_SHARE = 0.05
+INVEST_ROUNDING_STEP = 50
+
+DEFAULT_SEED = 42
+DEFAULT_START = "2018-01-01"
+DEFAULT_END = "2021-12-31 23:59:59"
+CHUNK_SIZE = 1_000_000
+# Максимальное число строк данных на листе Excel (без строки заголовка)
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def _format_dates(values, with_time=True):
+    """Форматирует массив datetime64 как в выписке банка: 'ДД.ММ.ГГГГ ЧЧ:ММ:СС' или 'ДД.ММ.ГГГГ'."""
+    if with_time:
+        return [f"{s[8:10]}.{s[5:7]}.{s[:4]} {s[11:]}" for s in np.datetime_as_string(values, unit="s").tolist()]
+    return [f"{s[8:10]}.{s[5:7]}.{s[:4]}" for s in np.datetime_as_string(values, unit="D").tolist()]
+
+
+def _choice(rng, options, weights, size):
+    """Выбирает значения из options с вероятностями, пропорциональными weights."""
+    weights = np.asarray(weights, dtype=float)
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=size, p=weights / weights.sum())]
+
+
+def generate_chunk(rows, rng, start, end):
+    """
+    Генерирует часть выписки: rows транзакций с датами операций в диапазоне [start, end], от новых к старым.
+    :param rows: число транзакций
+    :param rng: генератор случайных чисел numpy
+    :param start: начальная дата (datetime64)
+    :param end: конечная дата (datetime64)
+    :return: DataFrame со столбцами STATEMENT_COLUMNS
+    """
+    seconds = int((end - start) / np.timedelta64(1, "s"))
+    dates = start + np.sort(rng.integers(0, seconds + 1, size=rows))[::-1].astype("timedelta64[s]")
+    payment_dates = dates + rng.integers(0, 4, size=rows).astype("timedelta64[D]")
+
+    # Профиль категории для каждой строки
+    profile = rng.choice(len(CATEGORY_PROFILES), size=rows, p=_category_weights())
+    categories = np.array([item[0] for item in CATEGORY_PROFILES], dtype=object)[profile]
+    median = np.array([item[4] for item in CATEGORY_PROFILES], dtype=float)[profile]
+    income_share = np.array([item[5] for item in CATEGORY_PROFILES])[profile]
+    cashback_share = np.array([item[6] for item in CATEGORY_PROFILES])[profile]
+
+    descriptions = np.empty(rows, dtype=object)
+    mcc = np.full(rows, np.nan)
+    for number, (_, _, codes, names, _, _, _) in enumerate(CATEGORY_PROFILES):
+        selected = np.flatnonzero(profile == number)
+        descriptions[selected] = np.asarray(names, dtype=object)[rng.integers(0, len(names), size=len(selected))]
+        if codes:
+            mcc[selected] = np.asarray(codes, dtype=float)[rng.integers(0, len(codes), size=len(selected))]
+
+    # Описания с телефонными номерами (для get_transactions_with_phones)
+    phones = np.flatnonzero(rng.random(rows) < PHONE_SHARE)
+    numbers = rng.integers(0, PHONE_NUMBERS, size=len(phones))
+    prefixes = rng.integers(0, len(PHONE_PREFIXES), size=len(phones))
+    descriptions[phones] = [
+        f"{PHONE_PREFIXES[prefix]} +7 9{number % 100:02d} {number:03d}-{number % 89 + 10:02d}-{number % 97:02d}"
+        for prefix, number in zip(prefixes.tolist(), numbers.tolist())
+    ]
+    categories[phones] = "Связь"
+
+    cards = _choice(rng, list(CARD_WEIGHTS), list(CARD_WEIGHTS.values()), rows)
+    no_card = np.isin(categories, list(NO_CARD_CATEGORIES)) & (rng.random(rows) < NO_CARD_SHARE)
+    cards[no_card] = None
+    categories[rng.random(rows) < MISSING_CATEGORY_SHARE] = None
+
+    # Суммы: логнормальное распределение вокруг медианы категории, поступления положительны
+    magnitude = np.round(median * rng.lognormal(0.0, 0.9, size=rows), 2)
+    amounts = np.where(rng.random(rows) < income_share, magnitude, -magnitude)
+
+    weights = np.array(list(CURRENCY_WEIGHTS.values()))
+    currency = rng.choice(len(CURRENCY_WEIGHTS), size=rows, p=weights / weights.sum())
+    currencies = np.array(list(CURRENCY_WEIGHTS), dtype=object)[currency]
+    rate = np.array([CURRENCY_RATES[name] for name in CURRENCY_WEIGHTS])[currency]
+    operation_amounts = np.where(currencies == "RUB", amounts, np.round(amounts / rate, 2))
+    payment_currencies = np.where(currencies == "CNY", "CNY", "RUB").astype(object)
+    payment_amounts = np.where(payment_currencies == "CNY", operation_amounts, amounts)
+
+    spending = amounts < 0
+    cashback = np.where(
+        spending & (rng.random(rows) < cashback_share), np.floor(magnitude * rng.uniform(0.01, 0.05, rows)), np.nan
+    )
+    bonuses = np.where(spending, magnitude // 100, 0).astype(np.int64)
+    rounded = magnitude.copy()
+    invest = spending & (rng.random(rows) < INVEST_ROUNDING_SHARE)
+    rounded[invest] = np.ceil(magnitude[invest] / INVEST_ROUNDING_STEP) * INVEST_ROUNDING_STEP
+    invest_rounding = np.round(rounded - magnitude).astype(np.int64)
+
+    statuses = np.where(rng.random(rows) < FAILED_SHARE, "FAILED", "OK").astype(object)
+
+    return pd.DataFrame(
+        {
+            "Дата операции": _format_dates(dates),
+            "Дата платежа": _format_dates(payment_dates, with_time=False),
+            "Номер карты": cards,
+            "Статус": statuses,
+            "Сумма операции": operation_amounts,
+            "Валюта операции": currencies,
+            "Сумма платежа": payment_amounts,
+            "Валюта платежа": payment_currencies,
+            "Кэшбэк": cashback,
+            "Категория": categories,
+            "MCC": mcc,
+            "Описание": descriptions,
+            "Бонусы (включая кэшбэк)": bonuses,
+            "Округление на инвесткопилку": invest_rounding,
+            "Сумма операции с округлением": rounded,
+        },
+        columns=list(STATEMENT_COLUMNS),
+    )
+
+
+def _category_weights():
+    """Возвращает вероятности профилей категорий."""
+    weights = np.array([item[1] for item in CATEGORY_PROFILES], dtype=float)
+    return weights / weights.sum()
+
+
+def iter_statement_chunks(rows, seed=DEFAULT_SEED, start=DEFAULT_START, end=DEFAULT_END, chunk_size=CHUNK_SIZE):
+    """
+    Генерирует выписку по частям, чтобы выписку из миллионов строк можно было записать без её сборки в памяти.
+    Диапазон дат делится между частями, поэтому даты убывают по всей выписке, как в выписке банка.
+    При одинаковых rows, seed и chunk_size результат совпадает.
+    :param rows: число транзакций
+    :param seed: начальное значение генератора случайных чисел
+    :param start: первая дата выписки
+    :param end: последняя дата выписки
+    :param chunk_size: число транзакций в части
+    :return: генератор DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    start, end = np.datetime64(pd.Timestamp(start), "s"), np.datetime64(pd.Timestamp(end), "s")
+    span = end - start
+    generated = 0
+    while generated < rows:
+        size = min(chunk_size, rows - generated)
+        # Часть с первыми строками получает самые поздние даты
+        chunk_end = end - span * generated // rows
+        chunk_start = end - span * (generated + size) // rows
+        yield generate_chunk(size, rng, chunk_start, chunk_end)
+        generated += size
+
+
+def generate_statement(rows, seed=DEFAULT_SEED, start=DEFAULT_START, end=DEFAULT_END, chunk_size=CHUNK_SIZE):
+    """
+    Генерирует синтетическую выписку банка с теми же 15 столбцами, что и data/operations.xlsx:
+    распределения категорий, кодов MCC, карт, валют и сумм взяты из неё, часть описаний содержит телефоны.
+    :param rows: число транзакций
+    :param seed: начальное значение генератора случайных чисел
+    :return: DataFrame с транзакциями (даты в виде строк, как при чтении Excel файла)
+    """
+    chunks = list(iter_statement_chunks(rows, seed, start, end, chunk_size))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_statement(filepath, rows, seed=DEFAULT_SEED, chunk_size=CHUNK_SIZE, **options):
+    """
+    Записывает синтетическую выписку в файл .xlsx или .csv (разделитель ';' и десятичная запятая, как CSV_OPTIONS).
+    CSV записывается по частям; Excel ограничен EXCEL_MAX_ROWS строками.
+    :param filepath: путь к файлу
+    :param rows: число транзакций
+    :param seed: начальное значение генератора случайных чисел
+    :param chunk_size: число транзакций в части
+    :param options: start и end для iter_statement_chunks
+    :return: путь к файлу
+    :raises ValueError: если формат не поддерживается или строк больше, чем помещается на лист Excel
+    """
+    extension = os.path.splitext(str(filepath))[1].lower()
+    if extension not in (".csv", ".xlsx"):
+        raise ValueError(f"Неподдерживаемый формат выписки: {extension}")
+    if extension == ".xlsx" and rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"Лист Excel вмещает не больше {EXCEL_MAX_ROWS} строк, запрошено {rows}")
+
+    directory = os.path.dirname(str(filepath))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    chunks = iter_statement_chunks(rows, seed, chunk_size=chunk_size, **options)
+    if extension == ".xlsx":
+        pd.concat(list(chunks), ignore_index=True).to_excel(filepath, index=False)
+    else:
+        with open(filepath, "w", encoding="utf-8", newline="") as file:
+            for number, chunk in enumerate(chunks):
+                chunk.to_csv(file, header=number == 0, index=False, **CSV_OPTIONS)
+    logging.info(f"Записана синтетическая выписка {filepath}: {rows} транзакций")
+    return filepath
@@ -0,0 +1,231 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.aggregates import AMOUNT_COLUMN, CARD_COLUMN, CASHBACK_COLUMN, CATEGORY_COLUMN
+from src.metrics import span
+from src.store import DATE_COLUMN, resolve_store
+
+# Периоды рядов: день, неделя (с понедельника по воскресенье) и месяц
+FREQUENCIES = ("D", "W", "M")
+# Разрезы рядов и показатели
+GROUP_COLUMNS = {"category": CATEGORY_COLUMN, "card": CARD_COLUMN}
+VALUES = ("spend", "cashback", "count")
+# Стандартные окна скользящих сумм (в днях)
+ROLLING_WINDOWS = (7, 30, 90)
+# Подпись группы для транзакций без категории или номера карты
+UNKNOWN_LABEL = "Не указано"
+TOTAL_LABEL = "Всего"
+
+
+class SpendSeries:
+    """
+    Временные ряды расходов и кэшбэка: суммы по дням в разрезе категории и карты, из которых строятся
+    ряды по дням, неделям и месяцам, скользящие суммы и изменения к предыдущему месяцу.
+    Ряды по периодам кэшируются; при добавлении транзакций пересчитываются только дни и периоды,
+    начиная с самой ранней даты новых транзакций.
+    """
+
+    def __init__(self):
+        # DataFrame с индексом (день, категория, карта) и столбцами spend, cashback, count
+        index = pd.MultiIndex.from_arrays(
+            [pd.DatetimeIndex([]), pd.Index([], dtype=str), pd.Index([], dtype=str)],
+            names=["day", CATEGORY_COLUMN, CARD_COLUMN],
+        )
+        self.daily = pd.DataFrame({value: pd.Series(dtype="float64") for value in VALUES}, index=index)
+        # (период, разрез) -> суммы по периодам
+        self._resampled = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Строит ряды по DataFrame с транзакциями.
+        :param df: DataFrame с транзакциями (дата операции должна быть datetime)
+        :return: SpendSeries
+        """
+        series = cls()
+        series.update(df)
+        return series
+
+    @staticmethod
+    def _group(df):
+        """Суммирует транзакции по дню, категории и карте. Транзакции без даты пропускаются."""
+        df = df[df[DATE_COLUMN].notna()]
+        values = pd.DataFrame(
+            {
+                "spend": df[AMOUNT_COLUMN].fillna(0.0) if AMOUNT_COLUMN in df.columns else 0.0,
+                "cashback": df[CASHBACK_COLUMN].fillna(0.0) if CASHBACK_COLUMN in df.columns else 0.0,
+                "count": 1.0,
+            },
+            index=df.index,
+        )
+        keys = [df[DATE_COLUMN].dt.normalize().rename("day")]
+        for column in GROUP_COLUMNS.values():
+            if column not in df.columns:
+                keys.append(pd.Series(UNKNOWN_LABEL, index=df.index, name=column))
+                continue
+            labels = df[column]
+            if isinstance(labels.dtype, pd.CategoricalDtype) and UNKNOWN_LABEL not in labels.cat.categories:
+                labels = labels.cat.add_categories(UNKNOWN_LABEL)
+            keys.append(labels.fillna(UNKNOWN_LABEL))
+        # Группировка идёт по кодам категорий; в строки преобразуются только подписи групп
+        grouped = values.groupby(keys, sort=False, observed=True).sum()
+        levels = [grouped.index.get_level_values("day")]
+        levels += [grouped.index.get_level_values(column).astype(str) for column in GROUP_COLUMNS.values()]
+        grouped.index = pd.MultiIndex.from_arrays(levels, names=["day", *GROUP_COLUMNS.values()])
+        return grouped.sort_index()
+
+    def update(self, df):
+        """
+        Добавляет новые транзакции. Суммы по дням и кэшированные ряды пересчитываются только начиная
+        с самой ранней даты новых транзакций (для рядов - с начала содержащего её периода).
+        :param df: DataFrame с добавляемыми транзакциями
+        """
+        grouped = self._group(df)
+        if grouped.empty:
+            return
+        start = grouped.index.get_level_values("day").min()
+        logging.info("Обновление временных рядов: %s транзакций, начиная с %s", len(df), start.date())
+
+        days = self.daily.index.get_level_values("day")
+        head, tail = self.daily[days < start], self.daily[days >= start]
+        tail = grouped if tail.empty else tail.add(grouped, fill_value=0.0)
+        self.daily = pd.concat([head, tail.sort_index()])
+
+        days = self.daily.index.get_level_values("day")
+        for (freq, by), cached in self._resampled.items():
+            period = start.to_period(freq)
+            kept = cached[cached.index.get_level_values("period") < period]
+            recalculated = self._aggregate(self.daily[days >= period.start_time], freq, by)
+            self._resampled[(freq, by)] = pd.concat([kept, recalculated])
+
+    @staticmethod
+    def _aggregate(daily, freq, by):
+        """Суммирует значения по дням в значения по периодам freq в разрезе столбцов by."""
+        periods = daily.index.get_level_values("day").to_period(freq).rename("period")
+        keys = [periods] + [daily.index.get_level_values(column) for column in by]
+        return daily.groupby(keys, sort=True).sum()
+
+    def resample(self, freq="M", by=None):
+        """
+        Возвращает суммы по периодам (кэшируются до добавления транзакций).
+        :param freq: период: 'D' - день, 'W' - неделя, 'M' - месяц
+        :param by: разрез: None, 'category', 'card' или список из них
+        :return: DataFrame с индексом (период, группы) и столбцами spend, cashback, count
+        """
+        key = (_frequency(freq), _group_columns(by))
+        if key not in self._resampled:
+            with span("timeseries.resample", rows=len(self.daily)):
+                self._resampled[key] = self._aggregate(self.daily, *key)
+        return self._resampled[key]
+
+    def series(self, freq="M", by=None, value="spend", start=None, end=None):
+        """
+        Возвращает ряд по всем периодам от start до end; периоды без транзакций равны 0.
+        :param freq: период: 'D', 'W' или 'M'
+        :param by: разрез: None, 'category', 'card' или список из них
+        :param value: показатель: spend - сумма операций, cashback - кэшбэк, count - число операций
+        :param start: первая дата или период; по умолчанию первый период с транзакциями
+        :param end: последняя дата или период; по умолчанию последний период с транзакциями
+        :return: Series (без разреза) или DataFrame с группами в столбцах
+        """
+        freq = _frequency(freq)
+        levels = len(_group_columns(by))
+        if value not in VALUES:
+            raise ValueError(f"Неизвестный показатель '{value}', допустимые: {', '.join(VALUES)}")
+
+        data = self.resample(freq, by)[value]
+        table = data.unstack(list(range(1, levels + 1)), fill_value=0.0) if levels else data
+        periods = table.index
+        if not len(periods) and (start is None or end is None):
+            return table
+        first = pd.Period(start, freq=freq) if start is not None else periods.min()
+        last = pd.Period(end, freq=freq) if end is not None else periods.max()
+        return table.reindex(pd.period_range(first, last, freq=freq, name="period"), fill_value=0.0)
+
+    def rolling(self, window=30, by=None, value="spend", start=None, end=None):
+        """
+        Возвращает скользящие суммы по календарным дням: значение за день - сумма за window дней до него
+        включительно. Окно учитывает и дни раньше start.
+        :param window: размер окна в днях, например 7, 30 или 90
+        :param by: разрез: None, 'category', 'card' или список из них
+        :param value: показатель: spend, cashback или count
+        :param start: первый день результата
+        :param end: последний день результата
+        :return: Series или DataFrame с группами в столбцах
+        """
+        daily = self.series("D", by, value, end=end)
+        rolled = daily.rolling(window, min_periods=1).sum()
+        if start is not None:
+            rolled = rolled[rolled.index >= pd.Period(start, freq="D")]
+        return rolled
+
+    def month_over_month(self, by=None, value="spend", start=None, end=None):
+        """
+        Возвращает значения по месяцам и их изменение к предыдущему месяцу.
+        :param by: разрез: None, 'category', 'card' или список из них
+        :param value: показатель: spend, cashback или count
+        :param start: первый месяц результата
+        :param end: последний месяц результата
+        :return: DataFrame со столбцами value, previous, delta и change (доля изменения, NaN при нулевом
+                 предыдущем значении); для разреза - с группами на втором уровне столбцов
+        """
+        monthly = self.series("M", by, value, end=end)
+        previous = monthly.shift(1)
+        delta = monthly - previous
+        change = (delta / previous.abs()).replace([np.inf, -np.inf], np.nan)
+        result = pd.concat({"value": monthly, "previous": previous, "delta": delta, "change": change}, axis=1)
+        if start is not None:
+            result = result[result.index >= pd.Period(start, freq="M")]
+        return result
+
+
+def _frequency(freq):
+    """Проверяет период ряда."""
+    freq = str(freq).upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Неизвестный период '{freq}', допустимые: {', '.join(FREQUENCIES)}")
+    return freq
+
+
+def _group_columns(by):
+    """Преобразует разрез ('category', 'card', их список или None) в кортеж столбцов."""
+    if by is None:
+        return ()
+    names = [by] if isinstance(by, str) else list(by)
+    unknown = [name for name in names if name not in GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестный разрез '{', '.join(unknown)}', допустимые: {', '.join(GROUP_COLUMNS)}")
+    return tuple(GROUP_COLUMNS[name] for name in names)
+
+
+def series_to_dict(table):
+    """
+    Преобразует ряд для JSON (например, для графика): список периодов и значения каждой группы.
+    :param table: результат SpendSeries.series, rolling или month_over_month
+    :return: словарь periods, series
+    """
+    if isinstance(table, pd.Series):
+        table = table.to_frame(TOTAL_LABEL)
+    table = table.round(2).astype(object).where(table.notna(), None)
+    return {
+        "periods": [str(period) for period in table.index],
+        "series": {
+            " / ".join(map(str, column)) if isinstance(column, tuple) else str(column): table[column].tolist()
+            for column in table.columns
+        },
+    }
+
+
+def get_spend_series(source):
+    """
+    Возвращает временные ряды для хранилища, строя их при первом обращении.
+    :param source: TransactionStore или путь к Excel файлу
+    :return: SpendSeries
+    """
+    store = resolve_store(source)
+    key = ("timeseries",)
+    if key not in store.indexes:
+        store.indexes[key] = SpendSeries.from_frame(store.df)
+    return store.indexes[key]
@@ -1,20 +1,41 @@
-import json
 import logging
-import re
+import posixpath
+import sys
+import zipfile
 from datetime import datetime
 from fileinput import filename
 from re import search
+from xml.etree import ElementTree
 
 import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_excel
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from src.aggregates import get_card_aggregates
+from src.database import SQLiteStore
+from src.metrics import timed
+from src.records import get_records
+from src.search import get_search_index, value_matches
+from src.serialization import dumps
+from src.store import AMOUNT_COLUMNS, DATE_FORMAT, TransactionStore, get_store
 
+# Пространства имён XML внутри xlsx архива
+XLSX_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+XLSX_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+XLSX_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
 
-def transactions_xlsx(filename: str) -> list:
+# Столбцы, значения которых при потоковом чтении всегда остаются float
+FLOAT_COLUMNS = frozenset(AMOUNT_COLUMNS + ("MCC",))
+
+
+@timed(rows=len)
+def transactions_xlsx(filename: str):
     """
-    Считывает Excel файл с транзакциями и возвращает список словарей этих транзакций
+    Считывает Excel файл с транзакциями и возвращает последовательность транзакций.
+    Транзакции хранятся по столбцам (TransactionRecords), а каждая строка отдаётся как словарь только для чтения
+    при обращении к ней; список обычных словарей можно получить методом to_dicts().
     :param filename:
-    :return:
+    :return: TransactionRecords или пустой список в случае ошибки
     """
 
     if len(filename) == 0 or not isinstance(filename, str):
@@ -23,8 +44,7 @@ def transactions_xlsx(filename: str) -> list:
 
     try:
         logging.info(f"Открытие файла {filename}")
-        excel_data = pd.read_excel(filename)
-        excel_data = excel_data.to_dict("records")
+        excel_data = get_records(get_store(filename))
         logging.info(f"Файл {filename} успешно прочитан. Количество транзакций: {len(excel_data)}")
         return excel_data
     except FileNotFoundError:
@@ -32,27 +52,322 @@ def transactions_xlsx(filename: str) -> list:
         return []
 
 
-def web_search_xcl(transactions, input_search):
+def _read_shared_strings(archive):
+    """
+    Читает таблицу общих строк xlsx архива. Строки интернируются,
+    чтобы одинаковые значения в разных строках транзакций были одним объектом.
+    :param archive: открытый zipfile.ZipFile
+    :return: список строк
+    """
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+
+    shared_strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, elem in ElementTree.iterparse(f):
+            if elem.tag == f"{XLSX_MAIN_NS}si":
+                text = "".join(t.text or "" for t in elem.iter(f"{XLSX_MAIN_NS}t"))
+                shared_strings.append(sys.intern(text))
+                elem.clear()
+    return shared_strings
+
+
+def _first_sheet_path(archive):
+    """
+    Определяет путь к XML первого листа книги по workbook.xml и его связям.
+    :param archive: открытый zipfile.ZipFile
+    :return: путь к листу внутри архива
+    """
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{XLSX_MAIN_NS}sheets/{XLSX_MAIN_NS}sheet")
+    rel_id = sheet.get(f"{XLSX_REL_NS}id")
+
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{XLSX_PKG_REL_NS}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    return "xl/worksheets/sheet1.xml"
+
+
+def _column_index(cell_ref):
+    """
+    Переводит буквенную часть адреса ячейки (например, 'AB12') в номер столбца с нуля.
+    :param cell_ref: адрес ячейки
+    :return: номер столбца
+    """
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+
+def _read_date_styles(archive):
+    """
+    Определяет стили ячеек (номера в cellXfs таблицы стилей) с форматом даты, времени или длительности.
+    Формат определяется так же, как в openpyxl, которым пользуется pandas.read_excel.
+    :param archive: открытый zipfile.ZipFile
+    :return: словарь номер стиля -> True для длительности ([h]:mm), False для даты и времени
+    """
+    if "xl/styles.xml" not in archive.namelist():
+        return {}
+
+    styles = ElementTree.fromstring(archive.read("xl/styles.xml"))
+    formats = dict(BUILTIN_FORMATS)
+    for number_format in styles.iter(f"{XLSX_MAIN_NS}numFmt"):
+        formats[int(number_format.get("numFmtId"))] = number_format.get("formatCode")
+
+    date_styles = {}
+    cell_formats = styles.find(f"{XLSX_MAIN_NS}cellXfs")
+    for index, xf in enumerate(cell_formats if cell_formats is not None else []):
+        number_format = formats.get(int(xf.get("numFmtId", 0)))
+        if is_date_format(number_format):
+            date_styles[index] = is_timedelta_format(number_format)
+    return date_styles
+
+
+def _workbook_epoch(archive):
+    """
+    Возвращает начало отсчёта серийных дат книги: 1904 год для книг с date1904, иначе 1899-12-30.
+    :param archive: открытый zipfile.ZipFile
+    :return: datetime
+    """
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    properties = workbook.find(f"{XLSX_MAIN_NS}workbookPr")
+    if properties is not None and properties.get("date1904") in ("1", "true"):
+        return MAC_EPOCH
+    return WINDOWS_EPOCH
+
+
+def _cell_value(cell, shared_strings, date_styles=None, epoch=WINDOWS_EPOCH):
+    """
+    Возвращает значение ячейки xlsx с учётом её типа и формата.
+    Числа без дробной части и экспоненты возвращаются как int, как это делает openpyxl.
+    Числа в ячейках со стилем даты преобразуются в datetime (time для времени без даты, timedelta
+    для длительности), как в pandas.read_excel.
+    :param cell: элемент <c>
+    :param shared_strings: таблица общих строк
+    :param date_styles: стили с форматом даты (результат _read_date_styles)
+    :param epoch: начало отсчёта серийных дат книги
+    :return: значение ячейки или NaN для пустой ячейки
+    """
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        return sys.intern("".join(t.text or "" for t in cell.iter(f"{XLSX_MAIN_NS}t")))
+
+    value = cell.findtext(f"{XLSX_MAIN_NS}v")
+    if value is None:
+        return float("nan")
+    if cell_type == "s":
+        return shared_strings[int(value)]
+    if cell_type == "b":
+        return value == "1"
+    if cell_type in ("str", "e"):
+        return value
+    if cell_type == "d":
+        return datetime.fromisoformat(value)
+    style = int(cell.get("s", 0))
+    if date_styles and style in date_styles:
+        return from_excel(float(value), epoch, timedelta=date_styles[style])
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _iter_sheet_rows(archive, shared_strings, date_styles, epoch):
+    """
+    Потоково разбирает первый лист книги и выдаёт строки в виде словарей номер столбца -> значение ячейки.
+    Обработанные строки листа сразу освобождаются.
+    """
+    with archive.open(_first_sheet_path(archive)) as sheet:
+        sheet_data = None
+        for event, elem in ElementTree.iterparse(sheet, events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{XLSX_MAIN_NS}sheetData":
+                    sheet_data = elem
+                continue
+            if elem.tag != f"{XLSX_MAIN_NS}row":
+                continue
+
+            values = {}
+            for position, cell in enumerate(elem.iter(f"{XLSX_MAIN_NS}c")):
+                ref = cell.get("r")
+                values[_column_index(ref) if ref else position] = _cell_value(cell, shared_strings, date_styles, epoch)
+            sheet_data.clear()
+            yield values
+
+
+def _clean_value(value, name):
+    """
+    Приводит значение ячейки к виду pandas.read_excel: пустая строка - пропуск, целое float - int
+    (кроме сумм и MCC, которые всегда float).
+    """
+    if value == "":
+        return float("nan")
+    if isinstance(value, float) and value.is_integer() and name not in FLOAT_COLUMNS:
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and name in FLOAT_COLUMNS:
+        return float(value)
+    return value
+
+
+def _value_kind(value):
+    """Возвращает вид значения для выбора типа столбца: int, float, пропуск, дата или другое."""
+    if isinstance(value, bool):
+        return "other"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "blank" if value != value else "float"
+    if isinstance(value, datetime):
+        return "date"
+    return "other"
+
+
+def _column_casts(rows, header, columns):
+    """
+    Определяет по всем строкам листа, какие столбцы pandas.read_excel привёл бы к float или datetime64:
+    целые числа вместе с пропусками или дробными числами становятся float, пропуски в столбце дат - NaT.
+    :return: словарь название столбца -> 'float' или 'date'
+    """
+    kinds = {name: set() for name in header}
+    for values in rows:
+        for name, column in zip(header, columns):
+            kinds[name].add(_value_kind(_clean_value(values.get(column, float("nan")), name)))
+
+    casts = {}
+    for name, found in kinds.items():
+        if "int" in found and found <= {"int", "float", "blank"} and found & {"float", "blank"}:
+            casts[name] = "float"
+        elif "date" in found and found <= {"date", "blank"} and "blank" in found:
+            casts[name] = "date"
+    return casts
+
+
+def iter_transactions_xlsx(filename, chunk_size=None):
+    """
+    Потоково читает первый лист Excel файла с транзакциями и по одной выдаёт транзакции в виде словарей
+    с ключами из строки заголовка. Лист разбирается через iterparse, обработанные строки сразу освобождаются,
+    поэтому расход памяти не зависит от размера файла (кроме таблицы общих строк).
+    Значения совпадают с pandas.read_excel: ячейки с форматом даты становятся datetime, целые числа - int,
+    а в столбцах, которые pandas приводит к float (целые вместе с пропусками или дробными), - float;
+    суммы и MCC всегда float. Для этого лист разбирается дважды: сначала определяются типы столбцов.
+    :param filename: путь к Excel файлу
+    :param chunk_size: если задан, транзакции выдаются списками указанного размера
+    :return: генератор транзакций или списков транзакций
+    """
+    if not isinstance(filename, str) or len(filename) == 0:
+        logging.warning("Пустое имя файла или неверный тип данных.")
+        return
+
+    try:
+        archive = zipfile.ZipFile(filename)
+    except FileNotFoundError:
+        logging.error(f"Файл {filename} не найден.")
+        return
+
+    with archive:
+        shared_strings = _read_shared_strings(archive)
+        sheet = (archive, shared_strings, _read_date_styles(archive), _workbook_epoch(archive))
+        logging.info(f"Потоковое чтение файла {filename}")
+
+        rows = _iter_sheet_rows(*sheet)
+        first = next(rows, None)
+        if first is None:
+            return
+        columns = sorted(first)
+        header = [sys.intern(str(first[i])) for i in columns]
+        casts = _column_casts(rows, header, columns)
+
+        rows = _iter_sheet_rows(*sheet)
+        next(rows)
+        chunk = []
+        count = 0
+        for values in rows:
+            row = {}
+            for name, column in zip(header, columns):
+                value = _clean_value(values.get(column, float("nan")), name)
+                cast = casts.get(name)
+                if cast == "float" and isinstance(value, int):
+                    value = float(value)
+                elif cast == "date" and value != value:
+                    value = pd.NaT
+                row[name] = value
+            count += 1
+            if chunk_size:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            else:
+                yield row
+
+        if chunk:
+            yield chunk
+        logging.info(f"Файл {filename} прочитан потоково. Количество транзакций: {count}")
+
+
+def web_search_xcl(transactions, input_search, mode="substring", column="Категория", compact=False):
     """
     Проводит поиск по категориям, по всему Excel-файлу.
-    :param transactions:
-    :param input_search:
+    Для TransactionStore используется поисковый индекс по различным значениям столбца,
+    и из хранилища извлекаются только найденные транзакции. Для SQLiteStore запросом проверяются
+    различные значения столбца, а транзакции выбираются по найденным значениям.
+    :param transactions: TransactionStore, SQLiteStore, список или итератор транзакций
+        (например, iter_transactions_xlsx)
+    :param input_search: поисковый запрос (без учёта регистра)
+    :param mode: режим поиска: substring, prefix или token
+    :param column: столбец, по которому выполняется поиск ("Категория" или "Описание")
+    :param compact: компактный JSON для программ-потребителей (см. serialization.dumps)
     :return: JSON строка
     """
+    return dumps(search_transactions(transactions, input_search, mode, column), compact=compact)
+
+
+@timed(rows=len)
+def search_transactions(transactions, input_search, mode="substring", column="Категория"):
+    """
+    Находит транзакции, у которых значение столбца соответствует поисковому запросу (см. web_search_xcl).
+    Результат можно закодировать целиком (serialization.dumps) или по частям (serialization.iter_json_array).
+    :return: TransactionRecords для TransactionStore, иначе список транзакций
+    """
     logging.info("Начало поиска по категориям.")
-    list_result = []
-    pattern = re.compile(re.escape(input_search), re.I)
 
+    if isinstance(transactions, TransactionStore):
+        rows = get_search_index(transactions, column).search(input_search, mode)
+        found = get_records(transactions).take(rows)
+        logging.info(f"Поиск по индексу завершен. Найдено {len(found)} транзакций.")
+        return found
+
+    if isinstance(transactions, SQLiteStore):
+        values = [
+            value
+            for value in transactions.distinct_values(column)
+            if isinstance(value, str) and value_matches(value, input_search, mode)
+        ]
+        list_result = [record for _, record in transactions.records_where_in(column, values)]
+        logging.info(f"Поиск в базе завершен. Найдено {len(list_result)} транзакций.")
+        return list_result
+
+    # Уровень журнала проверяется один раз: запись о каждой транзакции нужна только при отладке
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    list_result = []
     for transaction in transactions:
-        description = transaction.get("Категория")
-        if isinstance(description, str) and re.search(pattern, description):
-            logging.debug(f"Транзакция добавлена в список результатов: {transaction}")
+        description = transaction.get(column)
+        if isinstance(description, str) and value_matches(description, input_search, mode):
+            if debug:
+                logging.debug("Транзакция добавлена в список результатов: %s", transaction)
             list_result.append(transaction)
 
     logging.info(f"Поиск завершен. Найдено {len(list_result)} транзакций.")
-    return json.dumps(list_result, ensure_ascii=False)
+    return list_result
 
 
+@timed()
 def num_card_account(transactions, user_input):
     """
     Вычисляет сумму всех операций по определенной банковской карте и
@@ -63,8 +378,11 @@ def num_card_account(transactions, user_input):
     после чего функция фильтрует все транзакции по этому номеру
     карты и суммирует округленные значения операций.
 
+    Если передан TransactionStore, сумма берётся из агрегатов по картам,
+    построенных один раз для хранилища; для SQLiteStore сумма считается запросом по индексу карт.
+
     Аргументы:
-    transactions (list): Список транзакций, где каждая транзакция
+    transactions (iterable): TransactionStore, SQLiteStore, список или итератор транзакций, где каждая транзакция
                          представлена в виде словаря с ключами
                          'Номер карты' и 'Сумма операции с округлением'.
     user_input (str): Номер карты, для которой необходимо вычислить сумму транзакций.
@@ -73,17 +391,67 @@ def num_card_account(transactions, user_input):
     str: JSON-строка с суммой всех операций по введенному номеру карты, округленная до ближайшего целого.
     """
     logging.info(f"Начало подсчета суммы операций для карты {user_input}.")
-    list_sum = []
+
+    if isinstance(transactions, TransactionStore):
+        rounded_sum = round(get_card_aggregates(transactions).total(user_input))
+        logging.info(f"Подсчет по агрегатам завершен. Общая сумма: {rounded_sum}")
+        return dumps({"Номер карты": user_input, "Сумма операций": rounded_sum})
+
+    if isinstance(transactions, SQLiteStore):
+        stats = transactions.card_stats(user_input).get(user_input)
+        rounded_sum = round(stats["total"] if stats else 0)
+        logging.info(f"Подсчет в базе завершен. Общая сумма: {rounded_sum}")
+        return dumps({"Номер карты": user_input, "Сумма операций": rounded_sum})
+
+    # Сумма накапливается по ходу обхода, чтобы итератор транзакций не материализовался в памяти
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    res_sum = 0
     for transaction in transactions:
         if transaction["Номер карты"] == user_input:
-            logging.debug(f"Добавление суммы операции: {transaction.get('Сумма операции с округлением')}")
-            list_sum.append(transaction.get("Сумма операции с округлением"))
+            if debug:
+                logging.debug("Добавление суммы операции: %s", transaction.get("Сумма операции с округлением"))
+            res_sum += transaction.get("Сумма операции с округлением")
 
-    res_sum = sum(list_sum)
     rounded_sum = round(res_sum)
 
     # Подготовка данных для возврата в формате JSON
     result = {"Номер карты": user_input, "Сумма операций": rounded_sum}
 
     logging.info(f"Подсчет завершен. Общая сумма: {rounded_sum}")
-    return json.dumps(result, ensure_ascii=False)
+    return dumps(result)
+
+
+@timed()
+def cards_summary(store):
+    """
+    Возвращает сводку по всем картам хранилища в формате JSON: сумму операций с округлением,
+    количество операций, кэшбэк, даты первой и последней операции.
+    :param store: путь к Excel файлу, TransactionStore или SQLiteStore
+    :return: JSON строка со списком карт
+    """
+    if isinstance(store, SQLiteStore):
+        cards = store.card_stats()
+    else:
+        if not isinstance(store, TransactionStore):
+            store = get_store(store)
+        cards = get_card_aggregates(store).cards()
+
+    result = []
+    for card, stats in cards.items():
+        result.append(
+            {
+                "Номер карты": card,
+                "Сумма операций": round(stats["total"]),
+                "Количество операций": stats["count"],
+                "Кэшбэк": stats["cashback"],
+                "Первая операция": _format_date(stats["first_date"]),
+                "Последняя операция": _format_date(stats["last_date"]),
+            }
+        )
+    logging.info(f"Сводка по картам сформирована: {len(result)} карт")
+    return dumps(result)
+
+
+def _format_date(value):
+    """Форматирует дату в формате банковской выписки или возвращает None."""
+    return None if pd.isna(value) else value.strftime(DATE_FORMAT)
@@ -1,25 +1,44 @@
+import asyncio
+import functools
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
-import requests
-from alpha_vantage.timeseries import TimeSeries
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 
-from src.utils import transactions_xlsx
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from src.cache import memoize_result
+from src.currency import record_rates
+from src.database import SQLiteStore
+from src.market import fetch_conversion_rates, fetch_quote, fetch_quotes, settings_cache
+from src.metrics import span, timed
+from src.services import analyze_cashback
+from src.store import get_date_index, resolve_store
+from src.utils import cards_summary, transactions_xlsx
 
+# Загрузка API ключей и других настроек из .env
 load_dotenv("E:/pycharm_project/transaction_analysis_web/.env")
 
 # Получите API ключи из .env
 EXCHANGE_RATE_API_KEY = os.getenv("EXCHANGE_RATE_API_KEY")
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 
+# Время ожидания (секунды) для каждого раздела главной страницы
+DASHBOARD_TIMEOUTS = {
+    "transactions": 30,
+    "cards": 30,
+    "cashback": 30,
+    "currency_rates": 10,
+    "stock_prices": 15,
+}
+
+# Отдельный пул потоков для разделов главной страницы: asyncio.run не ждёт его завершения,
+# поэтому раздел, превысивший время ожидания, не задерживает ответ
+dashboard_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dashboard")
+
 
 def load_user_settings():
     """Загружает настройки пользователя из файла user_settings.json"""
@@ -34,6 +53,14 @@ def load_user_settings():
         return None
 
 
+def get_user_settings():
+    """
+    Возвращает настройки пользователя, перечитывая файл не чаще одного раза в SETTINGS_TTL секунд.
+    :return: словарь настроек или None, если настройки не удалось загрузить
+    """
+    return settings_cache.get("user_settings", load_user_settings)
+
+
 def get_exchange_rate():
     """
     Запрашивает текущий курс валют с использованием API
@@ -42,7 +69,7 @@ def get_exchange_rate():
     logging.debug("Запрос курса валют")
 
     # Загрузить настройки пользователя
-    user_settings = load_user_settings()
+    user_settings = get_user_settings()
     if not user_settings:
         logging.error("Не удалось загрузить настройки пользователя")
         return None
@@ -50,29 +77,27 @@ def get_exchange_rate():
     # Получить список валют пользователя
     user_currencies = user_settings.get("user_currencies", ["USD"])
 
-    # Формировать базовый URL
-    url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/latest/USD"
-    response = requests.get(url)
+    # Курсы запрашиваются через общую HTTP-сессию и кэшируются на время жизни курсов
+    try:
+        conversion_rates = fetch_conversion_rates(EXCHANGE_RATE_API_KEY)
+    except Exception as e:
+        logging.error(f"Не удалось получить курс валют, {e}")
+        return None
 
-    if response.status_code == 200:
-        logging.info("Курс валют успешно получен")
-        data = response.json()
+    logging.info("Курс валют успешно получен")
+    # Курсы сохраняются в истории курсов, по которой суммы транзакций пересчитываются в другие валюты
+    record_rates(conversion_rates)
 
-        # Выборка только нужных валют
-        filtered_rates = {
-            currency: data["conversion_rates"].get(currency)
-            for currency in user_currencies
-            if currency in data["conversion_rates"]
-        }
+    # Выборка только нужных валют
+    filtered_rates = {
+        currency: conversion_rates.get(currency) for currency in user_currencies if currency in conversion_rates
+    }
 
-        if len(filtered_rates) != len(user_currencies):
-            missing_currencies = set(user_currencies) - filtered_rates.keys()
-            logging.warning(f"Некоторые валюты не были найдены: {', '.join(missing_currencies)}")
+    if len(filtered_rates) != len(user_currencies):
+        missing_currencies = set(user_currencies) - filtered_rates.keys()
+        logging.warning(f"Некоторые валюты не были найдены: {', '.join(missing_currencies)}")
 
-        return filtered_rates
-    else:
-        logging.error(f"Не удалось получить курс валют, статус: {response.status_code}")
-        return None
+    return filtered_rates
 
 
 def get_stock_price(symbol):
@@ -94,19 +119,36 @@ def get_stock_price(symbol):
         logging.error("Необходимо указать API ключ в .env файле.")
         raise ValueError("Необходимо указать API ключ в .env файле.")
 
-    ts = TimeSeries(key=ALPHA_VANTAGE_API_KEY, output_format="json")
     logging.info(f"Запрос цены акции для символа: {symbol}")
 
     try:
-        # Получение текущей цены акции
-        data, _ = ts.get_quote_endpoint(symbol=symbol)
-        price = data["05. price"]
+        # Получение текущей цены акции (котировка кэшируется на время жизни котировок)
+        price = fetch_quote(symbol, ALPHA_VANTAGE_API_KEY)
         logging.info(f"Успешно получена цена акции для {symbol}: {price}")
     except Exception as e:
         logging.error(f"Ошибка при получении данных для {symbol}: {e}")
         raise RuntimeError(f"Ошибка при получении данных для {symbol}: {e}")
 
-    return float(price)
+    return price
+
+
+def get_stock_prices(symbols=None):
+    """
+    Возвращает текущие цены нескольких акций, запрашивая их параллельно.
+    :param symbols: список символов акций; по умолчанию акции из настроек пользователя
+    :return: словарь символ -> цена (None, если цену получить не удалось)
+    :raises ValueError: если не указан API ключ
+    """
+    if not ALPHA_VANTAGE_API_KEY:
+        logging.error("Необходимо указать API ключ в .env файле.")
+        raise ValueError("Необходимо указать API ключ в .env файле.")
+
+    if symbols is None:
+        user_settings = get_user_settings() or {}
+        symbols = user_settings.get("user_stocks", [])
+
+    logging.info(f"Запрос цен акций: {', '.join(symbols)}")
+    return fetch_quotes(symbols, ALPHA_VANTAGE_API_KEY)
 
 
 def fetch_currency_rates():
@@ -147,22 +189,24 @@ def parse_datetime(date_str):
     :param date_str:
     :return:
     """
-    logging.debug(f"Парсинг даты: {date_str}")
+    logging.debug("Парсинг даты: %s", date_str)
     datetime_obj = datetime.strptime(date_str.strip(), "%d-%m-%Y %H:%M:%S")
     return datetime_obj
 
 
+@timed()
+@memoize_result()
 def process_excel_data(excel_file_path, specific_date):
     """
     Обрабатывает данные транзакций и возвращает отчет за период от введенной даты до конца месяца в формате JSON.
-    :param excel_file_path: путь к Excel файлу с данными транзакций
+    :param excel_file_path: путь к Excel файлу с данными транзакций, TransactionStore или SQLiteStore
     :param specific_date: дата, с которой начинается отчет
     :return: JSON строка с отфильтрованными данными
     """
     logging.info(f"Начало обработки файла: {excel_file_path}")
 
     try:
-        df = pd.read_excel(excel_file_path)
+        store = _resolve_transactions(excel_file_path)
         logging.info("Excel файл успешно загружен.")
 
         # Преобразование строковой даты в формат datetime
@@ -173,13 +217,18 @@ def process_excel_data(excel_file_path, specific_date):
         end_date = (start_date + relativedelta(months=1)) - pd.Timedelta(days=1)
         logging.info(f"Дата окончания отчетного периода: {end_date}")
 
-        # Фильтрация данных по дате операции от заданной до конца месяца
-        df["Дата операции"] = pd.to_datetime(df["Дата операции"], dayfirst=True)
-        filtered_df = df[(df["Дата операции"] >= start_date) & (df["Дата операции"] <= end_date)]
+        # Выборка по дате операции от заданной до конца месяца бинарным поиском по индексу дат
+        with span("views.date_filter") as date_filter:
+            if isinstance(store, SQLiteStore):
+                filtered_df = store.frame_between(start_date, end_date)
+            else:
+                filtered_df = store.df.iloc[get_date_index(store).positions_between(start_date, end_date)]
+            date_filter.rows = len(filtered_df)
         logging.info(f"Данные отфильтрованы. Количество записей: {len(filtered_df)}")
 
         # Преобразование отфильтрованных данных в JSON формат
-        result_json = filtered_df.to_json(orient="records", date_format="iso", force_ascii=False)
+        with span("json.encode", rows=len(filtered_df)):
+            result_json = filtered_df.to_json(orient="records", date_format="iso", force_ascii=False)
         logging.info("Данные конвертированы в JSON формат.")
 
         return result_json
@@ -187,3 +236,79 @@ def process_excel_data(excel_file_path, specific_date):
     except Exception as e:
         logging.error(f"Произошла ошибка при обработке файла: {e}")
         raise
+
+
+def _resolve_transactions(source):
+    """Возвращает SQLiteStore как есть, остальные источники разрешает в TransactionStore."""
+    if isinstance(source, SQLiteStore):
+        return source
+    return resolve_store(source)
+
+
+async def build_dashboard(date, transactions, timeouts=None):
+    """
+    Собирает данные главной страницы: приветствие, транзакции за месяц с указанной даты, сводку по картам,
+    кэшбэк за месяц, курсы валют и цены акций. Отчёты по транзакциям выполняются в пуле потоков,
+    а курсы и цены запрашиваются одновременно с ними, поэтому общее время равно времени самого долгого раздела.
+    Раздел, который завершился ошибкой или не уложился во время ожидания, получает значение None,
+    а причина записывается в "errors"; остальные разделы возвращаются.
+    :param date: дата в формате 'ДД.ММ.ГГГГ'
+    :param transactions: путь к Excel файлу с транзакциями, TransactionStore или SQLiteStore
+    :param timeouts: словарь раздел -> время ожидания, дополняющий DASHBOARD_TIMEOUTS
+    :return: словарь с разделами главной страницы
+    """
+    timeouts = {**DASHBOARD_TIMEOUTS, **(timeouts or {})}
+    start_date = datetime.strptime(date, "%d.%m.%Y")
+
+    # Хранилище загружается один раз и используется всеми отчётами по транзакциям
+    store_task = asyncio.ensure_future(_run_in_executor(_resolve_transactions, transactions))
+
+    async def transaction_section(func, *args):
+        # shield: превышение времени одним разделом не отменяет загрузку хранилища для остальных
+        store = await asyncio.shield(store_task)
+        return json.loads(await _run_in_executor(func, store, *args) or "null")
+
+    sections = {
+        "transactions": transaction_section(process_excel_data, date),
+        "cards": transaction_section(cards_summary),
+        "cashback": transaction_section(analyze_cashback, start_date.year, start_date.month),
+        "currency_rates": _run_in_executor(get_exchange_rate),
+        "stock_prices": _run_in_executor(get_stock_prices),
+    }
+    results = await asyncio.gather(
+        *(_dashboard_section(name, section, timeouts[name]) for name, section in sections.items())
+    )
+
+    dashboard = {"greeting": get_greeting(datetime.now().hour)}
+    errors = {}
+    for name, (value, error) in zip(sections, results):
+        dashboard[name] = value
+        if error:
+            errors[name] = error
+    dashboard["errors"] = errors
+    return dashboard
+
+
+def _run_in_executor(func, *args):
+    """Выполняет функцию в пуле потоков главной страницы и возвращает awaitable с результатом."""
+    return asyncio.get_running_loop().run_in_executor(dashboard_executor, functools.partial(func, *args))
+
+
+async def _dashboard_section(name, section, timeout):
+    """
+    Ожидает раздел главной страницы с ограничением времени.
+    :return: кортеж (значение или None, описание ошибки или None)
+    """
+    try:
+        with span(f"dashboard.{name}"):
+            value = await asyncio.wait_for(section, timeout)
+    except asyncio.TimeoutError:
+        logging.error(f"Раздел {name} не получен за {timeout} с")
+        return None, f"превышено время ожидания ({timeout} с)"
+    except Exception as e:
+        logging.error(f"Ошибка при получении раздела {name}: {e}")
+        return None, str(e)
+
+    if value is None:
+        return None, "нет данных"
+    return value, None
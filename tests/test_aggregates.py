@@ -0,0 +1,146 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.aggregates import (CardAggregates, CashbackCube, CategoryPrefixSums, get_card_aggregates,
+                            get_cashback_cube, get_category_prefix_sums)
+from src.store import TransactionStore, normalize_transactions
+from src.utils import cards_summary, num_card_account
+
+
+@pytest.fixture
+def transactions():
+    """
+    Создает DataFrame с транзакциями по двум картам.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.08.2023 12:00:00",
+                "15.08.2023 15:30:00",
+                "22.08.2023 18:45:00",
+                "23.08.2023 10:00:00",
+            ],
+            "Номер карты": ["*3456", "*7654", "*3456", "*3456"],
+            "Кэшбэк": [1.0, None, 2.0, 3.0],
+            "Сумма операции с округлением": [150.75, 100.0, 49.5, 200.25],
+        }
+    )
+    return normalize_transactions(df)
+
+
+def test_card_aggregates_from_frame(transactions):
+    """
+    Тест проверяет сумму, количество операций, кэшбэк и даты первой и последней операции по карте.
+    """
+    stats = CardAggregates.from_frame(transactions).get("*3456")
+    assert stats["total"] == 400.5
+    assert stats["count"] == 3
+    assert stats["cashback"] == 6.0
+    assert stats["first_date"] == pd.Timestamp("2023-08-01 12:00:00")
+    assert stats["last_date"] == pd.Timestamp("2023-08-23 10:00:00")
+
+
+def test_card_aggregates_incremental_update(transactions):
+    """
+    Тест проверяет, что дополнение агрегатов новыми транзакциями даёт тот же результат, что и полный пересчёт.
+    """
+    aggregates = CardAggregates.from_frame(transactions.iloc[:2])
+    aggregates.update(transactions.iloc[2:])
+    assert aggregates.cards() == CardAggregates.from_frame(transactions).cards()
+
+
+def test_num_card_account_with_store(transactions):
+    """
+    Тест проверяет, что num_card_account для хранилища совпадает с подсчётом по списку транзакций
+    и что агрегаты строятся один раз.
+    """
+    store = TransactionStore(transactions)
+    for card in ("*3456", "*7654", "*0000"):
+        assert num_card_account(store, card) == num_card_account(store.records(), card)
+    assert get_card_aggregates(store) is get_card_aggregates(store)
+
+
+def test_cards_summary(transactions):
+    """
+    Тест проверяет сводку по всем картам.
+    """
+    result = json.loads(cards_summary(TransactionStore(transactions)))
+    assert [card["Номер карты"] for card in result] == ["*3456", "*7654"]
+    assert result[0]["Сумма операций"] == 400
+    assert result[0]["Количество операций"] == 3
+    assert result[0]["Последняя операция"] == "23.08.2023 10:00:00"
+
+
+@pytest.fixture
+def cashback_transactions():
+    """
+    Создает DataFrame с транзакциями за несколько месяцев для куба кэшбэка.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.07.2023 12:00:00",
+                "01.08.2023 12:00:00",
+                "15.08.2023 15:30:00",
+                "22.08.2023 18:45:00",
+            ],
+            "Категория": ["Еда", "Еда", "Транспорт", "Еда"],
+            "Кэшбэк": [10.0, 50.0, 100.0, 25.0],
+            "Сумма операции": [-1000.0, -500.0, -300.0, -250.0],
+        }
+    )
+    return normalize_transactions(df)
+
+
+def test_cashback_cube_month_and_period(cashback_transactions):
+    """
+    Тест проверяет срезы куба кэшбэка за месяц, за диапазон месяцев и таблицу категория x месяц.
+    """
+    cube = CashbackCube.from_frame(cashback_transactions)
+    assert cube.month(2023, 8)["cashback"].to_dict() == {"Еда": 75.0, "Транспорт": 100.0}
+    assert cube.period("2023-07", "2023-08").loc["Еда"].to_dict() == {"cashback": 85.0, "spend": -1750.0}
+    assert cube.month(2023, 9).empty
+
+    table = cube.table("2023-07", "2023-08")
+    assert table.loc["Еда"].tolist() == [10.0, 75.0]
+    assert table.loc["Транспорт"].tolist() == [0.0, 100.0]
+
+
+def test_cashback_cube_incremental_update(cashback_transactions):
+    """
+    Тест проверяет, что дополнение куба новыми транзакциями даёт тот же результат, что и полный пересчёт.
+    """
+    cube = CashbackCube.from_frame(cashback_transactions.iloc[:2])
+    cube.update(cashback_transactions.iloc[2:])
+    pd.testing.assert_frame_equal(cube.frame, CashbackCube.from_frame(cashback_transactions).frame)
+    assert get_cashback_cube(TransactionStore(cashback_transactions)).month(2023, 7)["cashback"].sum() == 10.0
+
+
+def test_category_prefix_sums_total_until(cashback_transactions):
+    """
+    Тест проверяет сумму операций категории до даты по накопленным суммам.
+    """
+    prefix_sums = CategoryPrefixSums.from_frame(cashback_transactions)
+    assert prefix_sums.total_until("Еда", "2023-06-30") == 0.0
+    assert prefix_sums.total_until("Еда", "2023-08-01 12:00:00") == -1500.0
+    assert prefix_sums.total_until("Еда", "2023-12-31") == -1750.0
+    assert prefix_sums.total_until("Одежда", "2023-12-31") == 0.0
+
+
+def test_category_prefix_sums_incremental_update(cashback_transactions):
+    """
+    Тест проверяет дополнение накопленных сумм как более поздними, так и более ранними транзакциями.
+    """
+    later = CategoryPrefixSums.from_frame(cashback_transactions.iloc[:2])
+    later.update(cashback_transactions.iloc[2:])
+    earlier = CategoryPrefixSums.from_frame(cashback_transactions.iloc[2:])
+    earlier.update(cashback_transactions.iloc[:2])
+
+    for date in ("2023-07-15", "2023-08-15 15:30:00", "2023-08-31"):
+        expected = CategoryPrefixSums.from_frame(cashback_transactions).total_until("Еда", date)
+        assert later.total_until("Еда", date) == expected
+        assert earlier.total_until("Еда", date) == expected
+    store = TransactionStore(cashback_transactions)
+    assert get_category_prefix_sums(store) is get_category_prefix_sums(store)
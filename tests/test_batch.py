@@ -0,0 +1,146 @@
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from src.batch import analyze_statement, find_statements, run_batch
+
+
+@pytest.fixture
+def statements(tmp_path):
+    """
+    Создает каталог с двумя корректными выписками и одним повреждённым файлом.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00", "16.09.2023 10:00:00"],
+            "Номер карты": ["*3456", "*7654", "*3456"],
+            "Сумма операции": [-100.0, -200.0, 1000.0],
+            "Кэшбэк": [1.0, 2.0, None],
+            "Категория": ["Фастфуд", "Супермаркеты", "Пополнения"],
+            "Сумма операции с округлением": [100.0, 200.0, 1000.0],
+        }
+    )
+    df.to_excel(tmp_path / "client_1.xlsx", index=False)
+    df.iloc[:2].to_csv(tmp_path / "client_2.csv", sep=";", decimal=",", index=False)
+    (tmp_path / "client_3.xlsx").write_text("повреждённый файл")
+    (tmp_path / "notes.txt").write_text("не выписка")
+    return tmp_path
+
+
+class TrackingExecutor(ThreadPoolExecutor):
+    """
+    Пул потоков, который запоминает наибольшее число одновременно незавершённых задач.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def test_find_statements(statements):
+    """
+    Тест проверяет поиск выписок в каталоге и чтение манифестов в текстовом и JSON формате.
+    """
+    names = [path.rsplit("/", 1)[-1] for path in find_statements(str(statements))]
+    assert names == ["client_1.xlsx", "client_2.csv", "client_3.xlsx"]
+
+    (statements / "manifest.txt").write_text("# клиенты\nclient_2.csv\n\nclient_1.xlsx\n")
+    assert find_statements(str(statements / "manifest.txt")) == [
+        str(statements / "client_2.csv"),
+        str(statements / "client_1.xlsx"),
+    ]
+    (statements / "manifest.json").write_text(json.dumps([str(statements / "client_1.xlsx")]))
+    assert find_statements(str(statements / "manifest.json")) == [str(statements / "client_1.xlsx")]
+
+
+def test_analyze_statement(statements):
+    """
+    Тест проверяет сводку и отчёты по одной выписке и возврат ошибки для повреждённого файла.
+    """
+    result = analyze_statement(str(statements / "client_1.xlsx"), category="Фастфуд")
+    assert result["status"] == "ok"
+    assert result["transactions"] == 3
+    assert result["spending"] == 300.0
+    assert result["income"] == 1000.0
+    assert result["cashback"] == 3.0
+    assert result["top_category"] == "Супермаркеты"
+    assert result["category_spending"] == -100.0
+    assert result["last_date"] == "2023-09-16T10:00:00"
+    assert set(result["reports"]) == {"weekdays", "day_type", "category"}
+
+    error = analyze_statement(str(statements / "client_3.xlsx"))
+    assert error["status"] == "error"
+    assert error["error"]
+
+
+def analyze_or_crash(filepath, date=None, category=None):
+    """
+    Обрабатывает выписку, но аварийно завершает рабочий процесс на файле с 'crash' в имени.
+    """
+    if "crash" in os.path.basename(filepath):
+        os._exit(1)
+    return analyze_statement(filepath, date, category)
+
+
+def test_run_batch_outputs_and_bounded_in_flight(statements):
+    """
+    Тест проверяет сводные JSON и CSV файлы, изоляцию ошибок и ограничение числа файлов в работе.
+    """
+    paths = find_statements(str(statements)) * 3
+    executor = TrackingExecutor(max_workers=4)
+    json_path, csv_path = statements / "result.json", statements / "result.csv"
+
+    summary = run_batch(paths, json_path=str(json_path), csv_path=str(csv_path), max_in_flight=2, executor=executor)
+    executor.shutdown()
+
+    assert summary == {"files": 9, "ok": 6, "errors": 3}
+    assert executor.max_in_flight <= 2
+    results = json.loads(json_path.read_text(encoding="utf-8"))
+    assert len(results) == 9
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row["status"] for row in rows) == ["error"] * 3 + ["ok"] * 6
+    assert {row["cards"] for row in rows if row["status"] == "ok"} == {"2"}
+
+
+def test_run_batch_process_pool(statements):
+    """
+    Тест проверяет обработку выписок в пуле процессов.
+    """
+    paths = find_statements(str(statements))
+    assert run_batch(paths, workers=2) == {"files": 3, "ok": 2, "errors": 1}
+
+
+def test_run_batch_survives_crashed_worker(statements):
+    """
+    Тест проверяет, что аварийное завершение рабочего процесса отмечает ошибкой только файл,
+    на котором процесс падает, а остальные выписки обрабатываются.
+    """
+    (statements / "client_0_crash.csv").write_text("", encoding="utf-8")
+    paths = find_statements(str(statements))
+    json_path = statements / "result.json"
+
+    summary = run_batch(paths, json_path=str(json_path), workers=2, analyze=analyze_or_crash)
+
+    assert summary == {"files": 4, "ok": 2, "errors": 2}
+    results = {result["file"]: result for result in json.loads(json_path.read_text(encoding="utf-8"))}
+    assert results[str(statements / "client_0_crash.csv")]["error"].startswith("BrokenProcessPool")
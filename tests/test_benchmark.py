@@ -0,0 +1,79 @@
+import json
+import logging
+
+import pytest
+
+import src.benchmark as benchmark
+import src.cache as cache_module
+from src.benchmark import compare, load_results, main, run_benchmarks, save_results
+
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory):
+    """
+    Замеряет функции на синтетической выписке из 1000 транзакций (один холодный вызов)
+    и запоминает уровень журнала до замеров.
+    """
+    level = logging.getLogger().level
+    measured = run_benchmarks(sizes=(1000,), repeat=1, directory=str(tmp_path_factory.mktemp("benchmarks")))
+    measured["log_level"] = level
+    return measured
+
+
+def test_run_benchmarks(results):
+    """
+    Тест проверяет, что замерены все функции, а кэш результатов и уровень журнала восстановлены.
+    """
+    measured = results["results"]["1000"]
+    assert set(measured) == {
+        "transactions_xlsx",
+        "web_search_xcl",
+        "num_card_account",
+        "analyze_cashback",
+        "get_transactions_with_phones",
+        "process_excel_data",
+        "rep_category_spending",
+        "rep_spending_on_weekdays",
+        "rep_spend_on_working_or_weekends",
+    }
+    assert all(metrics["time_ms"] > 0 and metrics["peak_mb"] >= 0 for metrics in measured.values())
+    assert results["meta"]["seed"] == benchmark.DEFAULT_SEED
+    assert cache_module.result_cache.directory == cache_module.RESULT_CACHE_DIR
+    assert logging.getLogger().level == results["log_level"]
+
+
+def test_compare(results):
+    """
+    Тест проверяет, что регрессией считается только ухудшение больше порога и минимальной разницы.
+    """
+    baseline = json.loads(json.dumps(results))
+    current = json.loads(json.dumps(results))
+    measured = current["results"]["1000"]
+    measured["web_search_xcl"]["time_ms"] = measured["web_search_xcl"]["time_ms"] * 2 + 10
+    measured["num_card_account"]["time_ms"] += 1
+    measured["analyze_cashback"]["peak_mb"] += 50
+
+    regressions = compare(current, baseline, threshold=0.25)
+    assert {(item["function"], item["metric"]) for item in regressions} == {
+        ("web_search_xcl", "time_ms"),
+        ("analyze_cashback", "peak_mb"),
+    }
+    assert compare(baseline, baseline) == []
+
+
+def test_main_baseline(results, tmp_path, monkeypatch):
+    """
+    Тест проверяет запуск из командной строки: сохранение эталона и код завершения при регрессии.
+    """
+    monkeypatch.setattr(benchmark, "run_benchmarks", lambda *args, **kwargs: json.loads(json.dumps(results)))
+    baseline_path = str(tmp_path / "baseline.json")
+
+    assert main(["--baseline", baseline_path, "--save-baseline"]) == 0
+    assert load_results(baseline_path) == results
+    assert main(["--baseline", baseline_path, "--output", str(tmp_path / "result.json")]) == 0
+    assert load_results(str(tmp_path / "result.json")) == results
+
+    faster = json.loads(json.dumps(results))
+    faster["results"]["1000"]["transactions_xlsx"]["time_ms"] = 0.001
+    save_results(faster, baseline_path)
+    assert main(["--baseline", baseline_path]) == 1
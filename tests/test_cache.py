@@ -0,0 +1,146 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import src.cache as cache_module
+from src.cache import ResultCache, dataset_fingerprint, memoize_result
+from src.store import TransactionStore, clear_stores, resolve_store
+
+
+@pytest.fixture
+def counted():
+    """
+    Создает кэшируемую функцию, которая считает свои вызовы.
+    """
+    cache = ResultCache(maxsize=8)
+    calls = []
+
+    @memoize_result(cache)
+    def total(data, column):
+        calls.append(column)
+        return float(resolve_store(data).df[column].sum())
+
+    return total, calls, cache
+
+
+def test_result_cache_lru_eviction():
+    """
+    Тест проверяет, что при превышении размера вытесняется давно не использованная запись.
+    """
+    cache = ResultCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+
+
+def test_result_cache_disk_layer(tmp_path):
+    """
+    Тест проверяет, что результат, сохранённый на диск, доступен новому экземпляру кэша.
+    """
+    ResultCache(directory=str(tmp_path)).set("key", {"Еда": 75.0})
+    assert ResultCache(directory=str(tmp_path)).get("key") == (True, {"Еда": 75.0})
+
+
+def test_result_cache_concurrent_disk_writes(tmp_path):
+    """
+    Тест проверяет, что одновременная запись одного ключа на диск не оставляет временных файлов,
+    не трогает временный файл с прежним фиксированным именем и сохраняет читаемый результат.
+    """
+    foreign = tmp_path / "key.pkl.tmp"
+    foreign.write_text("запись другого процесса", encoding="utf-8")
+    cache = ResultCache(directory=str(tmp_path))
+    value = {"Еда": list(range(10000))}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: cache.set("key", value), range(32)))
+
+    assert sorted(os.listdir(tmp_path)) == ["key.pkl", "key.pkl.tmp"]
+    assert foreign.read_text(encoding="utf-8") == "запись другого процесса"
+    assert ResultCache(directory=str(tmp_path)).get("key") == (True, value)
+
+
+def test_memoize_result_store_and_arguments(counted):
+    """
+    Тест проверяет, что повторный вызов с тем же хранилищем и аргументами берётся из кэша,
+    а другие аргументы или другие данные вычисляются заново.
+    """
+    total, calls, cache = counted
+    store = TransactionStore(pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}))
+
+    assert total(store, "a") == 3.0
+    assert total(store, "a") == 3.0
+    assert total(store, "b") == 7.0
+    assert total(TransactionStore(pd.DataFrame({"a": [5.0]})), "a") == 5.0
+    assert calls == ["a", "b", "a"]
+    assert cache.hits == 1
+
+
+def test_memoize_result_invalidated_by_file_change(counted, tmp_path):
+    """
+    Тест проверяет, что после изменения Excel файла результат вычисляется заново.
+    """
+    total, calls, _ = counted
+    file_name = os.path.join(tmp_path, "operations.xlsx")
+    clear_stores()
+    pd.DataFrame({"a": [1.0]}).to_excel(file_name, index=False)
+    assert total(file_name, "a") == 1.0
+    assert total(file_name, "a") == 1.0
+
+    pd.DataFrame({"a": [1.0, 10.0]}).to_excel(file_name, index=False)
+    assert total(file_name, "a") == 11.0
+    assert len(calls) == 2
+    clear_stores()
+
+
+def test_memoize_result_bypasses_file_objects(counted):
+    """
+    Тест проверяет, что для файловых объектов кэш не используется.
+    """
+    total, calls, _ = counted
+    data = BytesIO()
+    pd.DataFrame({"a": [2.0]}).to_excel(data, index=False)
+    data.seek(0)
+    assert dataset_fingerprint(data) is None
+    assert total(data, "a") == 2.0
+    assert calls == ["a"]
+
+
+def test_dataset_fingerprint_distinguishes_store_and_frame():
+    """
+    Тест проверяет, что отпечаток хранилища вычисляется один раз и отличается от отпечатка DataFrame.
+    """
+    df = pd.DataFrame({"a": [1.0]})
+    store = TransactionStore(df)
+    assert dataset_fingerprint(store) == dataset_fingerprint(store)
+    assert dataset_fingerprint(store) != dataset_fingerprint(df)
+    assert dataset_fingerprint(df) != dataset_fingerprint(pd.DataFrame({"a": [2.0]}))
+
+
+def test_memoize_result_bypasses_frames(monkeypatch):
+    """
+    Тест проверяет, что для DataFrame кэш не используется: содержимое не хэшируется,
+    а после изменения значений на месте результат вычисляется заново.
+    """
+    calls = []
+
+    @memoize_result(ResultCache(maxsize=8))
+    def total(df, column):
+        calls.append(column)
+        return float(df[column].sum())
+
+    hashed = []
+    frame_fingerprint = cache_module.frame_fingerprint
+    monkeypatch.setattr(cache_module, "frame_fingerprint", lambda df: hashed.append(len(df)) or frame_fingerprint(df))
+    df = pd.DataFrame({"a": [1.0, 2.0]})
+
+    assert total(df, "a") == 3.0
+    df.loc[0, "a"] = 100.0
+    assert total(df, "a") == 102.0
+    assert calls == ["a", "a"]
+    assert hashed == []
@@ -0,0 +1,143 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.currency import CurrencyError, RateTable, convert_store, convert_transactions
+from src.store import TransactionStore, normalize_transactions
+from src.utils import num_card_account
+
+
+@pytest.fixture
+def rates():
+    """
+    Создает таблицу курсов относительно USD на две даты.
+    """
+    table = RateTable()
+    table.add({"USD": 1.0, "RUB": 80.0, "EUR": 0.8}, date="2023-09-01")
+    table.add({"USD": 1.0, "RUB": 100.0, "EUR": 0.9}, date="2023-10-01")
+    return table
+
+
+@pytest.fixture
+def transactions():
+    """
+    Создает DataFrame с транзакциями в рублях и евро.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["15.08.2023 12:00:00", "15.09.2023 15:30:00", "05.10.2023 10:00:00"],
+            "Номер карты": ["*3456", "*3456", "*3456"],
+            "Сумма операции": [-800.0, -8.0, -1000.0],
+            "Валюта операции": ["RUB", "EUR", "RUB"],
+            "Сумма платежа": [-800.0, -800.0, -1000.0],
+            "Валюта платежа": ["RUB", "RUB", "RUB"],
+            "Кэшбэк": [8.0, 8.0, 10.0],
+            "Сумма операции с округлением": [800.0, 800.0, 1000.0],
+        }
+    )
+    return normalize_transactions(df)
+
+
+def test_conversion_factors_use_rate_on_operation_date(rates):
+    """
+    Тест проверяет, что курс берётся на последнюю дату не позже даты операции, для операций раньше
+    первой даты - на первую дату, а для неизвестной валюты и пропусков коэффициент равен NaN.
+    """
+    dates = pd.to_datetime(["2023-08-15", "2023-09-20", "2023-10-05", "2023-10-05", None])
+    factors = rates.conversion_factors(dates, ["RUB", "EUR", "RUB", "GBP", "RUB"], "USD")
+
+    np.testing.assert_allclose(factors[:3], [1 / 80, 1 / 0.8, 1 / 100])
+    assert np.isnan(factors[3:]).all()
+    # Суммы в целевой валюте не пересчитываются, даже если курсов нет
+    assert RateTable().conversion_factors(dates[:1], ["RUB"], "RUB").tolist() == [1.0]
+
+
+def test_convert_transactions(rates, transactions):
+    """
+    Тест проверяет пересчёт сумм по валюте операции и валюте платежа и замену валют на целевую.
+    """
+    converted = convert_transactions(transactions, "USD", rates)
+
+    np.testing.assert_allclose(converted["Сумма операции"], [-10.0, -10.0, -10.0])
+    np.testing.assert_allclose(converted["Сумма платежа"], [-10.0, -10.0, -10.0])
+    np.testing.assert_allclose(converted["Кэшбэк"], [0.1, 0.1, 0.1])
+    assert converted["Валюта операции"].tolist() == ["USD"] * 3
+    assert transactions["Валюта операции"].tolist() == ["RUB", "EUR", "RUB"]
+
+
+def test_convert_transactions_without_rates(rates, transactions):
+    """
+    Тест проверяет, что без курса целевой или исходной валюты и без даты операции пересчёт прерывается
+    ошибкой, а суммы в целевой валюте пересчитываются и без курсов.
+    """
+    with pytest.raises(CurrencyError, match="EUR, RUB, USD"):
+        convert_transactions(transactions, "USD", RateTable())
+    with pytest.raises(CurrencyError, match="GBP"):
+        convert_transactions(transactions, "GBP", rates)
+
+    undated = transactions.copy()
+    undated.loc[1, "Дата операции"] = pd.NaT
+    with pytest.raises(CurrencyError, match="1 транзакций"):
+        convert_transactions(undated, "USD", rates)
+
+    rubles = transactions[transactions["Валюта операции"] == "RUB"]
+    converted = convert_transactions(rubles, "RUB", RateTable())
+    assert converted["Сумма операции"].tolist() == rubles["Сумма операции"].tolist()
+
+
+def test_convert_store_is_cached_and_updated(rates, transactions):
+    """
+    Тест проверяет, что пересчитанное хранилище строится один раз, дополняется при добавлении транзакций
+    и строится заново после изменения курсов.
+    """
+    store = TransactionStore(transactions.iloc[:2].reset_index(drop=True))
+    converted = convert_store(store, "USD", rates)
+    assert convert_store(store, "USD", rates) is converted
+    assert json.loads(num_card_account(converted, "*3456"))["Сумма операций"] == 20
+
+    store.append(transactions.iloc[2:])
+    assert convert_store(store, "USD", rates) is converted
+    assert json.loads(num_card_account(converted, "*3456"))["Сумма операций"] == 30
+
+    rates.add({"USD": 1.0, "RUB": 50.0, "EUR": 0.5}, date="2023-10-01")
+    recalculated = convert_store(store, "USD", rates)
+    assert recalculated is not converted
+    assert json.loads(num_card_account(recalculated, "*3456"))["Сумма операций"] == 40
+    assert len([key for key in store.indexes if key[0] == "currency"]) == 1
+
+
+def test_rate_table_concurrent_csv_writes(tmp_path, rates):
+    """
+    Тест проверяет, что одновременное сохранение таблицы курсов из нескольких потоков
+    не оставляет временных файлов и сохраняет читаемую таблицу.
+    """
+    filepath = str(tmp_path / "rates.csv")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: rates.to_csv(filepath), range(32)))
+
+    assert os.listdir(tmp_path) == ["rates.csv"]
+    pd.testing.assert_frame_equal(RateTable.read_csv(filepath).frame, rates.frame)
+
+
+def test_rate_table_csv_and_base_currency(tmp_path, rates):
+    """
+    Тест проверяет сохранение и загрузку таблицы курсов, пересчёт курсов с другой базовой валютой
+    и то, что повторное добавление тех же курсов не меняет таблицу.
+    """
+    filepath = tmp_path / "rates.csv"
+    rates.to_csv(str(filepath))
+    loaded = RateTable.read_csv(str(filepath))
+    pd.testing.assert_frame_equal(loaded.frame, rates.frame)
+
+    version = loaded.version
+    loaded.add({"USD": 1.0, "RUB": 100.0, "EUR": 0.9}, date="2023-10-01")
+    assert loaded.version == version
+
+    loaded.add({"RUB": 1.0, "USD": 0.01, "EUR": 0.009}, date="2023-11-01", base="RUB")
+    factors = loaded.conversion_factors(pd.to_datetime(["2023-11-02"]), ["RUB"], "USD")
+    np.testing.assert_allclose(factors, [0.01])
+    assert loaded.currencies() == ["EUR", "RUB", "USD"]
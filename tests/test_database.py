@@ -0,0 +1,180 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from src.cache import dataset_fingerprint
+from src.database import SQLiteStore, get_database
+from src.reports import rep_category_spending, rep_spend_on_working_or_weekends, rep_spending_on_weekdays
+from src.services import analyze_cashback, get_transactions_with_phones
+from src.store import TransactionStore, normalize_transactions
+from src.utils import cards_summary, num_card_account, web_search_xcl
+from src.views import process_excel_data
+
+
+@pytest.fixture
+def frame():
+    """
+    Создает DataFrame с транзакциями по двум картам в формате банковской выписки.
+    """
+    return pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.09.2023 12:00:00",
+                "15.09.2023 15:30:00",
+                "16.09.2023 10:00:00",
+                "05.10.2023 10:00:00",
+            ],
+            "Номер карты": ["*3456", "*7654", "*3456", None],
+            "Сумма операции": [-100.1, -200.2, -300.3, -50.0],
+            "Кэшбэк": [1.0, None, 3.0, 5.0],
+            "Категория": ["Фастфуд", "Супермаркеты", "Фастфуд", "Переводы"],
+            "MCC": [5814.0, 5411.0, None, None],
+            "Описание": ["Бургер", "Магнит", "Бургер", "Иван +7 921 111-22-33"],
+            "Сумма операции с округлением": [100.1, 200.2, 300.3, 50.0],
+        }
+    )
+
+
+@pytest.fixture
+def stores(frame, tmp_path):
+    """
+    Создает хранилище в памяти и базу SQLite с одинаковыми транзакциями.
+    """
+    store = TransactionStore(normalize_transactions(frame))
+    database = SQLiteStore.from_frame(store.df, str(tmp_path / "transactions.sqlite"))
+    yield store, database
+    database.close()
+
+
+def test_queries_match_transaction_store(stores):
+    """
+    Тест проверяет, что поиск, суммы по картам, кэшбэк, выборка по датам, телефоны и отчёты,
+    вычисленные запросами SQL, совпадают с результатами для хранилища в памяти.
+    """
+    store, database = stores
+    calls = [
+        lambda data: web_search_xcl(data, "фаст"),
+        lambda data: web_search_xcl(data, "бур", mode="prefix", column="Описание"),
+        lambda data: num_card_account(data, "*3456"),
+        lambda data: num_card_account(data, "*0000"),
+        lambda data: cards_summary(data),
+        lambda data: analyze_cashback(data, 2023, 9),
+        lambda data: process_excel_data(data, "10.09.2023"),
+        lambda data: get_transactions_with_phones(data),
+        lambda data: rep_category_spending(data, "Фастфуд", "2023-09-15", save_report=False),
+        lambda data: rep_spending_on_weekdays(data, "2023-10-31", save_report=False),
+        lambda data: rep_spend_on_working_or_weekends(data, "2023-10-31", save_report=False),
+    ]
+    for call in calls:
+        assert call(database) == call(store)
+
+
+def test_indexes_used(stores):
+    """
+    Тест проверяет, что созданы индексы по дате, категории, карте и MCC и что выборка по карте использует индекс.
+    """
+    _, database = stores
+    names = {row[0] for row in database.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_date", "idx_category_date", "idx_card", "idx_mcc"} <= names
+
+    plan = database.connection.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE "Номер карты" = ?', ("*3456",)
+    ).fetchall()
+    assert any("idx_card" in row[-1] for row in plan)
+
+
+def test_append_changes_version(stores):
+    """
+    Тест проверяет, что добавление транзакций увеличивает версию базы, меняет отпечаток
+    и учитывается в запросах.
+    """
+    _, database = stores
+    fingerprint = dataset_fingerprint(database)
+    new = normalize_transactions(
+        pd.DataFrame(
+            {
+                "Дата операции": ["20.09.2023 09:00:00"],
+                "Номер карты": ["*3456"],
+                "Сумма операции": [-10.0],
+                "Категория": ["Фастфуд"],
+                "Сумма операции с округлением": [10.0],
+            }
+        )
+    )
+
+    assert database.append(new) == 1
+    assert len(database) == 5
+    assert database.meta()["version"] == 1
+    assert dataset_fingerprint(database) != fingerprint
+    assert num_card_account(database, "*3456") == '{"Номер карты": "*3456", "Сумма операций": 410}'
+
+
+def test_pickle_reopens_connection(stores):
+    """
+    Тест проверяет, что база передаётся в другой процесс (pickle) без соединения и открывает его заново.
+    """
+    _, database = stores
+    copy = pickle.loads(pickle.dumps(database))
+    assert copy.path == database.path
+    assert len(copy) == 4
+
+
+def test_get_database_reuses_and_rebuilds(frame, tmp_path):
+    """
+    Тест проверяет, что база создаётся из Excel файла, используется повторно
+    и пересоздаётся после изменения файла.
+    """
+    excel_path = str(tmp_path / "operations.xlsx")
+    frame.to_excel(excel_path, index=False)
+
+    database = get_database(excel_path)
+    assert len(database) == 4
+    assert os.path.dirname(database.path).endswith(".transactions_cache")
+    assert get_database(excel_path).fingerprint() == database.fingerprint()
+
+    frame.iloc[:2].to_excel(excel_path, index=False)
+    rebuilt = get_database(excel_path)
+    assert len(rebuilt) == 2
+    assert rebuilt.fingerprint() != database.fingerprint()
+
+
+def test_get_database_with_date_cells(frame, tmp_path):
+    """
+    Тест проверяет, что даты из ячеек Excel с типом даты попадают в базу и запросы с ограничением
+    по дате дают те же результаты, что и хранилище в памяти, а неразбираемая дата вызывает ошибку.
+    """
+    excel_path = str(tmp_path / "operations.xlsx")
+    dated = frame.assign(**{"Дата операции": pd.to_datetime(frame["Дата операции"], dayfirst=True)})
+    dated.to_excel(excel_path, index=False)
+
+    database = get_database(excel_path)
+    store = TransactionStore(normalize_transactions(pd.read_excel(excel_path)))
+    assert database.frame(["Дата операции"])["Дата операции"].tolist() == store.df["Дата операции"].tolist()
+    assert analyze_cashback(database, 2023, 9) == analyze_cashback(store, 2023, 9) != "{}"
+    database.close()
+
+    frame.assign(**{"Дата операции": ["вчера"] * len(frame)}).to_excel(excel_path, index=False)
+    with pytest.raises(ValueError, match="вчера"):
+        get_database(excel_path)
+
+
+def test_from_chunks_uses_unique_temp_file(frame, tmp_path):
+    """
+    Тест проверяет, что при ошибке сборки временный файл удаляется, существующая база не меняется,
+    а чужой временный файл с прежним фиксированным именем не трогается.
+    """
+    path = str(tmp_path / "transactions.sqlite")
+    SQLiteStore.from_frame(normalize_transactions(frame), path).close()
+    foreign = tmp_path / "transactions.sqlite.tmp"
+    foreign.write_text("сборка другого процесса")
+
+    with pytest.raises(ValueError):
+        SQLiteStore.from_chunks(iter([[]]), path)
+
+    assert sorted(os.listdir(tmp_path)) == ["transactions.sqlite", "transactions.sqlite.tmp"]
+    assert foreign.read_text() == "сборка другого процесса"
+    database = SQLiteStore(path)
+    assert len(database) == 4
+    database.close()
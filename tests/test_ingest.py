@@ -0,0 +1,190 @@
+import pandas as pd
+import pytest
+
+from src.aggregates import get_card_aggregates, get_cashback_cube, get_category_prefix_sums
+from src.cache import dataset_fingerprint
+from src.database import SQLiteStore, get_database
+from src.ingest import ingest_statement, ingest_statements, read_statement
+from src.reports import rep_category_spending
+from src.search import get_search_index
+from src.store import TransactionStore, clear_stores, get_date_index, get_store, normalize_transactions
+
+
+def make_frame(rows):
+    """
+    Создает DataFrame с транзакциями из списка кортежей (дата, карта, категория, сумма, описание).
+    """
+    return pd.DataFrame(
+        {
+            "Дата операции": [row[0] for row in rows],
+            "Номер карты": [row[1] for row in rows],
+            "Категория": [row[2] for row in rows],
+            "Сумма операции": [row[3] for row in rows],
+            "Кэшбэк": [1.0] * len(rows),
+            "Сумма операции с округлением": [abs(row[3]) for row in rows],
+            "Описание": [row[4] for row in rows],
+        }
+    )
+
+
+HISTORY = [
+    ("01.09.2023 12:00:00", "*3456", "Фастфуд", -100.0, "Бургер"),
+    ("15.09.2023 15:30:00", "*7654", "Супермаркеты", -200.0, "Магнит"),
+    ("20.09.2023 10:00:00", "*3456", "Фастфуд", -300.0, "Бургер"),
+]
+
+STATEMENT = [
+    ("20.09.2023 10:00:00", "*3456", "Фастфуд", -300.0, "Бургер"),
+    ("10.09.2023 09:00:00", "*1111", "Аптеки", -50.5, "Аптека"),
+    ("02.10.2023 18:00:00", "*7654", "Фастфуд", -75.25, "Бургер"),
+]
+
+
+@pytest.fixture
+def store():
+    """
+    Создает хранилище с историей транзакций и построенными индексами и агрегатами.
+    """
+    store = TransactionStore(normalize_transactions(make_frame(HISTORY)))
+    get_date_index(store)
+    get_search_index(store, "Категория")
+    get_card_aggregates(store)
+    get_cashback_cube(store)
+    get_category_prefix_sums(store)
+    return store
+
+
+@pytest.fixture
+def statement_csv(tmp_path):
+    """
+    Создает CSV выписку в формате банка (разделитель ';', десятичная запятая).
+    """
+    path = tmp_path / "statement.csv"
+    make_frame(STATEMENT).to_csv(path, sep=";", decimal=",", index=False)
+    return str(path)
+
+
+def test_read_statement_csv(statement_csv):
+    """
+    Тест проверяет чтение CSV выписки и нормализацию типов столбцов.
+    """
+    df = read_statement(statement_csv)
+    assert len(df) == 3
+    assert pd.api.types.is_datetime64_any_dtype(df["Дата операции"])
+    assert df["Сумма операции"].tolist() == [-300.0, -50.5, -75.25]
+    assert df["Категория"].dtype == "category"
+
+
+def test_read_statement_unsupported_format(tmp_path):
+    """
+    Тест проверяет, что для неподдерживаемого формата файла вызывается ValueError.
+    """
+    with pytest.raises(ValueError, match="Неподдерживаемый формат"):
+        read_statement(str(tmp_path / "statement.txt"))
+
+
+def test_ingest_statement_deduplicates(store, statement_csv, tmp_path):
+    """
+    Тест проверяет, что уже загруженные строки пропускаются, а повторная загрузка выписки ничего не добавляет.
+    """
+    assert ingest_statement(store, statement_csv) == 2
+    assert len(store) == 5
+
+    xlsx_path = str(tmp_path / "statement.xlsx")
+    make_frame(STATEMENT[1:] + [("05.10.2023 12:00:00", "*3456", "Аптеки", -10.0, "Аптека")]).to_excel(
+        xlsx_path, index=False
+    )
+    assert ingest_statements(store, [statement_csv, xlsx_path]) == {statement_csv: 0, xlsx_path: 1}
+    assert len(store) == 6
+
+
+def test_ingest_statement_into_database(statement_csv, tmp_path):
+    """
+    Тест проверяет, что загрузка выписки в базу SQLite пропускает уже загруженные строки:
+    повторная загрузка той же выписки, в том числе через новое соединение с базой, ничего не добавляет.
+    """
+    path = str(tmp_path / "transactions.sqlite")
+    database = SQLiteStore.from_frame(normalize_transactions(make_frame(HISTORY)), path)
+
+    assert ingest_statement(database, statement_csv) == 2
+    assert ingest_statement(database, statement_csv) == 0
+    assert len(database) == 5
+    assert database.version() == 1
+
+    reopened = SQLiteStore(path)
+    assert ingest_statements(reopened, [statement_csv]) == {statement_csv: 0}
+    assert len(reopened) == 5
+    assert database.frame(["Описание"])["Описание"].tolist() == ["Бургер", "Магнит", "Бургер", "Аптека", "Бургер"]
+    reopened.close()
+    database.close()
+
+
+def test_ingested_rows_survive_reload(statement_csv, tmp_path):
+    """
+    Тест проверяет, что загруженные строки записываются в журнал Excel файла и восстанавливаются
+    после перезагрузки хранилища, пересоздания базы SQLite и изменения Excel файла без повторов.
+    """
+    excel_path = str(tmp_path / "operations.xlsx")
+    make_frame(HISTORY).to_excel(excel_path, index=False)
+    clear_stores()
+    try:
+        assert ingest_statement(excel_path, statement_csv) == 2
+        clear_stores()
+        assert len(get_store(excel_path)) == 5
+        assert ingest_statement(excel_path, statement_csv) == 0
+
+        database = get_database(excel_path)
+        assert len(database) == 5
+        database.close()
+
+        # В новую версию Excel файла вошла одна из загруженных строк: она не повторяется
+        make_frame(HISTORY + STATEMENT[1:2]).to_excel(excel_path, index=False)
+        clear_stores()
+        assert len(get_store(excel_path)) == 5
+        rebuilt = get_database(excel_path)
+        assert len(rebuilt) == 5
+        assert rebuilt.frame(["Описание"])["Описание"].tolist()[-2:] == ["Аптека", "Бургер"]
+        rebuilt.close()
+    finally:
+        clear_stores()
+
+
+def test_ingest_updates_indexes_like_rebuild(store, statement_csv):
+    """
+    Тест проверяет, что индексы и агрегаты после загрузки выписки совпадают с построенными заново
+    по всем транзакциям, а категории остаются типа category.
+    """
+    ingest_statement(store, statement_csv)
+    rebuilt = TransactionStore(normalize_transactions(make_frame(HISTORY + STATEMENT[1:])))
+
+    assert store.df["Категория"].dtype == "category"
+    assert list(store.df["Категория"].cat.categories) == list(rebuilt.df["Категория"].cat.categories)
+    assert store.features["День недели"].tolist() == rebuilt.features["День недели"].tolist()
+    assert get_card_aggregates(store).cards() == get_card_aggregates(rebuilt).cards()
+    pd.testing.assert_frame_equal(get_cashback_cube(store).frame, get_cashback_cube(rebuilt).frame)
+    for category in ("Фастфуд", "Аптеки"):
+        for date in ("2023-09-05", "2023-09-30", "2023-10-31"):
+            assert get_category_prefix_sums(store).total_until(category, date) == get_category_prefix_sums(
+                rebuilt
+            ).total_until(category, date)
+    assert get_search_index(store, "Категория").search("апт").tolist() == [3]
+    assert get_search_index(store, "Категория").search("фаст").tolist() == [0, 2, 4]
+    assert get_date_index(store).positions_between("2023-09-05", "2023-09-30").tolist() == [1, 2, 3]
+    assert get_date_index(store).order.tolist() == [0, 3, 1, 2, 4]
+
+
+def test_ingest_changes_fingerprint(store, statement_csv):
+    """
+    Тест проверяет, что после загрузки выписки меняется отпечаток хранилища
+    и кэшированные отчёты вычисляются заново.
+    """
+    before = rep_category_spending(store, "Фастфуд", "31.10.2023", save_report=False)
+    fingerprint = dataset_fingerprint(store)
+
+    ingest_statement(store, statement_csv)
+
+    assert dataset_fingerprint(store) != fingerprint
+    assert before == "Общие расходы на категорию 'Фастфуд': -400.0"
+    assert rep_category_spending(store, "Фастфуд", "31.10.2023", save_report=False) == (
+        "Общие расходы на категорию 'Фастфуд': -475.25"
+    )
@@ -0,0 +1,90 @@
+import json
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.logging_config import DroppingQueueHandler, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def root_logger():
+    """
+    Возвращает корневой логгер и после теста снимает настройку журнала и восстанавливает уровень.
+    """
+    logger = logging.getLogger()
+    level = logger.level
+    yield logger
+    shutdown_logging()
+    logger.setLevel(level)
+
+
+def test_setup_logging_writes_rotated_json_lines(tmp_path, root_logger):
+    """
+    Тест проверяет, что записи пишутся в файл в формате JSON lines с полями из extra,
+    а при превышении размера файл ротируется.
+    """
+    log_file = tmp_path / "logs" / "app.log"
+    setup_logging(level="INFO", log_file=str(log_file), json_lines=True, max_bytes=500, backup_count=2, force=True)
+
+    logging.debug("Эта запись не попадает в журнал")
+    for number in range(10):
+        logging.info("Обработан файл %s", number, extra={"rows": number * 10})
+    shutdown_logging()
+
+    assert (tmp_path / "logs" / "app.log.1").exists()
+    entries = []
+    for path in (tmp_path / "logs" / "app.log.2", tmp_path / "logs" / "app.log.1", log_file):
+        if path.exists():
+            entries += [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert entries[-1]["message"] == "Обработан файл 9"
+    assert entries[-1]["level"] == "INFO"
+    assert entries[-1]["rows"] == 90
+    assert all("Эта запись" not in entry["message"] for entry in entries)
+
+
+def test_setup_logging_is_idempotent(root_logger):
+    """
+    Тест проверяет, что повторный вызов setup_logging не добавляет второй обработчик.
+    """
+    handler = setup_logging(force=True)
+
+    assert setup_logging(level="DEBUG") is handler
+    assert root_logger.handlers.count(handler) == 1
+    assert root_logger.level == logging.INFO
+
+
+def test_queue_handler_drops_records_when_queue_is_full():
+    """
+    Тест проверяет, что при заполненной очереди запись отбрасывается без ожидания,
+    а сообщение формируется в момент записи, с текущими значениями аргументов.
+    """
+    handler = DroppingQueueHandler(queue.Queue(1))
+    values = ["до"]
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "Значения: %s", (values,), None)
+
+    handler.handle(record)
+    values.append("после")
+    handler.handle(record)
+
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "Значения: ['до']"
+
+
+def test_queue_handler_counts_drops_from_threads():
+    """
+    Тест проверяет, что отброшенные записи из нескольких потоков учитываются без потерь.
+    """
+    handler = DroppingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "Запись", None, None)
+    handler.enqueue(record)
+
+    def drop_many(_):
+        for _ in range(2000):
+            handler.enqueue(record)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(drop_many, range(8)))
+
+    assert handler.dropped == 8 * 2000
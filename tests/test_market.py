@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import src.market as market
+from src.market import MarketDataError, TTLCache, fetch_conversion_rates, fetch_quote, fetch_quotes
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Отвечает на запросы курсов валют и котировок фиксированными данными."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(url)
+        if url.path.startswith("/rates/"):
+            status, body = 200, {"conversion_rates": {"USD": 1.0, "EUR": 0.9}}
+        else:
+            symbol = parse_qs(url.query)["symbol"][0]
+            if symbol == "BAD":
+                status, body = 200, {"Error Message": "Invalid API call"}
+            elif symbol == "DOWN":
+                status, body = 503, {}
+            else:
+                status, body = 200, {"Global Quote": {"01. symbol": symbol, "05. price": "100.5"}}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """
+    Запускает локальный HTTP-сервер и направляет на него запросы модуля market.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(market, "EXCHANGE_RATE_API_URL", f"{base}/rates")
+    monkeypatch.setattr(market, "ALPHA_VANTAGE_API_URL", f"{base}/query")
+    market.clear_caches()
+    yield server
+    market.clear_caches()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_conversion_rates_cached(stub_server):
+    """
+    Проверяет, что курсы валют запрашиваются один раз и затем берутся из кэша.
+    """
+    assert fetch_conversion_rates("key") == {"USD": 1.0, "EUR": 0.9}
+    assert fetch_conversion_rates("key") == {"USD": 1.0, "EUR": 0.9}
+    assert len(stub_server.requests) == 1
+    assert stub_server.requests[0].path == "/rates/key/latest/USD"
+
+
+def test_fetch_quote_errors(stub_server):
+    """
+    Проверяет, что сообщение об ошибке API и неуспешный статус приводят к MarketDataError,
+    а ошибки не кэшируются.
+    """
+    with pytest.raises(MarketDataError, match="Invalid API call"):
+        fetch_quote("BAD", "key")
+    with pytest.raises(MarketDataError, match="503"):
+        fetch_quote("DOWN", "key")
+    with pytest.raises(MarketDataError):
+        fetch_quote("BAD", "key")
+    assert len(stub_server.requests) == 3
+
+
+def test_fetch_quotes_batch(stub_server):
+    """
+    Проверяет пакетное получение котировок: каждая акция запрашивается один раз,
+    ошибка по одной акции не мешает остальным.
+    """
+    prices = fetch_quotes(["AAPL", "MSFT", "BAD"], "key")
+
+    assert prices == {"AAPL": 100.5, "MSFT": 100.5, "BAD": None}
+    symbols = sorted(parse_qs(url.query)["symbol"][0] for url in stub_server.requests)
+    assert symbols == ["AAPL", "BAD", "MSFT"]
+    assert fetch_quotes([], "key") == {}
+
+
+def test_ttl_cache_stale_while_revalidate():
+    """
+    Проверяет, что устаревшее значение возвращается сразу, а обновление выполняется в фоне.
+    """
+    cache = TTLCache(ttl=0.05, stale_ttl=10)
+    values = iter([1, 2])
+    refreshed = threading.Event()
+
+    def loader():
+        value = next(values)
+        if value == 2:
+            refreshed.set()
+        return value
+
+    assert cache.get("key", loader) == 1
+    time.sleep(0.06)
+    assert cache.get("key", loader) == 1
+    assert refreshed.wait(1)
+    deadline = time.monotonic() + 1
+    while cache.get("key", loader) != 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert cache.get("key", loader) == 2
+
+
+def test_ttl_cache_expired_and_none():
+    """
+    Проверяет, что значение вне окна устаревания загружается заново, а None не кэшируется.
+    """
+    cache = TTLCache(ttl=0.01)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get("key", loader) == 1
+    time.sleep(0.02)
+    assert cache.get("key", loader) == 2
+    assert cache.get("none", lambda: None) is None
+    assert cache.get("none", lambda: 5) == 5
@@ -0,0 +1,104 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import src.metrics as metrics_module
+from src.metrics import Metrics
+from src.store import TransactionStore, normalize_transactions
+from src.utils import web_search_xcl
+from src.views import process_excel_data
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    """
+    Включает общий реестр замеров на время теста и очищает его до и после теста.
+    """
+    monkeypatch.setattr(metrics_module.metrics, "enabled", True)
+    metrics_module.metrics.reset()
+    yield metrics_module.metrics
+    metrics_module.metrics.reset()
+
+
+def test_disabled_metrics_record_nothing():
+    """
+    Тест проверяет, что выключенный реестр не записывает этапы, счётчики и значения,
+    а декорированная функция возвращает свой результат.
+    """
+    metrics = Metrics(enabled=False)
+
+    @metrics.timed()
+    def add(a, b):
+        return a + b
+
+    with metrics.span("stage") as span:
+        span.rows = 10
+    metrics.increment("counter")
+    metrics.gauge("value", 1)
+
+    assert add(1, 2) == 3
+    assert metrics.summary() == {"enabled": False, "stages": {}, "counters": {}, "gauges": {}}
+
+
+def test_spans_counters_and_export():
+    """
+    Тест проверяет запись этапов (вызовы, ошибки, строки), счётчиков и значений,
+    сбор этапов текущего потока и экспорт в формате Prometheus.
+    """
+    metrics = Metrics(enabled=True)
+
+    @metrics.timed("load", rows=len)
+    def load():
+        return [1, 2, 3]
+
+    with metrics.collect() as stages:
+        load()
+        load()
+        with pytest.raises(ValueError):
+            with metrics.span("parse"):
+                raise ValueError("ошибка")
+    thread = threading.Thread(target=load)
+    thread.start()
+    thread.join()
+    metrics.increment("cache.hits", 2)
+    metrics.gauge("store.transactions", 100)
+
+    summary = metrics.summary()
+    assert summary["stages"]["load"]["count"] == 3
+    assert summary["stages"]["load"]["rows"] == 9
+    assert summary["stages"]["parse"]["errors"] == 1
+    assert summary["counters"] == {"cache.hits": 2}
+    assert summary["gauges"] == {"store.transactions": 100}
+    assert [name for name, _ in stages] == ["load", "load", "parse"]
+
+    text = metrics.to_prometheus()
+    assert '# TYPE transactions_stage_calls_total counter' in text
+    assert 'transactions_stage_calls_total{stage="load"} 3' in text
+    assert 'transactions_stage_errors_total{stage="parse"} 1' in text
+    assert "transactions_cache_hits_total 2" in text
+    assert "transactions_store_transactions 100" in text
+
+
+def test_instrumented_functions(enabled_metrics):
+    """
+    Тест проверяет, что функции анализа записывают этапы поиска, фильтрации по дате и кодирования JSON.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00"],
+            "Номер карты": ["*3456", "*7654"],
+            "Категория": ["Фастфуд", "Супермаркеты"],
+            "Сумма операции": [-100.0, -200.0],
+        }
+    )
+    store = TransactionStore(normalize_transactions(df))
+
+    web_search_xcl(store, "фаст")
+    process_excel_data(store, "01.09.2023")
+
+    stages = enabled_metrics.summary()["stages"]
+    assert stages["utils.search_transactions"]["rows"] == 1
+    assert stages["views.date_filter"]["rows"] == 2
+    assert stages["json.encode"]["count"] >= 2
+    assert "views.process_excel_data" in stages
@@ -0,0 +1,98 @@
+import json
+import math
+import sys
+
+import pandas as pd
+import pytest
+
+from src.records import TransactionRecords, TransactionRow, get_records
+from src.store import TransactionStore, normalize_transactions
+from src.utils import web_search_xcl
+
+
+@pytest.fixture
+def store():
+    """
+    Создает хранилище с транзакциями, включающими пропуски в категории, кэшбэке и дате платежа.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00", "16.09.2023 10:00:00"],
+            "Дата платежа": ["01.09.2023", None, "16.09.2023"],
+            "Номер карты": ["*3456", "*7654", "*3456"],
+            "Статус": ["OK", "OK", "FAILED"],
+            "Сумма операции": [-100.0, -200.0, 1000.0],
+            "Валюта операции": ["RUB", "USD", "RUB"],
+            "Кэшбэк": [1.0, None, 3.0],
+            "Категория": ["Фастфуд", None, "Пополнения"],
+            "MCC": [5814, 5411, 0],
+            "Описание": ["Теремок", "Магнит", "Перевод"],
+        }
+    )
+    return TransactionStore(normalize_transactions(df))
+
+
+def test_records_match_list_of_dicts(store):
+    """
+    Тест проверяет, что строки TransactionRecords совпадают со словарями store.records(),
+    включая пропуски, типы значений и формат даты операции.
+    """
+    records = get_records(store)
+    expected = store.records()
+
+    assert len(records) == 3
+    assert records == expected
+    assert isinstance(records[1], TransactionRow)
+    assert records[0]["Дата операции"] == "01.09.2023 12:00:00"
+    assert records[0]["MCC"] == 5814 and type(records[0]["MCC"]) is int
+    assert math.isnan(records[1]["Кэшбэк"]) and math.isnan(records[1]["Категория"])
+    assert records[-1].get("Категория") == "Пополнения"
+    assert records[2].get("Нет такого столбца", "нет") == "нет"
+    with pytest.raises(KeyError):
+        records[0]["Нет такого столбца"]
+    assert records.to_json() == json.dumps(expected, ensure_ascii=False).replace("NaN", "null")
+
+
+def test_records_views_share_columns(store):
+    """
+    Тест проверяет, что срезы и выборки строк не копируют столбцы, а словари создаются по запросу.
+    """
+    records = get_records(store)
+
+    assert records[1:] == store.records()[1:]
+    assert records.take([2, 0]) == [records[2], records[0]]
+    assert records.take([2, 0])._columns is records._columns
+    assert records[0].to_dict() == dict(records[0])
+    assert get_records(store) is records
+    assert sys.getsizeof(records[0]) < sys.getsizeof(records[0].to_dict())
+
+
+def test_records_rebuilt_after_append(store):
+    """
+    Тест проверяет, что после добавления транзакций в хранилище представление строится заново.
+    """
+    records = get_records(store)
+    new_rows = pd.DataFrame(
+        {
+            "Дата операции": ["20.09.2023 09:00:00"],
+            "Номер карты": ["*1111"],
+            "Сумма операции": [-50.0],
+            "Валюта операции": ["EUR"],
+            "Категория": ["Кафе"],
+        }
+    )
+    store.append(normalize_transactions(new_rows))
+
+    updated = get_records(store)
+    assert updated is not records
+    assert len(updated) == 4
+    assert updated[3]["Номер карты"] == "*1111" and updated[3]["Валюта операции"] == "EUR"
+    assert updated == store.records()
+
+
+def test_search_over_records(store):
+    """
+    Тест проверяет, что поиск по TransactionRecords и по хранилищу возвращает одинаковый результат.
+    """
+    assert web_search_xcl(get_records(store), "фаст") == web_search_xcl(store, "фаст")
+    assert isinstance(get_records(store), TransactionRecords)
@@ -1,10 +1,13 @@
+import logging
+import os
 from datetime import datetime
 
 import pandas as pd
 import pytest
 
 from src.reports import (load_transactions, rep_category_spending, rep_spend_on_working_or_weekends,
-                         rep_spending_on_weekdays)
+                         rep_spending_on_weekdays, report_writer, result_report_to_file, write_file_atomic)
+from src.store import TransactionStore
 
 
 @pytest.fixture
@@ -83,3 +86,82 @@ def test_rep_spend_on_working_or_weekends(sample_transactions):
     result = rep_spend_on_working_or_weekends(sample_transactions, "2022-12-31")
     assert "Рабочий" in result
     assert "Выходной" in result
+
+
+def test_reports_with_store(sample_transactions):
+    """
+    Тестирует, что отчёты по TransactionStore (выборка по индексу дат и накопленные суммы по категориям)
+    совпадают с отчётами по DataFrame.
+    """
+    store = TransactionStore(sample_transactions.copy())
+    date = "2021-12-27 12:00:00"
+    assert rep_category_spending(store, "Продукты", date) == "Общие расходы на категорию 'Продукты': 250.0"
+    assert rep_category_spending(store, "Одежда", "2021-12-25") == "Общие расходы на категорию 'Одежда': 0.0"
+    assert rep_spending_on_weekdays(store, date) == rep_spending_on_weekdays(sample_transactions, date)
+    assert rep_spend_on_working_or_weekends(store, date) == rep_spend_on_working_or_weekends(sample_transactions, date)
+
+
+def test_reports_do_not_modify_transactions(sample_transactions):
+    """
+    Тестирует, что отчёты по дням недели и типу дня не добавляют столбцы в переданный DataFrame.
+    """
+    columns = list(sample_transactions.columns)
+    rep_spending_on_weekdays(sample_transactions, "2022-12-31")
+    rep_spend_on_working_or_weekends(sample_transactions, "2022-12-31")
+    assert list(sample_transactions.columns) == columns
+
+
+def test_result_report_to_file_writes_to_reports_dir(sample_transactions, tmp_path, monkeypatch):
+    """
+    Тестирует, что отчёт записывается фоновым потоком в каталог REPORTS_DIR,
+    а при save_report=False файл не создаётся.
+    """
+    monkeypatch.setattr("src.reports.REPORTS_DIR", str(tmp_path))
+
+    result = rep_spend_on_working_or_weekends(sample_transactions, "2022-12-31")
+    report_writer.flush()
+    with open(os.path.join(tmp_path, "workweek_or_weekend_spending_report.txt")) as f:
+        assert f.read() == result
+
+    rep_spending_on_weekdays(sample_transactions, "2022-12-31", save_report=False)
+    report_writer.flush()
+    assert os.listdir(tmp_path) == ["workweek_or_weekend_spending_report.txt"]
+
+
+def test_result_report_to_file_logs_summary(sample_transactions, tmp_path, caplog):
+    """
+    Тестирует, что декоратор пишет в журнал размер DataFrame, а не его содержимое.
+    """
+
+    @result_report_to_file("report.txt", directory=str(tmp_path))
+    def count_rows(transactions):
+        return len(transactions)
+
+    with caplog.at_level(logging.INFO):
+        assert count_rows(sample_transactions) == 5
+    report_writer.flush()
+
+    assert "DataFrame(5, 3)" in caplog.text
+    assert "Продукты" not in caplog.text
+    assert count_rows.__name__ == "count_rows"
+    with open(os.path.join(tmp_path, "report.txt")) as f:
+        assert f.read() == "5"
+
+
+def test_write_file_atomic_removes_temp_file_on_error(tmp_path, monkeypatch):
+    """
+    Тестирует, что при ошибке записи отчёта временный файл удаляется, а ошибка передаётся дальше.
+    """
+    path = str(tmp_path / "report.txt")
+    write_file_atomic(path, "первый")
+
+    def failing_replace(src, dst):
+        raise OSError("диск заполнен")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError, match="диск заполнен"):
+        write_file_atomic(path, "второй")
+
+    assert os.listdir(tmp_path) == ["report.txt"]
+    with open(path) as f:
+        assert f.read() == "первый"
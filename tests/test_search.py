@@ -0,0 +1,70 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.search import SearchIndex, get_search_index, value_matches
+from src.store import TransactionStore, normalize_transactions
+from src.utils import web_search_xcl
+
+
+@pytest.fixture
+def store():
+    """
+    Создает хранилище с транзакциями разных категорий.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.08.2023 12:00:00",
+                "02.08.2023 12:00:00",
+                "03.08.2023 12:00:00",
+                "04.08.2023 12:00:00",
+            ],
+            "Категория": ["Фастфуд", "Супермаркеты", None, "фастфуд"],
+            "Описание": ["Burger King", "Магнит Косметик", "Перевод", "Магнит"],
+            "Сумма операции": [-100.0, -200.0, 300.0, -50.0],
+        }
+    )
+    return TransactionStore(normalize_transactions(df))
+
+
+def test_value_matches_modes():
+    """
+    Тест проверяет режимы сравнения: подстрока, префикс и совпадение слов без учёта регистра.
+    """
+    assert value_matches("Супермаркеты", "МАРКЕТ", "substring")
+    assert value_matches("Супермаркеты", "супер", "prefix")
+    assert not value_matches("Супермаркеты", "маркет", "prefix")
+    assert value_matches("Магнит Косметик", "косметик", "token")
+    assert not value_matches("Магнит Косметик", "космет", "token")
+    with pytest.raises(ValueError):
+        value_matches("Супермаркеты", "супер", "regex")
+
+
+def test_search_index_returns_row_positions(store):
+    """
+    Тест проверяет, что индекс возвращает позиции строк в исходном порядке и пропускает пустые значения.
+    """
+    index = SearchIndex.from_frame(store.df, "Категория")
+    assert index.search("фаст").tolist() == [0, 3]
+    assert index.search("").tolist() == [0, 1, 3]
+    assert index.search("нет такой").tolist() == []
+    assert index.matching_values("с", "prefix") == ["Супермаркеты"]
+
+
+def test_get_search_index_is_cached(store):
+    """
+    Тест проверяет, что индекс строится один раз для хранилища и столбца.
+    """
+    assert get_search_index(store) is get_search_index(store)
+    assert get_search_index(store, "Описание").search("магнит", "token").tolist() == [1, 3]
+
+
+def test_web_search_xcl_store_matches_list(store):
+    """
+    Тест проверяет, что поиск по индексу хранилища даёт тот же результат, что и перебор списка транзакций.
+    """
+    assert web_search_xcl(store, "фаст") == web_search_xcl(store.records(), "фаст")
+    result = json.loads(web_search_xcl(store, "магнит", mode="token", column="Описание"))
+    assert [row["Описание"] for row in result] == ["Магнит Косметик", "Магнит"]
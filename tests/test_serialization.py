@@ -0,0 +1,94 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.serialization as serialization
+from src.records import TransactionRecords
+from src.serialization import dumpb, dumps, iter_json_array, write_json_array
+from src.store import normalize_transactions
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """
+    Запускает тест с orjson (если установлен) и со стандартным модулем json.
+    """
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson не установлен")
+    return request.param
+
+
+@pytest.fixture
+def records():
+    """
+    Создает TransactionRecords из пяти транзакций с пропусками в категории и кэшбэке.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": [f"0{day}.09.2023 12:00:00" for day in range(1, 6)],
+            "Номер карты": ["*3456", "*7654", "*3456", None, "*7654"],
+            "Сумма операции": [-100.0, -200.0, -300.0, -400.0, -500.0],
+            "Кэшбэк": [1.0, None, 3.0, None, 5.0],
+            "Категория": ["Фастфуд", None, "Фастфуд", "Такси", "Супермаркеты"],
+        }
+    )
+    return TransactionRecords(normalize_transactions(df))
+
+
+def test_dumps_matches_json_module(encoder):
+    """
+    Тест проверяет, что обычный режим совпадает с json.dumps(ensure_ascii=False),
+    а компактный режим кодирует те же данные без пробелов.
+    """
+    data = {"Категория": "Фастфуд", "Сумма": [1, 2.5, None, True], "Вложенный": {"a": "б"}}
+
+    assert dumps(data) == json.dumps(data, ensure_ascii=False)
+    assert dumps(data, indent=4) == json.dumps(data, ensure_ascii=False, indent=4)
+    assert dumps(data, compact=True) == json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    assert dumpb(data, compact=True) == dumps(data, compact=True).encode("utf-8")
+
+
+def test_dumps_special_values(encoder):
+    """
+    Тест проверяет, что пропуски кодируются как null, даты - в формате ISO 8601, числа numpy - как числа,
+    в обычном и компактном режимах одинаково.
+    """
+    data = {
+        "nan": float("nan"),
+        "np_nan": np.float64("nan"),
+        "nat": pd.NaT,
+        "date": pd.Timestamp("2023-09-01 12:30:00"),
+        "int": np.int64(7),
+        "array": np.array([1, 2]),
+    }
+    expected = {"nan": None, "np_nan": None, "nat": None, "date": "2023-09-01T12:30:00.000", "int": 7, "array": [1, 2]}
+
+    assert json.loads(dumps(data)) == expected
+    assert json.loads(dumps(data, compact=True)) == expected
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_iter_json_array(encoder, records):
+    """
+    Тест проверяет, что потоковое кодирование по частям совпадает с кодированием целиком
+    для списков, итераторов и TransactionRecords.
+    """
+    rows = records.to_dicts()
+    for compact in (False, True):
+        expected = dumps(rows, compact=compact)
+        assert "".join(iter_json_array(records, compact=compact, chunk_size=2)) == expected
+        assert "".join(iter_json_array(iter(rows), compact=compact, chunk_size=3)) == expected
+        assert b"".join(iter_json_array(rows, compact=compact, chunk_size=2, binary=True)) == expected.encode()
+    assert "".join(iter_json_array([])) == "[]"
+    assert json.loads(dumps(records))[1]["Кэшбэк"] is None
+    assert records.to_json(compact=True) == dumps(rows, compact=True)
+
+    buffer = io.StringIO()
+    write_json_array(records, buffer, chunk_size=4)
+    assert buffer.getvalue() == dumps(records)
@@ -0,0 +1,231 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+import pandas as pd
+import pytest
+
+import src.currency as currency_module
+import src.server as server_module
+from src.currency import RateTable
+from src.database import SQLiteStore
+from src.server import ROUTES, create_server
+from src.store import TransactionStore, normalize_transactions
+
+
+@pytest.fixture
+def server():
+    """
+    Запускает HTTP-сервер на свободном порту с хранилищем из трёх транзакций.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00", "05.10.2023 10:00:00"],
+            "Номер карты": ["*3456", "*7654", "*3456"],
+            "Категория": ["Фастфуд", "Супермаркеты", "Фастфуд"],
+            "Описание": ["Бургер", "Магнит", "Бургер"],
+            "Сумма операции": [-100.0, -200.0, -300.0],
+            "Кэшбэк": [1.0, 2.0, 3.0],
+            "Сумма операции с округлением": [100.0, 200.0, 300.0],
+        }
+    )
+    http_server = create_server(TransactionStore(normalize_transactions(df)), port=0, max_concurrent_requests=1)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield http_server
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def request(server, path):
+    """
+    Выполняет GET-запрос к серверу и возвращает (статус, заголовки, JSON ответа).
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}{path}") as response:
+            return response.status, response.headers, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, json.loads(e.read())
+
+
+def test_endpoints(server):
+    """
+    Проверяет ответы основных адресов, наличие заголовков времени обработки и то, что компактное
+    представление транзакций и отпечаток хранилища построены до первого запроса.
+    """
+    assert {("records",), ("fingerprint",)} <= set(server.store.indexes)
+
+    status, headers, body = request(server, "/health")
+    assert status == 200
+    assert body == {"status": "ok", "transactions": 3}
+    assert headers["Server-Timing"].startswith("app;dur=")
+    assert float(headers["X-Response-Time-ms"]) >= 0
+
+    _, _, body = request(server, "/transactions?date=01.09.2023")
+    assert len(body) == 2
+
+    _, _, body = request(server, f"/search?q={quote('фаст')}")
+    assert [row["Категория"] for row in body] == ["Фастфуд", "Фастфуд"]
+
+    _, _, body = request(server, f"/card?number={quote('*3456')}")
+    assert body == {"Номер карты": "*3456", "Сумма операций": 400}
+
+    _, _, body = request(server, "/cashback?year=2023&month=9")
+    assert body == {"Супермаркеты": 2.0, "Фастфуд": 1.0}
+
+    _, _, body = request(server, f"/reports/category?category={quote('Фастфуд')}&date=30.09.2023")
+    assert body == {"report": "Общие расходы на категорию 'Фастфуд': -100.0"}
+
+
+def test_streamed_search(server):
+    """
+    Проверяет, что результат поиска отправляется потоком без Content-Length в компактном формате JSON.
+    """
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/search?q={quote('фаст')}") as response:
+        assert response.headers["Content-Length"] is None
+        data = response.read().decode("utf-8")
+    assert ", " not in data
+    assert [row["Описание"] for row in json.loads(data)] == ["Бургер", "Бургер"]
+
+
+def test_metrics_endpoint(server, monkeypatch):
+    """
+    Проверяет адрес /metrics в форматах Prometheus и JSON и время этапов в заголовке Server-Timing.
+    """
+    monkeypatch.setattr(server_module.metrics, "enabled", True)
+    server_module.metrics.reset()
+
+    _, headers, _ = request(server, f"/search?q={quote('фаст')}")
+    assert "server.search;dur=" in headers["Server-Timing"]
+    assert "utils.search_transactions;dur=" in headers["Server-Timing"]
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        text = response.read().decode("utf-8")
+    assert 'transactions_stage_calls_total{stage="server/search"} 1' in text
+
+    _, _, body = request(server, "/metrics?format=json")
+    assert body["stages"]["utils.search_transactions"]["rows"] == 2
+    server_module.metrics.reset()
+
+
+def test_series_endpoint(server):
+    """
+    Проверяет адрес /series: месячный ряд по категориям, скользящие суммы и ошибку в параметрах.
+    """
+    status, _, body = request(server, "/series?freq=M&by=category")
+    assert status == 200
+    assert body["periods"] == ["2023-09", "2023-10"]
+    assert body["series"] == {"Супермаркеты": [-200.0, 0.0], "Фастфуд": [-100.0, -300.0]}
+
+    _, _, body = request(server, "/series?window=30&start=2023-10-05")
+    assert body == {"freq": "D", "value": "spend", "periods": ["2023-10-05"], "series": {"Всего": [-500.0]}}
+
+    status, _, body = request(server, "/series?freq=Y")
+    assert status == 400
+
+
+def test_currency_without_rates(monkeypatch):
+    """
+    Проверяет, что при отсутствии курсов для пересчёта сервер отвечает 400, а не нулевыми суммами.
+    """
+    monkeypatch.setattr(currency_module, "_rate_table", RateTable())
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00"],
+            "Номер карты": ["*3456", "*3456"],
+            "Категория": ["Фастфуд", "Супермаркеты"],
+            "Описание": ["Бургер", "Магнит"],
+            "Сумма операции": [-100.0, -200.0],
+            "Кэшбэк": [1.0, 2.0],
+            "Валюта операции": ["RUB", "RUB"],
+            "Валюта платежа": ["RUB", "RUB"],
+            "Сумма операции с округлением": [100.0, 200.0],
+        }
+    )
+    http_server = create_server(TransactionStore(normalize_transactions(df)), port=0)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, _, body = request(http_server, "/cards?currency=USD")
+        assert status == 400
+        assert "USD" in body["error"]
+
+        currency_module.get_rate_table().add({"USD": 1.0, "RUB": 100.0}, date="2023-09-01")
+        status, _, body = request(http_server, "/card?number=*3456&currency=USD")
+        assert status == 200
+        assert body["Сумма операций"] == 3
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+
+def test_errors(server):
+    """
+    Проверяет ответ 404 на неизвестный адрес и 400 при отсутствующих или некорректных параметрах:
+    неизвестном режиме поиска, дате в неверном формате и месяце вне диапазона 1..12.
+    """
+    assert request(server, "/unknown")[0] == 404
+
+    status, _, body = request(server, "/transactions")
+    assert status == 400
+    assert "date" in body["error"]
+
+    assert request(server, "/cashback?year=x&month=1")[0] == 400
+    for month in ("0", "13"):
+        status, _, body = request(server, f"/cashback?year=2023&month={month}")
+        assert status == 400
+        assert "month" in body["error"]
+
+    for path in ("/search?q=x&mode=bogus", "/transactions?date=2021-11-24", "/reports/day-type?date=bad"):
+        status, _, body = request(server, path)
+        assert status == 400, path
+        assert "mode" in body["error"] or "date" in body["error"]
+    assert request(server, "/reports/day-type?date=2023-09-30")[0] == 200
+
+
+def test_concurrency_limit(server, monkeypatch):
+    """
+    Проверяет, что при занятых местах для обработки запрос получает 503 с заголовком Retry-After.
+    """
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(store, params):
+        started.set()
+        release.wait(5)
+        return {"done": True}
+
+    monkeypatch.setitem(ROUTES, "/blocking", blocking)
+    monkeypatch.setattr(server_module, "QUEUE_TIMEOUT", 0.05)
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(request(server, "/blocking")))
+    thread.start()
+    assert started.wait(5)
+
+    status, headers, _ = request(server, "/health")
+    assert status == 503
+    assert headers["Retry-After"] == "1"
+
+    release.set()
+    thread.join(5)
+    assert results[0][0] == 200
+    assert request(server, "/health")[0] == 200
+
+
+def test_sqlite_backend(server, tmp_path):
+    """
+    Проверяет, что сервер с базой SQLite отвечает так же, как сервер с хранилищем в памяти.
+    """
+    database = SQLiteStore.from_frame(server.store.df, str(tmp_path / "transactions.sqlite"))
+    sqlite_server = create_server(database, port=0)
+    thread = threading.Thread(target=sqlite_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for path in ("/health", "/transactions?date=01.09.2023", f"/card?number={quote('*3456')}"):
+            assert request(sqlite_server, path)[2] == request(server, path)[2]
+    finally:
+        sqlite_server.shutdown()
+        sqlite_server.server_close()
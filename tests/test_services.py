@@ -4,7 +4,8 @@ from io import BytesIO
 import pandas as pd
 import pytest
 
-from src.services import analyze_cashback, get_transactions_with_phones
+from src.services import analyze_cashback, analyze_cashback_period, get_transactions_with_phones
+from src.store import TransactionStore, normalize_transactions
 
 
 def test_analyze_cashback():
@@ -44,6 +45,25 @@ def test_analyze_cashback():
     assert result == expected_result
 
 
+def test_analyze_cashback_period():
+    """
+    Тестирует функцию analyze_cashback_period, которая суммирует кэшбэк по категориям за диапазон месяцев,
+    и проверяет, что analyze_cashback принимает готовое хранилище.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.07.2023 12:00:00", "15.08.2023 15:30:00", "22.09.2023 18:45:00"],
+            "Категория": ["Еда", "Транспорт", "Еда"],
+            "Кэшбэк": [50.0, 100.0, 25.0],
+        }
+    )
+    store = TransactionStore(normalize_transactions(df))
+
+    assert json.loads(analyze_cashback_period(store, "2023-07", "2023-09")) == {"Еда": 75.0, "Транспорт": 100.0}
+    assert json.loads(analyze_cashback_period(store, "2023-08", "2023-09")) == {"Еда": 25.0, "Транспорт": 100.0}
+    assert json.loads(analyze_cashback(store, 2023, 7)) == {"Еда": 50.0}
+
+
 def test_get_transactions_with_phones():
     """
     Тестирует функцию get_transactions_with_phones, которая извлекает транзакции, содержащие номера телефонов, из описания операций.
@@ -86,5 +106,31 @@ def test_get_transactions_with_phones():
     assert result == expected_result
 
 
+def test_get_transactions_with_phones_repeated_descriptions():
+    """
+    Тестирует get_transactions_with_phones на повторяющихся и пустых описаниях:
+    номера находятся для каждой строки с повторяющимся описанием, пустые описания пропускаются,
+    а описание возвращается без пробелов по краям.
+    """
+    data = BytesIO()
+    df = pd.DataFrame(
+        {
+            "Описание": [
+                " Тинькофф Мобайл +7 995 555-55-55 ",
+                None,
+                "Тинькофф Мобайл +7 995 555-55-55",
+                "Магнит",
+            ]
+        }
+    )
+    df.to_excel(data, index=False)
+    data.seek(0)
+
+    result = json.loads(get_transactions_with_phones(data))
+
+    expected_phone = {"description": "Тинькофф Мобайл +7 995 555-55-55", "phone_numbers": ["+7 995 555-55-55"]}
+    assert result == [{"index": 0, **expected_phone}, {"index": 2, **expected_phone}]
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,183 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import mkdtemp
+
+import pandas as pd
+import pytest
+
+from src.store import (DateIndex, TransactionStore, cache_paths, clear_stores, date_features, get_date_index,
+                       get_store, normalize_transactions, read_cached_frame, resolve_store, write_cached_frame)
+
+
+@pytest.fixture
+def excel_file():
+    """
+    Создает временный Excel файл с транзакциями и удаляет его после теста.
+    """
+    data = {
+        "Дата операции": ["31.12.2021 16:44:00", "30.12.2021 10:00:00"],
+        "Номер карты": ["*7197", "*5091"],
+        "Сумма операции": [-160, -64.5],
+        "Категория": ["Супермаркеты", "Фастфуд"],
+    }
+    directory = mkdtemp()
+    file_name = os.path.join(directory, "operations.xlsx")
+    pd.DataFrame(data).to_excel(file_name, index=False)
+    clear_stores()
+    yield file_name
+    clear_stores()
+    shutil.rmtree(directory)
+
+
+def test_normalize_transactions():
+    """
+    Тест проверяет, что normalize_transactions приводит дату к datetime,
+    категорию и номер карты к category, а суммы к float.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["31.12.2021 16:44:00"],
+            "Номер карты": ["*7197"],
+            "Категория": ["Супермаркеты"],
+            "Сумма операции": [-160],
+        }
+    )
+    df = normalize_transactions(df)
+    assert pd.api.types.is_datetime64_any_dtype(df["Дата операции"])
+    assert isinstance(df["Категория"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["Номер карты"].dtype, pd.CategoricalDtype)
+    assert df["Сумма операции"].dtype == "float64"
+
+
+def test_get_store_reads_file_once(excel_file, mocker):
+    """
+    Тест проверяет, что повторные обращения к get_store не перечитывают неизменённый файл.
+    """
+    read_excel = mocker.spy(pd, "read_excel")
+    first = get_store(excel_file)
+    second = get_store(excel_file)
+    assert first is second
+    assert read_excel.call_count == 1
+
+
+def test_get_store_reloads_changed_file(excel_file):
+    """
+    Тест проверяет, что get_store перечитывает файл после его изменения.
+    """
+    first = get_store(excel_file)
+    pd.DataFrame({"Категория": ["Такси"]}).to_excel(excel_file, index=False)
+    os.utime(excel_file, ns=(0, 0))
+    second = get_store(excel_file)
+    assert second is not first
+    assert len(second) == 1
+
+
+def test_records_keep_bank_date_format(excel_file):
+    """
+    Тест проверяет, что records возвращает дату операции строкой в формате выписки.
+    """
+    records = get_store(excel_file).records()
+    assert records[0]["Дата операции"] == "31.12.2021 16:44:00"
+    assert records[1]["Категория"] == "Фастфуд"
+
+
+def test_resolve_store_returns_given_store():
+    """
+    Тест проверяет, что resolve_store возвращает переданное хранилище без загрузки.
+    """
+    store = TransactionStore(pd.DataFrame({"Категория": ["Такси"]}))
+    assert resolve_store(store) is store
+
+
+def test_get_store_uses_disk_cache(excel_file, mocker):
+    """
+    Тест проверяет, что после первой загрузки данные берутся из колоночного кэша без чтения Excel файла.
+    """
+    first = get_store(excel_file)
+    assert all(os.path.exists(path) for path in cache_paths(os.path.abspath(excel_file)))
+
+    clear_stores()
+    read_excel = mocker.spy(pd, "read_excel")
+    second = get_store(excel_file)
+    assert read_excel.call_count == 0
+    pd.testing.assert_frame_equal(first.df, second.df)
+
+
+def test_get_store_cache_survives_touch(excel_file, mocker):
+    """
+    Тест проверяет, что изменение только времени модификации файла не сбрасывает кэш,
+    так как содержимое сверяется по хэшу.
+    """
+    get_store(excel_file)
+    clear_stores()
+    os.utime(excel_file, ns=(0, 0))
+    read_excel = mocker.spy(pd, "read_excel")
+    get_store(excel_file)
+    assert read_excel.call_count == 0
+
+
+def test_concurrent_cache_writes(excel_file):
+    """
+    Тест проверяет, что одновременные записи кэша одного файла используют разные временные файлы:
+    временный файл другого процесса с прежним фиксированным именем не трогается, других временных
+    файлов не остаётся, и кэш читается.
+    """
+    filepath = os.path.abspath(excel_file)
+    stat = os.stat(filepath)
+    df = get_store(excel_file, use_cache=False).df
+    data_path, meta_path = cache_paths(filepath)
+    os.makedirs(os.path.dirname(data_path))
+    foreign = f"{data_path}.tmp"
+    with open(foreign, "w") as f:
+        f.write("запись другого процесса")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: write_cached_frame(filepath, stat, df), range(16)))
+
+    expected = sorted(map(os.path.basename, (data_path, meta_path, foreign)))
+    assert sorted(os.listdir(os.path.dirname(data_path))) == expected
+    with open(foreign) as f:
+        assert f.read() == "запись другого процесса"
+    pd.testing.assert_frame_equal(read_cached_frame(filepath, stat), df.reset_index(drop=True))
+
+
+def test_get_store_without_cache(excel_file):
+    """
+    Тест проверяет, что при use_cache=False кэш на диске не создаётся.
+    """
+    get_store(excel_file, use_cache=False)
+    assert not os.path.exists(cache_paths(os.path.abspath(excel_file))[0])
+
+
+def test_date_index_positions_between():
+    """
+    Тест проверяет, что индекс дат возвращает позиции строк в диапазоне дат в исходном порядке
+    и пропускает транзакции без даты.
+    """
+    dates = pd.Series(pd.to_datetime(["2021-12-31", None, "2021-12-01", "2021-12-15", "2021-11-30"]))
+    index = DateIndex(dates)
+    assert index.positions_between(end="2021-12-15").tolist() == [2, 3, 4]
+    assert index.positions_between("2021-12-01", "2021-12-31").tolist() == [0, 2, 3]
+    assert index.positions_between(start="2022-01-01").tolist() == []
+    assert index.positions_between().tolist() == [0, 2, 3, 4]
+
+
+def test_get_date_index_is_cached():
+    """
+    Тест проверяет, что индекс дат строится один раз для хранилища.
+    """
+    store = TransactionStore(normalize_transactions(pd.DataFrame({"Дата операции": ["31.12.2021 16:44:00"]})))
+    assert get_date_index(store) is get_date_index(store)
+
+
+def test_date_features():
+    """
+    Тест проверяет вычисление дня недели и типа дня, в том числе для транзакции без даты.
+    """
+    df = pd.DataFrame({"Дата операции": pd.to_datetime(["2021-12-25", "2021-12-27", None])})
+    features = date_features(df)
+    assert features["День недели"].tolist() == [5, 0, pd.NA]
+    assert features["Тип дня"].tolist()[:2] == ["Выходной", "Рабочий"]
+    assert pd.isna(features["Тип дня"].iloc[2])
+    assert list(df.columns) == ["Дата операции"]
@@ -0,0 +1,60 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.ingest import read_statement
+from src.services import get_transactions_with_phones
+from src.store import TransactionStore, normalize_transactions
+from src.synthetic import STATEMENT_COLUMNS, generate_statement, iter_statement_chunks, write_statement
+
+
+def test_generate_statement_columns_and_seed():
+    """
+    Тест проверяет, что выписка содержит 15 столбцов выписки банка и повторяется при том же seed.
+    """
+    df = generate_statement(2000, seed=7)
+
+    assert list(df.columns) == list(STATEMENT_COLUMNS)
+    assert len(df) == 2000
+    assert df.equals(generate_statement(2000, seed=7))
+    assert not df.equals(generate_statement(2000, seed=8))
+    assert df["Дата операции"].str.fullmatch(r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2}").all()
+    assert df["Дата платежа"].str.fullmatch(r"\d{2}\.\d{2}\.\d{4}").all()
+
+
+def test_generate_statement_distributions():
+    """
+    Тест проверяет распределения: самые частые категория и карта, операции без карты,
+    описания с телефонами, которые находит get_transactions_with_phones, и убывание дат по всей выписке.
+    """
+    df = generate_statement(20000, seed=1, chunk_size=7000)
+    categories = df["Категория"].value_counts(normalize=True)
+
+    assert categories.index[0] == "Супермаркеты" and 0.25 < categories.iloc[0] < 0.45
+    assert df["Номер карты"].value_counts().index[0] == "*7197"
+    assert 0.03 < df["Номер карты"].isna().mean() < 0.2
+    assert (df["Статус"] == "FAILED").any() and (df["Валюта операции"] != "RUB").any()
+    assert ((df["Сумма операции"] > 0) == (df["Категория"] == "Пополнения")).mean() > 0.9
+
+    store = TransactionStore(normalize_transactions(df))
+    phones = json.loads(get_transactions_with_phones(store))
+    assert 0.01 < len(phones) / len(df) < 0.025
+    assert store.df["Дата операции"].is_monotonic_decreasing
+
+
+def test_write_statement(tmp_path):
+    """
+    Тест проверяет запись выписки в CSV по частям, её чтение read_statement и ограничение размера Excel файла.
+    """
+    path = write_statement(tmp_path / "statement.csv", 3000, seed=3, chunk_size=1000)
+    chunks = iter_statement_chunks(3000, seed=3, chunk_size=1000)
+    expected = normalize_transactions(pd.concat(chunks, ignore_index=True))
+
+    result = read_statement(path)
+    assert len(result) == 3000
+    pd.testing.assert_series_equal(result["Сумма операции"], expected["Сумма операции"])
+    assert result["Дата операции"].equals(expected["Дата операции"])
+
+    with pytest.raises(ValueError):
+        write_statement(tmp_path / "statement.xlsx", 2_000_000)
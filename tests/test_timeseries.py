@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.store import TransactionStore, normalize_transactions
+from src.timeseries import SpendSeries, get_spend_series, series_to_dict
+
+
+@pytest.fixture
+def transactions():
+    """
+    Создает DataFrame с транзакциями по двум категориям и двум картам за три месяца.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.08.2023 12:00:00",
+                "03.08.2023 15:30:00",
+                "20.08.2023 18:45:00",
+                "05.09.2023 10:00:00",
+                "06.09.2023 11:00:00",
+                "10.10.2023 09:00:00",
+            ],
+            "Номер карты": ["*3456", "*7654", "*3456", "*3456", None, "*7654"],
+            "Категория": ["Фастфуд", "Супермаркеты", "Фастфуд", "Супермаркеты", "Фастфуд", "Фастфуд"],
+            "Сумма операции": [-100.0, -200.0, -50.0, -300.0, -25.0, -400.0],
+            "Кэшбэк": [1.0, 2.0, None, 3.0, 0.0, 4.0],
+        }
+    )
+    return normalize_transactions(df)
+
+
+def test_monthly_series_by_category_and_month_over_month(transactions):
+    """
+    Тест проверяет месячные ряды расходов и кэшбэка, разрез по категориям с нулями для пустых месяцев
+    и изменение к предыдущему месяцу.
+    """
+    series = SpendSeries.from_frame(transactions)
+
+    monthly = series.series("M")
+    assert monthly.index.astype(str).tolist() == ["2023-08", "2023-09", "2023-10"]
+    assert monthly.tolist() == [-350.0, -325.0, -400.0]
+    assert series.series("M", value="cashback").tolist() == [3.0, 3.0, 4.0]
+
+    by_category = series.series("M", by="category")
+    assert by_category["Супермаркеты"].tolist() == [-200.0, -300.0, 0.0]
+    assert series.series("M", by="card")["Не указано"].tolist() == [0.0, -25.0, 0.0]
+
+    changes = series.month_over_month()
+    assert changes["delta"].tolist()[1:] == [25.0, -75.0]
+    assert changes["change"].iloc[2] == pytest.approx(-75 / 325)
+    assert np.isnan(changes["previous"].iloc[0])
+
+
+def test_rolling_and_weekly_series(transactions):
+    """
+    Тест проверяет скользящие суммы по календарным дням (окно учитывает дни раньше start)
+    и недельный ряд с неделями без транзакций.
+    """
+    series = SpendSeries.from_frame(transactions)
+
+    rolling = series.rolling(7, start="2023-08-03", end="2023-08-08")
+    assert rolling.tolist() == [-300.0, -300.0, -300.0, -300.0, -300.0, -200.0]
+
+    weekly = series.series("W", value="count")
+    assert weekly.iloc[0] == 2.0
+    assert len(weekly) == pd.Period("2023-10-10", "W").ordinal - pd.Period("2023-08-01", "W").ordinal + 1
+    assert weekly.sum() == 6.0
+
+
+def test_update_recalculates_tail_periods(transactions, monkeypatch):
+    """
+    Тест проверяет, что после добавления транзакций кэшированные ряды совпадают с рядами,
+    построенными заново, а ряды за месяцы раньше новых транзакций не пересчитываются.
+    """
+    store = TransactionStore(transactions.iloc[:4].reset_index(drop=True))
+    series = get_spend_series(store)
+    august = series.resample("M", "category").iloc[:2]
+
+    aggregated_days = []
+    aggregate = SpendSeries._aggregate
+
+    def recording_aggregate(daily, freq, by):
+        aggregated_days.append(daily.index.get_level_values("day").min())
+        return aggregate(daily, freq, by)
+
+    monkeypatch.setattr(SpendSeries, "_aggregate", staticmethod(recording_aggregate))
+    store.append(transactions.iloc[4:])
+    assert get_spend_series(store) is series
+    # Новые транзакции начинаются 06.09: пересчитывается только сентябрь и позже (первый день с данными - 05.09)
+    assert aggregated_days == [pd.Timestamp("2023-09-05")]
+
+    rebuilt = SpendSeries.from_frame(transactions)
+    for freq in ("D", "W", "M"):
+        pd.testing.assert_frame_equal(series.series(freq, by="category"), rebuilt.series(freq, by="category"))
+    pd.testing.assert_frame_equal(series.resample("M", "category").iloc[:2], august)
+
+
+def test_series_to_dict_and_invalid_parameters(transactions):
+    """
+    Тест проверяет преобразование ряда для JSON и ошибки при неизвестных периоде, разрезе и показателе.
+    """
+    series = SpendSeries.from_frame(transactions)
+
+    result = series_to_dict(series.series("M", by=["category", "card"], value="cashback"))
+    assert result["periods"] == ["2023-08", "2023-09", "2023-10"]
+    assert result["series"]["Фастфуд / *7654"] == [0.0, 0.0, 4.0]
+    assert series_to_dict(series.series("M"))["series"] == {"Всего": [-350.0, -325.0, -400.0]}
+
+    for kwargs in ({"freq": "Y"}, {"by": "merchant"}, {"value": "income"}):
+        with pytest.raises(ValueError):
+            series.series(**kwargs)
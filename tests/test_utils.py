@@ -1,10 +1,31 @@
 import json
+import os
+from datetime import datetime
+from tempfile import NamedTemporaryFile
 from unittest.mock import patch
 
 import pandas as pd
 import pytest
 
-from src.utils import num_card_account, transactions_xlsx, web_search_xcl
+from src.utils import iter_transactions_xlsx, num_card_account, transactions_xlsx, web_search_xcl
+
+
+@pytest.fixture
+def excel_file():
+    """
+    Создает временный Excel файл с транзакциями и удаляет его после теста.
+    """
+    data = {
+        "Номер карты": ["*3456", "*7654", "*3456"],
+        "Сумма операции с округлением": [150.75, 100.0, 49.25],
+        "Категория": ["Еда", "Транспорт", None],
+        "Бонусы (включая кэшбэк)": [3, 0, 1],
+    }
+    with NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
+        file_name = tmp.name
+    pd.DataFrame(data).to_excel(file_name, index=False)
+    yield file_name
+    os.remove(file_name)
 
 
 def test_transactions_xlsx_empty_string():
@@ -113,3 +134,76 @@ def test_num_card_account_empty_transactions_list():
     expected_result = '{"Номер карты": "*5091", "Сумма операций": 0}'
 
     assert result == expected_result
+
+
+def test_iter_transactions_xlsx_matches_read_excel(excel_file):
+    """
+    Тест проверяет, что потоковое чтение выдаёт те же транзакции, что и pandas.read_excel,
+    включая типы значений и пустые ячейки.
+    """
+    expected = pd.read_excel(excel_file).to_dict("records")
+    result = list(iter_transactions_xlsx(excel_file))
+
+    assert len(result) == len(expected)
+    for row, expected_row in zip(result, expected):
+        assert list(row) == list(expected_row)
+        assert json.dumps(row, ensure_ascii=False) == json.dumps(expected_row, ensure_ascii=False)
+
+
+def test_iter_transactions_xlsx_date_cells_match_read_excel(tmp_path):
+    """
+    Тест проверяет, что потоковое чтение совпадает с pandas.read_excel для ячеек с типом даты
+    (в том числе с пропуском) и для целых чисел в столбцах с пропусками или дробными числами.
+    """
+    file_name = str(tmp_path / "dates.xlsx")
+    pd.DataFrame(
+        {
+            "Дата операции": pd.to_datetime(["2023-09-01 12:00:00", "2023-09-15 15:30:45", None]),
+            "Дата платежа": pd.to_datetime(["2023-09-02", "2023-09-16", "2023-10-05"]),
+            "Бонусы": [3, None, 1],
+            "Доля": [1, 2.5, 3],
+            "Количество": [1, 2, 3],
+            "Категория": ["Еда", None, "Транспорт"],
+        }
+    ).to_excel(file_name, index=False)
+
+    expected = pd.read_excel(file_name).to_dict("records")
+    result = list(iter_transactions_xlsx(file_name))
+
+    assert len(result) == len(expected)
+    for row, expected_row in zip(result, expected):
+        assert list(row) == list(expected_row)
+        for name, value in row.items():
+            if pd.isna(expected_row[name]):
+                assert pd.isna(value), name
+            else:
+                assert value == expected_row[name], name
+                assert isinstance(value, float) == isinstance(expected_row[name], float), name
+    assert isinstance(result[0]["Дата операции"], datetime)
+    assert result[2]["Дата операции"] is pd.NaT
+
+
+def test_iter_transactions_xlsx_chunks(excel_file):
+    """
+    Тест проверяет, что при заданном chunk_size транзакции выдаются списками указанного размера.
+    """
+    chunks = list(iter_transactions_xlsx(excel_file, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+def test_iter_transactions_xlsx_nonexistent_file():
+    """
+    Тест проверяет, что для несуществующего файла генератор ничего не выдаёт.
+    """
+    assert list(iter_transactions_xlsx("nonexistent_file.xlsx")) == []
+
+
+def test_num_card_account_with_stream(excel_file):
+    """
+    Тест проверяет, что num_card_account и web_search_xcl работают с генератором транзакций.
+    """
+    result = num_card_account(iter_transactions_xlsx(excel_file), "*3456")
+    assert json.loads(result)["Сумма операций"] == 200
+
+    found = json.loads(web_search_xcl(iter_transactions_xlsx(excel_file), "еда"))
+    assert [row["Категория"] for row in found] == ["Еда"]
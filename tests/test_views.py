@@ -1,5 +1,7 @@
+import asyncio
 import json
 import os
+import threading
 from datetime import datetime
 from io import BytesIO
 from tempfile import NamedTemporaryFile
@@ -7,10 +9,21 @@ from unittest.mock import Mock, mock_open, patch
 
 import pandas as pd
 import pytest
-import requests
 
-from src.views import (get_exchange_rate, get_greeting, get_stock_price, load_user_settings, parse_datetime,
-                       process_excel_data)
+from src.market import clear_caches
+from src.store import TransactionStore, normalize_transactions
+from src.views import (build_dashboard, get_exchange_rate, get_greeting, get_stock_price, get_stock_prices,
+                       load_user_settings, parse_datetime, process_excel_data)
+
+
+@pytest.fixture(autouse=True)
+def clean_market_caches():
+    """
+    Очищает кэши курсов валют, котировок и настроек до и после каждого теста.
+    """
+    clear_caches()
+    yield
+    clear_caches()
 
 
 # Тестирование функции load_user_settings
@@ -47,7 +60,7 @@ def test_load_user_settings_json_decode_error():
         assert load_user_settings() is None
 
 
-@patch("requests.get")
+@patch("src.market.session.get")
 def test_get_exchange_rate_success(mock_get):
     """
     Тест для функции get_exchange_rate.
@@ -62,7 +75,7 @@ def test_get_exchange_rate_success(mock_get):
         assert result == {"USD": 1.0, "EUR": 0.85}
 
 
-@patch("requests.get")
+@patch("src.market.session.get")
 def test_get_exchange_rate_failure(mock_get):
     """
     Тест для функции get_exchange_rate.
@@ -76,21 +89,23 @@ def test_get_exchange_rate_failure(mock_get):
         assert result is None
 
 
-@patch("src.views.TimeSeries")
-def test_get_stock_price_success(mock_time_series):
+@patch("src.views.ALPHA_VANTAGE_API_KEY", "test-key")
+@patch("src.market.session.get")
+def test_get_stock_price_success(mock_get):
     """
     Тест для функции get_stock_price.
     Проверяет успешное получение цены акции.
     Моделирует успешный ответ API получения котировок и проверяет,
     что возвращаемая цена соответствует ожидаемой.
     """
-    mock_ts_instance = mock_time_series.return_value
-    mock_ts_instance.get_quote_endpoint.return_value = ({"05. price": "123.45"}, None)
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"Global Quote": {"01. symbol": "AAPL", "05. price": "123.45"}}
 
     price = get_stock_price("AAPL")
 
     assert price == 123.45
-    mock_ts_instance.get_quote_endpoint.assert_called_once_with(symbol="AAPL")
+    mock_get.assert_called_once()
+    assert mock_get.call_args.kwargs["params"]["symbol"] == "AAPL"
 
 
 @patch("src.views.ALPHA_VANTAGE_API_KEY", None)
@@ -104,20 +119,56 @@ def test_get_stock_price_no_api_key():
 
 
 # Тест для RuntimeError, когда API возвращает ошибку
-@patch("src.views.TimeSeries")
-def test_get_stock_price_runtime_error(mock_time_series):
+@patch("src.views.ALPHA_VANTAGE_API_KEY", "test-key")
+@patch("src.market.session.get")
+def test_get_stock_price_runtime_error(mock_get):
     """
     Тестирует функцию get_stock_price на случай возникновения RuntimeError,
-    если метод get_quote_endpoint выбрасывает исключение. Проверяет, что
+    если запрос котировки выбрасывает исключение. Проверяет, что
     сообщение об ошибке соответствует ожидаемому.
     """
-    mock_ts_instance = mock_time_series.return_value
-    mock_ts_instance.get_quote_endpoint.side_effect = Exception("API Error")
+    mock_get.side_effect = Exception("API Error")
 
     with pytest.raises(RuntimeError, match="Ошибка при получении данных для AAPL: API Error"):
         get_stock_price("AAPL")
 
 
+@patch("src.views.ALPHA_VANTAGE_API_KEY", "test-key")
+@patch("src.market.session.get")
+def test_get_stock_price_cached(mock_get):
+    """
+    Тестирует, что повторный запрос цены той же акции берётся из кэша
+    без повторного обращения к API.
+    """
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"Global Quote": {"05. price": "10.5"}}
+
+    assert get_stock_price("AAPL") == 10.5
+    assert get_stock_price("AAPL") == 10.5
+    mock_get.assert_called_once()
+
+
+@patch("src.views.ALPHA_VANTAGE_API_KEY", "test-key")
+@patch("src.market.session.get")
+def test_get_stock_prices_from_settings(mock_get):
+    """
+    Тестирует функцию get_stock_prices: без аргументов цены запрашиваются
+    для акций из настроек пользователя, а акция с ошибкой получает цену None.
+    """
+
+    def quote(url, params=None, timeout=None):
+        response = Mock(status_code=200)
+        if params["symbol"] == "BAD":
+            response.json.return_value = {"Error Message": "Invalid API call"}
+        else:
+            response.json.return_value = {"Global Quote": {"05. price": "1.5"}}
+        return response
+
+    mock_get.side_effect = quote
+    with patch("src.views.load_user_settings", return_value={"user_stocks": ["AAPL", "BAD"]}):
+        assert get_stock_prices() == {"AAPL": 1.5, "BAD": None}
+
+
 def test_get_greeting():
     """
     Тестирует функцию get_greeting с различными входными значениями времени
@@ -260,6 +311,94 @@ def test_process_excel_data_invalid_file_path():
         process_excel_data("non_existing_file.xlsx", specific_date)
 
 
+@pytest.fixture
+def dashboard_store():
+    """
+    Создает хранилище с транзакциями по двум картам для тестов главной страницы.
+    """
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["01.09.2023 12:00:00", "15.09.2023 15:30:00", "05.10.2023 10:00:00"],
+            "Номер карты": ["*3456", "*7654", "*3456"],
+            "Категория": ["Фастфуд", "Супермаркеты", "Фастфуд"],
+            "Сумма операции": [-100.0, -200.0, -300.0],
+            "Кэшбэк": [1.0, 2.0, 3.0],
+            "Сумма операции с округлением": [100.0, 200.0, 300.0],
+        }
+    )
+    return TransactionStore(normalize_transactions(df))
+
+
+def test_build_dashboard(dashboard_store):
+    """
+    Тестирует функцию build_dashboard: все разделы главной страницы собираются в один словарь.
+    """
+    with patch("src.views.get_exchange_rate", return_value={"USD": 1.0}), patch(
+        "src.views.get_stock_prices", return_value={"AAPL": 150.0}
+    ):
+        dashboard = asyncio.run(build_dashboard("01.09.2023", dashboard_store))
+
+    assert dashboard["greeting"] in ("Доброе утро", "Добрый день", "Добрый вечер", "Доброй ночи")
+    assert [row["Номер карты"] for row in dashboard["transactions"]] == ["*3456", "*7654"]
+    assert [card["Номер карты"] for card in dashboard["cards"]] == ["*3456", "*7654"]
+    assert dashboard["cashback"] == {"Супермаркеты": 2.0, "Фастфуд": 1.0}
+    assert dashboard["currency_rates"] == {"USD": 1.0}
+    assert dashboard["stock_prices"] == {"AAPL": 150.0}
+    assert dashboard["errors"] == {}
+
+
+def test_build_dashboard_partial_results(dashboard_store):
+    """
+    Тестирует, что раздел с ошибкой или превышением времени ожидания получает None,
+    причина попадает в "errors", а остальные разделы возвращаются. Курсы валют не возвращаются,
+    пока главная страница не собрана, поэтому результат не ждёт самого медленного запроса.
+    """
+    release = threading.Event()
+
+    def slow_rates():
+        release.wait(10)
+        return {"USD": 1.0}
+
+    with patch("src.views.get_exchange_rate", side_effect=slow_rates), patch(
+        "src.views.get_stock_prices", side_effect=ValueError("Необходимо указать API ключ в .env файле.")
+    ):
+        try:
+            dashboard = asyncio.run(build_dashboard("01.09.2023", dashboard_store, timeouts={"currency_rates": 0.1}))
+            assert not release.is_set()
+        finally:
+            release.set()
+
+    assert dashboard["currency_rates"] is None
+    assert dashboard["stock_prices"] is None
+    assert set(dashboard["errors"]) == {"currency_rates", "stock_prices"}
+    assert "превышено время ожидания" in dashboard["errors"]["currency_rates"]
+    assert len(dashboard["transactions"]) == 2
+
+
+def test_build_dashboard_runs_sources_concurrently(dashboard_store):
+    """
+    Тестирует, что курсы валют и цены акций запрашиваются одновременно: каждый запрос ждёт,
+    пока начнётся второй, поэтому при последовательном выполнении оба раздела завершились бы ошибкой.
+    """
+    both_started = threading.Barrier(2, timeout=10)
+
+    def concurrent(value):
+        def fetch():
+            both_started.wait()
+            return value
+
+        return fetch
+
+    with patch("src.views.get_exchange_rate", side_effect=concurrent({"USD": 1.0})), patch(
+        "src.views.get_stock_prices", side_effect=concurrent({"AAPL": 1.0})
+    ):
+        dashboard = asyncio.run(build_dashboard("01.09.2023", dashboard_store))
+
+    assert dashboard["errors"] == {}
+    assert dashboard["currency_rates"] == {"USD": 1.0}
+    assert dashboard["stock_prices"] == {"AAPL": 1.0}
+
+
 # Запуск тестов
 if __name__ == "__main__":
     pytest.main()